@@ -1,20 +1,75 @@
 from airflow.decorators import dag, task
 from datetime import timedelta
+import json
+import logging
+import time
 import requests
 
-from logger import logger
+logger = logging.getLogger(__name__)
+
+APP_URL = 'http://app:8000'
+HISTORY_CHUNKS = 8
+SCHEDULES_FULL_WEEKDAY = 6  # день недели (воскресенье), когда запрашиваются графики выплат всех облигаций
+JOB_POLL_INTERVAL = 10
 
 default_args = {
     'retries': 5,
-    'retry_delay': timedelta(minutes=5)
+    'retry_delay': timedelta(minutes=5),
+    'sla': timedelta(hours=2)
 }
 
 
+def call_app(path: str, **params) -> requests.Response:
+    """
+    Функция для вызова метода сервиса. Ошибка запроса
+    пробрасывается дальше, чтобы Airflow перезапустил task
+
+    :param path: путь метода сервиса
+    :param params: параметры запроса
+    :return: ответ сервиса
+    """
+    result = requests.get(APP_URL + path, params=params, timeout=(10, 3600))
+    logger.info(f'{path} {params}: {result.status_code} {result.text[:1000]}')
+    result.raise_for_status()
+    return result
+
+
+def run_job(path: str, **params) -> dict:
+    """
+    Функция для запуска фоновой задачи сервиса и ожидания ее завершения.
+    Если задача завершилась с ошибкой, выбрасывается исключение,
+    чтобы Airflow перезапустил task
+
+    :param path: путь метода сервиса, ставящего задачу в фон
+    :param params: параметры запроса
+    :return: итоговый статус задачи (с длительностью этапов)
+    """
+    job = call_app(path, **params).json()
+    while job['status'] not in ('done', 'failed'):
+        time.sleep(JOB_POLL_INTERVAL)
+        result = requests.get(f"{APP_URL}/update/jobs/{job['id']}", timeout=30)
+        result.raise_for_status()
+        job = result.json()
+
+    for job_stage in job['stages']:
+        logger.info(json.dumps({'event': 'stage', 'job_id': job['id'], 'kind': job['kind'],
+                                'params': job['params'], 'stage': job_stage['name'],
+                                'duration_sec': job_stage['duration_sec'], 'rows': job_stage['rows']}))
+    logger.info(json.dumps({'event': 'job', 'job_id': job['id'], 'kind': job['kind'],
+                            'params': job['params'], 'status': job['status'], 'error': job['error']}))
+    if job['status'] == 'failed':
+        raise RuntimeError(f"Job {job['id']} failed: {job['error']}")
+    return job
+
+
 @dag(default_args=default_args, schedule_interval="0 5 * * *", catchup=False)
 def load_data_airflow():
     """
     Даг для загрузки информации
-    по облигациям и валютам
+    по облигациям и валютам:
+    валюты -> облигации (все режимы торгов) -> исторические цены (по частям)
+    и графики выплат -> пересчет метрик; после исторических цен
+    догружаются недостающие курсы валют
 
     :return: None
     """
@@ -25,24 +80,75 @@ def load_data_airflow():
 
         :return: None
         """
-        try:
-            result = requests.get('http://app:8000/update/currencies')
-            logger.info(result)
-        except requests.exceptions.RequestException as e:
-            logger.error(str(e))
+        run_job('/update/currencies')
+
+    @task()
+    def backfill_rates():
+        """
+        Task для догрузки истории курсов валют номинала облигаций
+        (загружаются только недостающие курсы, обычно - ничего)
+
+        :return: None
+        """
+        run_job('/update/rates')
 
     @task()
     def load_bonds():
         """
-        Task для загрузки данных по облигациям
+        Task для загрузки данных по облигациям всех режимов торгов
+        (режимы загружаются сервисом параллельно, облигации,
+        торгуемые в нескольких режимах, берутся по приоритету режимов)
+
+        :return: None
+        """
+        run_job('/update/bonds')
+
+    @task()
+    def cleanup_bonds():
+        """
+        Task для удаления облигаций, не обновленных при текущей загрузке
+
+        :return: None
+        """
+        call_app('/update/bonds/cleanup')
+
+    @task()
+    def load_history(chunk: int):
+        """
+        Task для инкрементальной загрузки исторических цен облигаций
+        (догружаются только дни торгов новее последних сохраненных)
+
+        :param chunk: номер загружаемой части тикеров
+        :return: None
+        """
+        run_job('/update/history', chunk=chunk, chunks=HISTORY_CHUNKS)
 
+    @task()
+    def load_schedules(logical_date=None):
+        """
+        Task для загрузки графиков выплат облигаций: ежедневно - только
+        графиков, которые могли измениться, раз в неделю - всех облигаций
+        (перезаписываются только изменившиеся графики)
+
+        :param logical_date: дата запуска DAG (передается Airflow)
         :return: None
         """
-        try:
-            result = requests.get('http://app:8000/update/bonds')
-            logger.info(result)
-        except requests.exceptions.RequestException as e:
-            logger.error(str(e))
+        run_job('/update/schedules', full=logical_date.weekday() == SCHEDULES_FULL_WEEKDAY)
+
+    @task()
+    def precompute_metrics():
+        """
+        Task для пересчета метрик облигаций
+
+        :return: None
+        """
+        run_job('/update/metrics')
+
+    history = load_history.expand(chunk=list(range(HISTORY_CHUNKS)))
+
+    bonds = load_currency() >> load_bonds() >> cleanup_bonds()
+    bonds >> [history, load_schedules()] >> precompute_metrics()
+    history >> backfill_rates()
 
 
 load_data_airflow = load_data_airflow()
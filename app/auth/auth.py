@@ -7,9 +7,9 @@ from fastapi.security import OAuth2PasswordBearer
 from jwt.exceptions import InvalidTokenError
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from config import SECRET_KEY, ALGORITHM
+from config import SECRET_KEY, ALGORITHM, PROFILING_ADMINS
 from models import crud, schemas
-from models.database import get_db
+from models.database import get_read_db
 from utils.hash_utils import verify_password
 
 
@@ -19,7 +19,7 @@ oath2_scheme = OAuth2PasswordBearer(tokenUrl="auth/token")
 async def authenticate_user(
         username: str,
         password: str,
-        db: AsyncSession = Depends(get_db)
+        db: AsyncSession = Depends(get_read_db)
 ) -> schemas.UserInDB | bool:
     try:
         user_data = await crud.get_user(db=db, username=username)
@@ -52,7 +52,7 @@ def create_access_token(data: dict, expires_delta: timedelta | None = None):
 
 async def get_current_user(
         token: Annotated[str, Depends(oath2_scheme)],
-        db: AsyncSession = Depends(get_db)
+        db: AsyncSession = Depends(get_read_db)
 ) -> schemas.UserInDB:
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
@@ -90,3 +90,11 @@ async def get_current_active_user(
     if current_user.disabled:
         raise HTTPException(status_code=400, detail="Inactive user")
     return current_user
+
+
+async def get_current_admin_user(
+        current_user: Annotated[schemas.UserInDB, Depends(get_current_active_user)]
+) -> schemas.UserInDB:
+    if current_user.username not in PROFILING_ADMINS:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not enough permissions")
+    return current_user
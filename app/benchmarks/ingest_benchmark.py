@@ -0,0 +1,62 @@
+"""
+Бенчмарк загрузки данных из ISS MOEX и ЦБ РФ: время загрузки курсов
+валют, облигаций по режимам торгов, исторических цен и расчета
+корреляции. Рассчитан на запуск против сервера-заглушки stub_server,
+чтобы результаты не зависели от сети и были воспроизводимыми
+
+Запуск из каталога app (заглушка в отдельном терминале):
+    python ../stub_server/server.py --port 8081 --securities 50000
+    ISS_BASE_URL=http://127.0.0.1:8081 CBR_BASE_URL=http://127.0.0.1:8081 \
+        python -m benchmarks.ingest_benchmark
+"""
+import asyncio
+from datetime import date, timedelta
+from decimal import Decimal
+from time import perf_counter
+
+from config import ISS_BASE_URL, CBR_BASE_URL
+from utils.CBRF_gateway import CBRFGateway
+from utils.MOEX_gateway import MOEXGateway, board_flights, history_flights
+
+N_HISTORY_TICKERS = 50
+CURR_DICT = {"SUR": Decimal(1), "USD": Decimal("96.5"), "EUR": Decimal("104.2"), "CNY": Decimal("13.3")}
+
+
+async def timed(name: str, coro):
+    start = perf_counter()
+    result = await coro
+    print(f"{name:<45} {perf_counter() - start:8.2f} s")
+    return result
+
+
+async def main():
+    print(f"ISS: {ISS_BASE_URL}, ЦБ РФ: {CBR_BASE_URL}")
+    moex = MOEXGateway()
+
+    currencies = await timed("курсы валют", CBRFGateway().load_currency_data())
+    print(f"{'':<45} {len(currencies)} валют")
+
+    for source in moex.BOARDS:
+        bonds = await timed(f"облигации {source.board}", moex.load_bond_data(board=source.board))
+        print(f"{'':<45} {len(bonds)} облигаций")
+
+    bonds = await timed("облигации (все режимы)", moex.load_bond_data())
+    print(f"{'':<45} {len(bonds)} облигаций")
+
+    tickers = [bond["ticker"] for bond in bonds[:N_HISTORY_TICKERS]]
+    last_dates = {ticker: date.today() - timedelta(days=365) for ticker in tickers}
+
+    async def load_history():
+        return [history async for history in moex.load_hist_prices(last_dates=last_dates, curr_dict=CURR_DICT)]
+
+    history = await timed(f"исторические цены ({len(tickers)} тикеров)", load_history())
+    print(f"{'':<45} {sum(len(h) for h in history)} строк")
+
+    await timed("корреляция двух облигаций", moex.load_hist_bond_data(tickers[0], tickers[1]))
+
+    await board_flights.close()
+    await history_flights.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
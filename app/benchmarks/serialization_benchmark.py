@@ -0,0 +1,73 @@
+"""
+Бенчмарк сериализации ответов: затраты CPU на один запрос
+полного списка облигаций до и после перехода на FastResponse (orjson)
+
+Запуск из каталога app:
+    python -m benchmarks.serialization_benchmark
+"""
+import asyncio
+from datetime import datetime
+from decimal import Decimal
+from time import process_time
+from types import SimpleNamespace
+
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_model_field
+
+from models import schemas
+from utils.responses import FastResponse
+
+N_BONDS = 3000
+N_REQUESTS = 20
+
+
+def make_bond(i: int) -> SimpleNamespace:
+    return SimpleNamespace(
+        ticker=f"RU000A{i:06d}", name=f"Облигация {i}",
+        prevwaprice_cur=Decimal("985.1234"), prevwaprice_rub=Decimal("985.1234"),
+        nominal_cur=Decimal("1000.0000"), nominal_rub=Decimal("1000.0000"),
+        coupon_value_cur=Decimal("41.8900"), coupon_value_rub=Decimal("41.8900"),
+        coupon_period=182, accum_coupon_cur=Decimal("12.3400"),
+        accum_coupon_rub=Decimal("12.3400"), cur_of_nominal="SUR", cur_of_market="SUR",
+        lot_size=1, issue_size=5_000_000_000, prev_date=datetime(2026, 10, 16),
+        next_coupon_date=datetime(2027, 1, 20), maturity_date=datetime(2030, 1, 20),
+        loading_date=datetime(2026, 10, 19)
+    )
+
+
+def measure(name: str, model, content, response_class) -> float:
+    field = create_model_field(name="Response", type_=model, mode="serialization")
+
+    async def one_request():
+        payload = await serialize_response(field=field, response_content=content, is_coroutine=True)
+        return response_class(payload).body
+
+    start = process_time()
+    for _ in range(N_REQUESTS):
+        asyncio.run(one_request())
+    per_request = (process_time() - start) / N_REQUESTS * 1000
+    print(f"{name:<55} {per_request:8.2f} ms CPU/request")
+    return per_request
+
+
+def main():
+    orm_bonds = [make_bond(i) for i in range(N_BONDS)]
+    ticker_rows = [{"ticker": b.ticker, "name": b.name} for b in orm_bonds]
+
+    print(f"{N_BONDS} облигаций, {N_REQUESTS} запросов")
+    before = measure("/bonds/ до: ORM-объекты + JSONResponse",
+                     list[schemas.TickerBase], orm_bonds, JSONResponse)
+    after = measure("/bonds/ после: (ticker, name) + FastResponse",
+                    list[schemas.TickerBase], ticker_rows, FastResponse)
+    print(f"{'ускорение':<55} {before / after:8.2f}x")
+
+    before = measure("BondInfo x N до: JSONResponse",
+                     list[schemas.BondInfo], orm_bonds, JSONResponse)
+    after = measure("BondInfo x N после: FastResponse",
+                    list[schemas.BondInfo], orm_bonds, FastResponse)
+    print(f"{'ускорение':<55} {before / after:8.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -8,7 +8,60 @@ DB_PORT = os.environ.get("DB_PORT")
 DB_NAME = os.environ.get("DB_NAME")
 DB_USER = os.environ.get("DB_USER")
 DB_PASS = os.environ.get("DB_PASS")
+# Реплики для чтения через запятую в формате host:port (пусто - чтение с основной БД)
+DB_REPLICA_HOSTS = [host for host in os.environ.get("DB_REPLICA_HOSTS", "").split(",") if host]
+DB_REPLICA_RETRY_SEC = float(os.environ.get("DB_REPLICA_RETRY_SEC", 30))
+
+DB_POOL_SIZE = int(os.environ.get("DB_POOL_SIZE", 5))
+DB_MAX_OVERFLOW = int(os.environ.get("DB_MAX_OVERFLOW", 10))
+DB_POOL_TIMEOUT = float(os.environ.get("DB_POOL_TIMEOUT", 30))
+DB_POOL_RECYCLE = int(os.environ.get("DB_POOL_RECYCLE", 1800))
+DB_POOL_PRE_PING = os.environ.get("DB_POOL_PRE_PING", "true").lower() == "true"
+DB_STATEMENT_CACHE_SIZE = int(os.environ.get("DB_STATEMENT_CACHE_SIZE", 500))
 
 ACCESS_TOKEN_EXPIRE_MINUTES = os.environ.get("ACCESS_TOKEN_EXPIRE_MINUTES")
 SECRET_KEY = os.environ.get("SECRET_KEY")
 ALGORITHM = os.environ.get("ALGORITHM")
+
+HISTORY_SYNC_CONCURRENCY = int(os.environ.get("HISTORY_SYNC_CONCURRENCY", 8))
+
+# Адреса внешних источников (для проверки без сети - адрес stub_server)
+ISS_BASE_URL = os.environ.get("ISS_BASE_URL", "https://iss.moex.com").rstrip("/")
+CBR_BASE_URL = os.environ.get("CBR_BASE_URL", "https://www.cbr.ru").rstrip("/")
+# Потоковый разбор больших ответов ISS (при установленном пакете ijson)
+ISS_STREAMING_PARSE = os.environ.get("ISS_STREAMING_PARSE", "true").lower() == "true"
+# Загружаемые режимы торгов ISS (engine/market/board через запятую) в порядке
+# приоритета: облигация из нескольких режимов берется из указанного раньше
+ISS_BOARDS = [source.strip() for source in
+              os.environ.get("ISS_BOARDS", "stock/bonds/TQCB,stock/bonds/TQOB").split(",") if source.strip()]
+# Число режимов торгов, загружаемых и разбираемых одновременно
+ISS_BOARD_CONCURRENCY = int(os.environ.get("ISS_BOARD_CONCURRENCY", 2))
+# Режим торгов ОФЗ, по облигациям которого подбирается кривая бескупонной доходности
+YIELD_CURVE_BOARD = os.environ.get("YIELD_CURVE_BOARD", "TQOB")
+# Внутридневное обновление цен (LAST, WAPRICE, YIELD) в фоне каждые
+# INTRADAY_REFRESH_MINUTES минут (включать только на одном экземпляре сервиса)
+INTRADAY_REFRESH_ENABLED = os.environ.get("INTRADAY_REFRESH_ENABLED", "false").lower() == "true"
+INTRADAY_REFRESH_MINUTES = float(os.environ.get("INTRADAY_REFRESH_MINUTES", 5))
+
+# Запросы к внешним источникам (ISS MOEX, ЦБ РФ): таймауты, повторы,
+# ограничение частоты запросов к хосту и автомат отключения хоста
+HTTP_TIMEOUT = float(os.environ.get("HTTP_TIMEOUT", 60))
+HTTP_CONNECT_TIMEOUT = float(os.environ.get("HTTP_CONNECT_TIMEOUT", 10))
+HTTP_MAX_RETRIES = int(os.environ.get("HTTP_MAX_RETRIES", 5))
+HTTP_RATE_LIMIT = float(os.environ.get("HTTP_RATE_LIMIT", 20))
+HTTP_RATE_BURST = int(os.environ.get("HTTP_RATE_BURST", 40))
+HTTP_BREAKER_THRESHOLD = int(os.environ.get("HTTP_BREAKER_THRESHOLD", 10))
+HTTP_BREAKER_RESET_SEC = float(os.environ.get("HTTP_BREAKER_RESET_SEC", 30))
+
+CACHE_MAX_AGE = int(os.environ.get("CACHE_MAX_AGE", 300))
+
+COMPRESSION_MIN_SIZE = int(os.environ.get("COMPRESSION_MIN_SIZE", 1000))
+
+# Профилирование запросов: PROFILING_ENABLED - профилировать все запросы,
+# иначе только запросы администраторов с заголовком X-Profile: 1
+PROFILING_ENABLED = os.environ.get("PROFILING_ENABLED", "false").lower() == "true"
+PROFILING_ADMINS = [user for user in os.environ.get("PROFILING_ADMINS", "").split(",") if user]
+PROFILING_DIR = os.environ.get("PROFILING_DIR", "profiles")
+PROFILING_INTERVAL = float(os.environ.get("PROFILING_INTERVAL", 0.001))
+# Число хранимых профилей (более старые удаляются при сохранении нового)
+PROFILING_MAX_FILES = int(os.environ.get("PROFILING_MAX_FILES", 200))
@@ -1,16 +1,63 @@
-from fastapi import FastAPI
+import asyncio
+from contextlib import asynccontextmanager, suppress
+
+from fastapi import FastAPI, Response
+from fastapi.middleware.gzip import GZipMiddleware
+from prometheus_client import generate_latest, CONTENT_TYPE_LATEST
+
+from config import COMPRESSION_MIN_SIZE, INTRADAY_REFRESH_ENABLED
+from routers import bond_endpoints, update_endpoints, auth_endpoints, health_endpoints, portfolio_endpoints
+from utils.intraday import intraday_refresher
+from utils.MOEX_gateway import board_flights, history_flights
+from utils.metrics import MetricsMiddleware
+from utils.profiling import ProfilingMiddleware
+from utils.responses import FastResponse, ContentNegotiationMiddleware
+
+try:
+    from brotli_asgi import BrotliMiddleware
+except ImportError:  # brotli - необязательная зависимость, без нее используется gzip
+    BrotliMiddleware = None
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Фоновое внутридневное обновление цен облигаций (если включено)
+    task = asyncio.create_task(intraday_refresher.run()) if INTRADAY_REFRESH_ENABLED else None
+    yield
+    if task is not None:
+        task.cancel()
+        with suppress(asyncio.CancelledError):
+            await task
+    await board_flights.close()
+    await history_flights.close()
 
-from routers import bond_endpoints, update_endpoints, auth_endpoints
 
 app = FastAPI(
-    title="MOEX data service"
+    title="MOEX data service",
+    default_response_class=FastResponse,
+    lifespan=lifespan
 )
 
+app.add_middleware(ContentNegotiationMiddleware)
+app.add_middleware(MetricsMiddleware)
+app.add_middleware(ProfilingMiddleware)
+if BrotliMiddleware is not None:
+    app.add_middleware(BrotliMiddleware, minimum_size=COMPRESSION_MIN_SIZE, gzip_fallback=True)
+else:
+    app.add_middleware(GZipMiddleware, minimum_size=COMPRESSION_MIN_SIZE)
+
 app.include_router(auth_endpoints.router)
 app.include_router(bond_endpoints.router)
+app.include_router(portfolio_endpoints.router)
 app.include_router(update_endpoints.router)
+app.include_router(health_endpoints.router)
 
 
 @app.get("/")
 async def read_root():
     return {"message": "Welcome to MOEX data service"}
+
+
+@app.get("/metrics", include_in_schema=False)
+async def get_metrics():
+    return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
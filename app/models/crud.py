@@ -1,10 +1,15 @@
+from datetime import date, datetime
+
 from fastapi import HTTPException
+from sqlalchemy.dialects.postgresql import insert
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, delete
+from sqlalchemy import select, delete, func, update, bindparam
 
 from . import models, schemas
+from utils.metrics import db_timed
 
 
+@db_timed
 async def delete_currencies(db: AsyncSession):
     await db.execute(
         delete(
@@ -14,6 +19,88 @@ async def delete_currencies(db: AsyncSession):
     await db.commit()
 
 
+@db_timed
+async def upsert_currencies(
+        db: AsyncSession,
+        currencies: list[dict]
+):
+    if currencies:
+        stmt = insert(models.Currency)
+        await db.execute(
+            stmt.on_conflict_do_update(
+                index_elements=["currency_code"],
+                set_={**{name: stmt.excluded[name] for name in currencies[0] if name != "currency_code"},
+                      "updated_at": func.now()}
+            ),
+            currencies
+        )
+    await db.commit()
+
+
+@db_timed
+async def upsert_currency_rates(
+        db: AsyncSession,
+        rates: list[dict]
+):
+    if rates:
+        stmt = insert(models.CurrencyRate)
+        await db.execute(
+            stmt.on_conflict_do_update(
+                index_elements=["code", "rate_date"],
+                set_={"rate": stmt.excluded.rate}
+            ),
+            rates
+        )
+    await db.commit()
+
+
+@db_timed
+async def get_currency_rate_history(
+        db: AsyncSession,
+        code: str,
+        date_from: date,
+        date_till: date
+):
+    result = await db.execute(
+        select(
+            models.CurrencyRate.rate_date,
+            models.CurrencyRate.rate
+        ).where(
+            models.CurrencyRate.code == code,
+            models.CurrencyRate.rate_date.between(date_from, date_till)
+        ).order_by(models.CurrencyRate.rate_date)
+    )
+    return result.all()
+
+
+@db_timed
+async def get_first_rate_dates(db: AsyncSession) -> dict[str, date]:
+    result = await db.execute(
+        select(
+            models.CurrencyRate.code,
+            func.min(models.CurrencyRate.rate_date)
+        ).group_by(models.CurrencyRate.code)
+    )
+    return dict(result.all())
+
+
+@db_timed
+async def get_first_trade_dates_by_currency(db: AsyncSession) -> dict[str, date | None]:
+    result = await db.execute(
+        select(
+            models.Bond.cur_of_nominal,
+            func.min(models.BondHistory.trade_date)
+        ).outerjoin(
+            models.BondHistory,
+            models.BondHistory.ticker == models.Bond.ticker
+        ).where(
+            models.Bond.cur_of_nominal.not_in(['SUR', 'RUB'])
+        ).group_by(models.Bond.cur_of_nominal)
+    )
+    return dict(result.all())
+
+
+@db_timed
 async def delete_bonds(db: AsyncSession):
     await db.execute(
         delete(
@@ -23,16 +110,97 @@ async def delete_bonds(db: AsyncSession):
     await db.commit()
 
 
-async def get_bonds(db: AsyncSession):
-    result = await db.execute(
-        select(
+@db_timed
+async def delete_stale_bonds(db: AsyncSession, loaded_before: date):
+    await db.execute(
+        delete(
             models.Bond
+        ).where(models.Bond.loading_date < loaded_before)
+    )
+    await db.commit()
+
+
+@db_timed
+async def upsert_bonds(
+        db: AsyncSession,
+        bonds: list[dict]
+):
+    if bonds:
+        stmt = insert(models.Bond)
+        await db.execute(
+            stmt.on_conflict_do_update(
+                index_elements=["ticker"],
+                set_={**{name: stmt.excluded[name] for name in bonds[0] if name != "ticker"},
+                      "updated_at": func.now()}
+            ),
+            bonds
         )
+
+
+@db_timed
+async def update_marketdata(
+        db: AsyncSession,
+        marketdata: list[dict]
+):
+    if marketdata:
+        # Один оператор UPDATE, выполняемый пакетом для всех измененных облигаций
+        # (ключи словарей: b_ticker и имена обновляемых столбцов)
+        bonds = models.Bond.__table__
+        await db.execute(
+            update(bonds)
+            .where(bonds.c.ticker == bindparam("b_ticker"))
+            .values({**{name: bindparam(name) for name in marketdata[0] if name != "b_ticker"},
+                     "updated_at": func.now()}),
+            marketdata
+        )
+    await db.commit()
+
+
+@db_timed
+async def get_bonds(db: AsyncSession, tickers: list[str] | None = None):
+    query = select(
+        models.Bond
     )
+    if tickers is not None:
+        query = query.where(models.Bond.ticker.in_(tickers))
+    result = await db.execute(query)
     bonds = result.scalars().all()
     return bonds
 
 
+@db_timed
+async def get_snapshot_loading_date(db: AsyncSession):
+    result = await db.execute(
+        select(
+            func.max(models.Bond.loading_date)
+        )
+    )
+    return result.scalar()
+
+
+@db_timed
+async def get_bond_tickers(db: AsyncSession):
+    result = await db.execute(
+        select(
+            models.Bond.ticker,
+            models.Bond.name
+        )
+    )
+    return result.mappings().all()
+
+
+@db_timed
+async def get_next_coupon_dates(db: AsyncSession) -> dict[str, datetime | None]:
+    result = await db.execute(
+        select(
+            models.Bond.ticker,
+            models.Bond.next_coupon_date
+        )
+    )
+    return dict(result.all())
+
+
+@db_timed
 async def get_bond_info_by_ticker(
         db: AsyncSession,
         ticker: str
@@ -47,6 +215,218 @@ async def get_bond_info_by_ticker(
         raise HTTPException(status_code=404, detail="Ticker not found")
 
 
+@db_timed
+async def get_bond_history(
+        db: AsyncSession,
+        ticker: str,
+        date_from: date | None = None,
+        date_till: date | None = None
+):
+    query = select(
+        models.BondHistory.trade_date,
+        models.BondHistory.waprice_cur,
+        models.BondHistory.waprice_rub
+    ).where(
+        models.BondHistory.ticker == ticker,
+        models.BondHistory.waprice_cur.is_not(None)
+    ).order_by(models.BondHistory.trade_date)
+    if date_from is not None:
+        query = query.where(models.BondHistory.trade_date >= date_from)
+    if date_till is not None:
+        query = query.where(models.BondHistory.trade_date <= date_till)
+    result = await db.execute(query)
+    return result.all()
+
+
+@db_timed
+async def get_portfolio_history(
+        db: AsyncSession,
+        tickers: list[str],
+        date_from: date
+):
+    result = await db.execute(
+        select(
+            models.BondHistory.ticker,
+            models.BondHistory.trade_date,
+            models.BondHistory.waprice_cur,
+            models.BondHistory.waprice_rub
+        ).where(
+            models.BondHistory.ticker.in_(tickers),
+            models.BondHistory.trade_date >= date_from,
+            models.BondHistory.waprice_cur.is_not(None)
+        )
+    )
+    return result.all()
+
+
+@db_timed
+async def get_last_trade_dates(db: AsyncSession) -> dict[str, date | None]:
+    result = await db.execute(
+        select(
+            models.Bond.ticker,
+            func.max(models.BondHistory.trade_date)
+        ).outerjoin(
+            models.BondHistory,
+            models.BondHistory.ticker == models.Bond.ticker
+        ).group_by(models.Bond.ticker)
+    )
+    return dict(result.all())
+
+
+@db_timed
+async def add_bond_history(
+        db: AsyncSession,
+        history: list[dict]
+):
+    if history:
+        await db.execute(
+            insert(models.BondHistory).on_conflict_do_nothing(
+                index_elements=["ticker", "trade_date"]
+            ),
+            history
+        )
+    await db.commit()
+
+
+@db_timed
+async def get_coupon_schedule(
+        db: AsyncSession,
+        tickers: list[str] | None = None,
+        kinds: tuple[str, ...] = ("coupon", "amortization", "offer")
+):
+    query = select(
+        models.CouponSchedule.ticker,
+        models.CouponSchedule.kind,
+        models.CouponSchedule.pay_date,
+        models.CouponSchedule.value,
+        models.CouponSchedule.value_prct
+    ).where(
+        models.CouponSchedule.kind.in_(kinds)
+    ).order_by(models.CouponSchedule.ticker, models.CouponSchedule.pay_date)
+    if tickers is not None:
+        query = query.where(models.CouponSchedule.ticker.in_(tickers))
+    result = await db.execute(query)
+    return result.all()
+
+
+@db_timed
+async def replace_coupon_schedule(
+        db: AsyncSession,
+        ticker: str,
+        schedule: list[dict]
+):
+    await db.execute(
+        delete(
+            models.CouponSchedule
+        ).where(models.CouponSchedule.ticker == ticker)
+    )
+    if schedule:
+        await db.execute(insert(models.CouponSchedule), schedule)
+    # Метрики облигации рассчитываются по графику, поэтому меняется и их версия
+    await db.execute(
+        update(models.Bond)
+        .where(models.Bond.ticker == ticker)
+        .values(schedule_updated_at=func.now())
+    )
+    await db.commit()
+
+
+@db_timed
+async def upsert_precomputed_metrics(
+        db: AsyncSession,
+        metrics: list[dict]
+):
+    if metrics:
+        stmt = insert(models.PrecomputedMetrics)
+        await db.execute(
+            stmt.on_conflict_do_update(
+                index_elements=["ticker"],
+                set_={name: stmt.excluded[name] for name in metrics[0] if name != "ticker"}
+            ),
+            metrics
+        )
+    await db.commit()
+
+
+@db_timed
+async def upsert_yield_curve(
+        db: AsyncSession,
+        curve: dict
+):
+    stmt = insert(models.YieldCurve).values(**curve)
+    await db.execute(
+        stmt.on_conflict_do_update(
+            index_elements=["calc_date"],
+            set_={name: stmt.excluded[name] for name in curve if name != "calc_date"}
+        )
+    )
+    await db.commit()
+
+
+@db_timed
+async def get_yield_curve(
+        db: AsyncSession,
+        calc_date: date | None = None
+):
+    query = select(models.YieldCurve)
+    if calc_date is not None:
+        query = query.where(models.YieldCurve.calc_date == calc_date)
+    result = await db.execute(query.order_by(models.YieldCurve.calc_date.desc()).limit(1))
+    curve = result.scalars().first()
+    if curve is None:
+        raise HTTPException(status_code=404, detail="Yield curve not found")
+    return curve
+
+
+@db_timed
+async def get_bond_spreads(
+        db: AsyncSession,
+        limit: int = 100,
+        offset: int = 0
+):
+    result = await db.execute(
+        select(
+            models.PrecomputedMetrics.ticker,
+            models.Bond.name,
+            models.PrecomputedMetrics.calc_date,
+            models.PrecomputedMetrics.ytm_prct,
+            models.PrecomputedMetrics.curve_yield,
+            models.PrecomputedMetrics.g_spread,
+            models.PrecomputedMetrics.curve_fair_value
+        ).join(
+            models.Bond, models.Bond.ticker == models.PrecomputedMetrics.ticker
+        ).where(
+            models.PrecomputedMetrics.g_spread.is_not(None)
+        ).order_by(
+            models.PrecomputedMetrics.g_spread.desc()
+        ).limit(limit).offset(offset)
+    )
+    return result.mappings().all()
+
+
+@db_timed
+async def add_load_run(
+        db: AsyncSession,
+        run: dict
+):
+    db.add(models.LoadRun(**run))
+    await db.commit()
+
+
+@db_timed
+async def get_load_runs(
+        db: AsyncSession,
+        kind: str | None = None,
+        limit: int = 100
+):
+    query = select(models.LoadRun).order_by(models.LoadRun.started_at.desc()).limit(limit)
+    if kind is not None:
+        query = query.where(models.LoadRun.kind == kind)
+    result = await db.execute(query)
+    return result.scalars().all()
+
+
+@db_timed
 async def add_user(
         db: AsyncSession,
         user_to_db: schemas.UserToDB
@@ -56,6 +436,7 @@ async def add_user(
     await db.commit()
 
 
+@db_timed
 async def get_user(
         db: AsyncSession,
         username: str
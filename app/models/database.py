@@ -1,26 +1,179 @@
+from dataclasses import dataclass
+from itertools import count
+from time import perf_counter, monotonic
+
+from sqlalchemy import exc
 from sqlalchemy.ext.asyncio import (create_async_engine,
+                                    AsyncEngine,
                                     AsyncSession,
                                     async_sessionmaker,
                                     AsyncAttrs)
 from sqlalchemy.orm import DeclarativeBase
 
-from config import DB_USER, DB_PASS, DB_HOST, DB_NAME, DB_PORT
+from config import (DB_USER, DB_PASS, DB_HOST, DB_NAME, DB_PORT,
+                    DB_REPLICA_HOSTS, DB_REPLICA_RETRY_SEC,
+                    DB_POOL_SIZE, DB_MAX_OVERFLOW, DB_POOL_TIMEOUT,
+                    DB_POOL_RECYCLE, DB_POOL_PRE_PING, DB_STATEMENT_CACHE_SIZE)
+
+CONNECT_ERRORS = (exc.OperationalError, exc.InterfaceError, OSError)
+
+
+def make_database_url(host: str, port: str) -> str:
+    return (f"postgresql+asyncpg://{DB_USER}:{DB_PASS}@{host}:{port}/{DB_NAME}"
+            f"?prepared_statement_cache_size={DB_STATEMENT_CACHE_SIZE}")
 
-DATABASE_URL = f"postgresql+asyncpg://{DB_USER}:{DB_PASS}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
 
-engine = create_async_engine(DATABASE_URL)
-SessionLocal = async_sessionmaker(
-    autocommit=False,
-    autoflush=False,
-    bind=engine,
-    class_=AsyncSession,
+def make_engine(host: str, port: str) -> AsyncEngine:
+    return create_async_engine(
+        make_database_url(host, port),
+        pool_size=DB_POOL_SIZE,
+        max_overflow=DB_MAX_OVERFLOW,
+        pool_timeout=DB_POOL_TIMEOUT,
+        pool_recycle=DB_POOL_RECYCLE,
+        pool_pre_ping=DB_POOL_PRE_PING,
+        connect_args={"statement_cache_size": DB_STATEMENT_CACHE_SIZE}
     )
 
 
+def parse_host(address: str) -> tuple[str, str]:
+    """
+    Функция для разбора адреса реплики в формате host[:port]
+    (если порт не указан, используется порт основной БД)
+
+    :param address: адрес реплики
+    :return: кортеж из хоста и порта
+    """
+    host, _, port = address.strip().partition(":")
+    return host, port or DB_PORT
+
+
+def make_sessionmaker(bind: AsyncEngine) -> async_sessionmaker[AsyncSession]:
+    return async_sessionmaker(
+        autocommit=False,
+        autoflush=False,
+        bind=bind,
+        class_=AsyncSession,
+        )
+
+
+DATABASE_URL = make_database_url(DB_HOST, DB_PORT)
+
+engine = make_engine(DB_HOST, DB_PORT)
+SessionLocal = make_sessionmaker(engine)
+
+replica_engines = {
+    f"replica-{i}": make_engine(*parse_host(replica))
+    for i, replica in enumerate(DB_REPLICA_HOSTS)
+}
+ReplicaSessions = {name: make_sessionmaker(replica) for name, replica in replica_engines.items()}
+
+
 class Base(AsyncAttrs, DeclarativeBase):
     pass
 
 
-async def get_db():
+@dataclass
+class PoolStats:
+    """Статистика ожидания соединений из пула"""
+    engine: AsyncEngine
+    checkouts: int = 0
+    wait_total_sec: float = 0.0
+    wait_max_sec: float = 0.0
+    pool_timeouts: int = 0
+    connect_failures: int = 0
+
+    def snapshot(self) -> dict:
+        pool = self.engine.pool
+        return {
+            "pool_size": DB_POOL_SIZE,
+            "max_overflow": DB_MAX_OVERFLOW,
+            "checked_out": pool.checkedout(),
+            "checked_in": pool.checkedin(),
+            "overflow": pool.overflow(),
+            "checkouts": self.checkouts,
+            "wait_avg_ms": self.wait_total_sec / self.checkouts * 1000 if self.checkouts else 0.0,
+            "wait_max_ms": self.wait_max_sec * 1000,
+            "pool_timeouts": self.pool_timeouts,
+            "connect_failures": self.connect_failures,
+        }
+
+
+pool_stats = {
+    "primary": PoolStats(engine),
+    **{name: PoolStats(replica) for name, replica in replica_engines.items()}
+}
+
+
+class ReplicaRouter:
+    """
+    Класс для выбора реплики для чтения по кругу (round-robin).
+    Недоступная реплика исключается из ротации на DB_REPLICA_RETRY_SEC секунд
+    """
+    def __init__(self, names: list[str]):
+        self.names = names
+        self.counter = count()
+        self.down_until: dict[str, float] = {}
+
+    def candidates(self) -> list[str]:
+        if not self.names:
+            return []
+        start = next(self.counter) % len(self.names)
+        now = monotonic()
+        ordered = self.names[start:] + self.names[:start]
+        return [name for name in ordered if self.down_until.get(name, 0) <= now]
+
+    def mark_down(self, name: str) -> None:
+        self.down_until[name] = monotonic() + DB_REPLICA_RETRY_SEC
+
+
+replica_router = ReplicaRouter(list(replica_engines))
+
+
+async def checkout(session: AsyncSession, name: str) -> None:
+    """
+    Функция для получения соединения из пула сразу при открытии сессии
+    (с замером времени ожидания соединения)
+
+    :param session: объект сессии
+    :param name: наименование БД (primary или replica-N)
+    :return: None
+    """
+    stats = pool_stats[name]
+    start = perf_counter()
+    try:
+        await session.connection()
+    except exc.TimeoutError:
+        stats.pool_timeouts += 1
+        raise
+    except CONNECT_ERRORS:
+        stats.connect_failures += 1
+        raise
+    wait = perf_counter() - start
+    stats.checkouts += 1
+    stats.wait_total_sec += wait
+    stats.wait_max_sec = max(stats.wait_max_sec, wait)
+
+
+# Сессия основной БД (для записи: /update/*, /auth/register)
+async def get_write_db():
     async with SessionLocal() as session:
+        await checkout(session, "primary")
+        yield session
+
+
+# Сессия реплики для чтения (при недоступности всех реплик - основная БД)
+async def get_read_db():
+    for name in replica_router.candidates():
+        session = ReplicaSessions[name]()
+        try:
+            await checkout(session, name)
+        except (exc.TimeoutError, *CONNECT_ERRORS):
+            await session.close()
+            replica_router.mark_down(name)
+            continue
+        async with session:
+            yield session
+        return
+
+    async for session in get_write_db():
         yield session
@@ -1,9 +1,9 @@
-from datetime import datetime
+from datetime import datetime, date
 from decimal import Decimal
 
-from sqlalchemy import (Integer, String, DateTime,
-                        DECIMAL, BigInteger, Boolean)
-from sqlalchemy.orm import Mapped, mapped_column
+from sqlalchemy import (Integer, String, DateTime, Date, Float, JSON,
+                        DECIMAL, BigInteger, Boolean, UniqueConstraint, Index, select, func)
+from sqlalchemy.orm import Mapped, mapped_column, column_property
 
 from .database import Base
 
@@ -27,30 +27,18 @@ class Bond(Base):
     prevwaprice_cur: Mapped[Decimal] = mapped_column(
         DECIMAL(precision=20, scale=4), nullable=True
     )  # PREVWAPRICE (в валюте номинала FACEUNIT)
-    prevwaprice_rub: Mapped[Decimal] = mapped_column(
-        DECIMAL(precision=20, scale=4), nullable=True
-    )  # PREVWAPRICE * rate
     nominal_cur: Mapped[Decimal] = mapped_column(
         DECIMAL(precision=20, scale=4), nullable=True
     )  # FACEVALUE (в валюте номинала FACEUNIT)
-    nominal_rub: Mapped[Decimal] = mapped_column(
-        DECIMAL(precision=20, scale=4), nullable=True
-    )  # FACEVALUE * rate
     coupon_value_cur: Mapped[Decimal] = mapped_column(
         DECIMAL(precision=20, scale=4), nullable=True
     )  # COUPONVALUE (в валюте номинала FACEUNIT)
-    coupon_value_rub: Mapped[Decimal] = mapped_column(
-        DECIMAL(precision=20, scale=4), nullable=True
-    )  # COUPONVALUE * rate
     coupon_period: Mapped[int] = mapped_column(
         Integer, nullable=True
     )  # COUPONPERIOD (в днях)
     accum_coupon_cur: Mapped[Decimal] = mapped_column(
         DECIMAL(precision=20, scale=4), nullable=True
     )  # ACCRUEDINT (в валюте расчетов CURRENCYID)
-    accum_coupon_rub: Mapped[Decimal] = mapped_column(
-        DECIMAL(precision=20, scale=4), nullable=True
-    )  # ACCRUEDINT * rate
     cur_of_nominal: Mapped[str] = mapped_column(
         String, nullable=True
     )  # FACEUNIT
@@ -67,6 +55,183 @@ class Bond(Base):
     next_coupon_date: Mapped[datetime] = mapped_column(DateTime, nullable=True)  # NEXTCOUPON
     maturity_date: Mapped[datetime] = mapped_column(DateTime, nullable=True)  # MATDATE
     loading_date: Mapped[datetime] = mapped_column(DateTime)  # loading date
+    board: Mapped[str] = mapped_column(
+        String, nullable=True
+    )  # BOARDID (режим торгов, из которого загружена облигация)
+    last_price: Mapped[Decimal] = mapped_column(
+        DECIMAL(precision=20, scale=4), nullable=True
+    )  # LAST (цена последней сделки в % от номинала, в течение дня)
+    intraday_waprice: Mapped[Decimal] = mapped_column(
+        DECIMAL(precision=20, scale=4), nullable=True
+    )  # WAPRICE (средневзвешенная цена текущего дня в % от номинала)
+    intraday_yield: Mapped[Decimal] = mapped_column(
+        DECIMAL(precision=20, scale=4), nullable=True
+    )  # YIELD (доходность по цене последней сделки, в процентах)
+    marketdata_time: Mapped[datetime] = mapped_column(
+        DateTime, nullable=True
+    )  # SYSTIME последнего изменения LAST, WAPRICE или YIELD
+    updated_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), server_default=func.now()
+    )  # время последней записи строки по часам БД (версия данных для ETag)
+    schedule_updated_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), nullable=True
+    )  # время последней перезаписи графика выплат по часам БД (версия метрик для ETag)
+
+
+# Модель данных по историческим ценам облигаций
+class BondHistory(Base):
+    __tablename__ = "bond_history"
+    __table_args__ = (
+        UniqueConstraint("ticker", "trade_date"),
+    )
+
+    id: Mapped[int] = mapped_column(
+        Integer,
+        primary_key=True,
+        index=True
+    )
+    ticker: Mapped[str] = mapped_column(
+        String,
+        index=True
+    )  # SECID
+    trade_date: Mapped[date] = mapped_column(
+        Date
+    )  # TRADEDATE
+    close_price: Mapped[Decimal] = mapped_column(
+        DECIMAL(precision=20, scale=4), nullable=True
+    )  # LEGALCLOSEPRICE (в % от номинала)
+    waprice_cur: Mapped[Decimal] = mapped_column(
+        DECIMAL(precision=20, scale=4), nullable=True
+    )  # WAPRICE * FACEVALUE / 100 (в валюте номинала FACEUNIT)
+    waprice_rub: Mapped[Decimal] = mapped_column(
+        DECIMAL(precision=20, scale=4), nullable=True
+    )  # WAPRICE * FACEVALUE / 100 * rate
+
+
+# Модель данных графиков выплат облигаций (ISS bondization)
+class CouponSchedule(Base):
+    __tablename__ = "coupon_schedule"
+    __table_args__ = (
+        UniqueConstraint("ticker", "kind", "pay_date"),
+    )
+
+    id: Mapped[int] = mapped_column(
+        Integer,
+        primary_key=True,
+        index=True
+    )
+    ticker: Mapped[str] = mapped_column(
+        String,
+        index=True
+    )  # SECID
+    kind: Mapped[str] = mapped_column(
+        String
+    )  # вид выплаты (coupon, amortization, offer)
+    pay_date: Mapped[date] = mapped_column(
+        Date
+    )  # coupondate / amortdate / offerdate
+    value: Mapped[Decimal] = mapped_column(
+        DECIMAL(precision=20, scale=6), nullable=True
+    )  # сумма на одну облигацию в валюте номинала (для будущих купонов флоатеров - NULL)
+    value_prct: Mapped[Decimal] = mapped_column(
+        DECIMAL(precision=20, scale=6), nullable=True
+    )  # ставка купона / доля номинала / цена оферты (в процентах)
+
+
+# Модель данных предрассчитанных метрик облигаций
+class PrecomputedMetrics(Base):
+    __tablename__ = "bond_metrics"
+
+    id: Mapped[int] = mapped_column(
+        Integer,
+        primary_key=True,
+        index=True
+    )
+    ticker: Mapped[str] = mapped_column(
+        String,
+        unique=True
+    )  # SECID
+    calc_date: Mapped[date] = mapped_column(
+        Date
+    )  # дата расчета
+    current_yield: Mapped[Decimal] = mapped_column(
+        DECIMAL(precision=20, scale=4), nullable=True
+    )  # текущая доходность (в процентах)
+    ytm_prct: Mapped[Decimal] = mapped_column(
+        DECIMAL(precision=20, scale=4), nullable=True
+    )  # доходность к погашению (в процентах)
+    curve_yield: Mapped[Decimal] = mapped_column(
+        DECIMAL(precision=20, scale=4), nullable=True
+    )  # доходность по кривой ОФЗ на срок до погашения (в процентах)
+    g_spread: Mapped[Decimal] = mapped_column(
+        DECIMAL(precision=20, scale=4), nullable=True
+    )  # G-спред к кривой ОФЗ (в базисных пунктах)
+    curve_fair_value: Mapped[Decimal] = mapped_column(
+        DECIMAL(precision=20, scale=4), nullable=True
+    )  # справедливая стоимость при дисконтировании по кривой ОФЗ (в рублях)
+
+
+# Модель данных параметров кривой бескупонной доходности ОФЗ (Нельсона-Сигеля-Свенссона)
+class YieldCurve(Base):
+    __tablename__ = "yield_curves"
+
+    id: Mapped[int] = mapped_column(
+        Integer,
+        primary_key=True,
+        index=True
+    )
+    calc_date: Mapped[date] = mapped_column(
+        Date,
+        unique=True
+    )  # дата расчета
+    board: Mapped[str] = mapped_column(
+        String
+    )  # режим торгов облигаций, по которым подобрана кривая
+    beta0: Mapped[float] = mapped_column(Float)
+    beta1: Mapped[float] = mapped_column(Float)
+    beta2: Mapped[float] = mapped_column(Float)
+    beta3: Mapped[float] = mapped_column(Float)
+    tau1: Mapped[float] = mapped_column(Float)
+    tau2: Mapped[float] = mapped_column(Float)
+    bonds_count: Mapped[int] = mapped_column(
+        Integer
+    )  # число облигаций, по которым подобрана кривая
+    rmse_bp: Mapped[float] = mapped_column(
+        Float
+    )  # среднеквадратичная ошибка в доходности (в базисных пунктах)
+
+
+# Модель данных итогов фоновых загрузок (длительность и число строк по этапам)
+class LoadRun(Base):
+    __tablename__ = "load_runs"
+    __table_args__ = (
+        Index("ix_load_runs_kind_started_at", "kind", "started_at"),
+    )
+
+    id: Mapped[str] = mapped_column(
+        String,
+        primary_key=True
+    )  # идентификатор фоновой задачи
+    kind: Mapped[str] = mapped_column(
+        String
+    )  # вид задачи (currencies, bonds, history, schedules, metrics)
+    params: Mapped[dict] = mapped_column(
+        JSON
+    )  # параметры задачи
+    status: Mapped[str] = mapped_column(
+        String
+    )  # done / failed
+    started_at: Mapped[datetime] = mapped_column(DateTime, nullable=True)
+    finished_at: Mapped[datetime] = mapped_column(DateTime)
+    duration_sec: Mapped[float] = mapped_column(
+        Float
+    )
+    stages: Mapped[list] = mapped_column(
+        JSON
+    )  # [{name, duration_sec, rows}]
+    error: Mapped[str] = mapped_column(
+        String, nullable=True
+    )
 
 
 # Модель данных валют
@@ -82,12 +247,73 @@ class Currency(Base):
         String
     )
     currency_code: Mapped[str] = mapped_column(
-        String
+        String,
+        unique=True
     )
     curs: Mapped[Decimal] = mapped_column(
-        DECIMAL(precision=10, scale=2)
+        DECIMAL(precision=20, scale=6)
+    )  # курс за одну единицу валюты (Value / Nominal)
+    loading_date: Mapped[datetime] = mapped_column(
+        DateTime, nullable=True
+    )  # дата и время загрузки курса
+    updated_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), server_default=func.now()
+    )  # время последней записи курса по часам БД (версия данных для ETag)
+
+
+def currency_rate(currency_code):
+    return select(Currency.curs).where(Currency.currency_code == currency_code).scalar_subquery()
+
+
+# Суммы облигаций в рублях не хранятся, а рассчитываются при чтении по текущему
+# курсу из таблицы currencies: при обновлении курсов меняются только строки валют
+Bond.prevwaprice_rub = column_property(
+    func.round(func.nullif(Bond.prevwaprice_cur, 0) * currency_rate(Bond.cur_of_nominal), 4)
+)  # PREVWAPRICE * rate (нулевая цена - нет сделок)
+Bond.nominal_rub = column_property(
+    func.round(Bond.nominal_cur * currency_rate(Bond.cur_of_nominal), 4)
+)  # FACEVALUE * rate
+Bond.coupon_value_rub = column_property(
+    func.round(Bond.coupon_value_cur * currency_rate(Bond.cur_of_nominal), 4)
+)  # COUPONVALUE * rate
+Bond.accum_coupon_rub = column_property(
+    func.round(Bond.accum_coupon_cur * currency_rate(Bond.cur_of_market), 4)
+)  # ACCRUEDINT * rate
+Bond.last_price_cur = column_property(
+    func.round(Bond.last_price * Bond.nominal_cur / 100, 4)
+)  # LAST * FACEVALUE / 100
+Bond.last_price_rub = column_property(
+    func.round(Bond.last_price * Bond.nominal_cur / 100 * currency_rate(Bond.cur_of_nominal), 4)
+)  # LAST * FACEVALUE / 100 * rate
+Bond.rates_updated_at = column_property(
+    select(func.max(Currency.updated_at)).where(
+        Currency.currency_code.in_([Bond.cur_of_nominal, Bond.cur_of_market])
+    ).scalar_subquery()
+)  # время записи курсов, по которым рассчитаны суммы в рублях
+
+
+# Модель данных курсов валют ЦБ РФ по датам
+class CurrencyRate(Base):
+    __tablename__ = "currency_rates"
+    __table_args__ = (
+        UniqueConstraint("code", "rate_date"),
     )
 
+    id: Mapped[int] = mapped_column(
+        Integer,
+        primary_key=True,
+        index=True
+    )
+    code: Mapped[str] = mapped_column(
+        String
+    )  # CharCode
+    rate_date: Mapped[date] = mapped_column(
+        Date
+    )  # дата установления курса
+    rate: Mapped[Decimal] = mapped_column(
+        DECIMAL(precision=20, scale=6)
+    )  # курс за одну единицу валюты (Value / Nominal)
+
 
 # Модель данных пользователей
 class Users(Base):
@@ -1,7 +1,7 @@
-from datetime import datetime
+from datetime import datetime, date
 from decimal import Decimal
 
-from pydantic import BaseModel, field_validator
+from pydantic import BaseModel, Field, field_validator
 from typing import Optional
 
 
@@ -28,6 +28,13 @@ class BondInfo(TickerBase):
     next_coupon_date: Optional[datetime] = None
     maturity_date: Optional[datetime] = None
     loading_date: datetime
+    board: Optional[str] = None
+    last_price: Optional[Decimal] = None
+    last_price_cur: Optional[Decimal] = None
+    last_price_rub: Optional[Decimal] = None
+    intraday_waprice: Optional[Decimal] = None
+    intraday_yield: Optional[Decimal] = None
+    marketdata_time: Optional[datetime] = None
 
 
 class Currency(BaseModel):
@@ -43,6 +50,19 @@ class BondMetrics(TickerBase):
     conclusion: str
 
 
+class BondMetricsPoint(BaseModel):
+    trade_date: date
+    prevwaprice_rub: Decimal
+    current_yield: Decimal
+    ytm_prct: Decimal | None = None
+    fair_value: Decimal
+
+
+class BondMetricsHistory(TickerBase):
+    r: float
+    history: list[BondMetricsPoint]
+
+
 class BondsCorrelation(BaseModel):
     ticker_1: str
     name_1: str
@@ -62,6 +82,158 @@ class BondsCorrelation(BaseModel):
         return round(v, 8)
 
 
+class CurvePoint(BaseModel):
+    term_years: float
+    zero_yield_prct: float
+
+
+class YieldCurve(BaseModel):
+    calc_date: date
+    board: str
+    beta0: float
+    beta1: float
+    beta2: float
+    beta3: float
+    tau1: float
+    tau2: float
+    bonds_count: int
+    rmse_bp: float
+    points: list[CurvePoint]
+
+
+class BondSpread(TickerBase):
+    calc_date: date
+    ytm_prct: Decimal | None = None
+    curve_yield: Decimal
+    g_spread: Decimal
+    curve_fair_value: Decimal | None = None
+
+
+class RateShock(BaseModel):
+    name: str | None = None
+    parallel_bp: float = 0.0
+    twist_bp: float = 0.0
+    pivot_years: float = Field(5.0, gt=0)
+
+
+class ScenarioRequest(BaseModel):
+    tickers: list[str] | None = None
+    shocks: list[RateShock] = Field(..., min_length=1, max_length=200)
+
+
+class ScenarioGrid(BaseModel):
+    calc_date: date
+    tickers: list[str]
+    shocks: list[str]
+    price: list[float]
+    ytm_prct: list[float]
+    fair_value: list[list[float]]
+    price_change_prct: list[list[float]]
+    skipped: list[str]
+
+
+class PortfolioPosition(BaseModel):
+    ticker: str
+    quantity: float = Field(..., gt=0)
+
+
+class PortfolioRequest(BaseModel):
+    positions: list[PortfolioPosition] = Field(..., min_length=1, max_length=5000)
+
+
+class CurrencyExposure(BaseModel):
+    currency: str
+    market_value: float
+    share_prct: float
+
+
+class CashFlowLadderPoint(BaseModel):
+    month: date
+    amount: float
+
+
+class PortfolioAnalysis(BaseModel):
+    calc_date: date
+    market_value: float
+    accrued_interest: float
+    ytm_prct: float
+    modified_duration: float
+    convexity: float
+    currencies: list[CurrencyExposure]
+    cash_flow_ladder: list[CashFlowLadderPoint]
+    skipped: list[str]
+
+
+class PortfolioRiskRequest(PortfolioRequest):
+    window_days: int = Field(250, ge=20, le=2000)
+    confidence_levels: list[float] = Field([0.95, 0.99], min_length=1, max_length=10)
+    horizon_days: int = Field(1, ge=1, le=250)
+
+    @field_validator("confidence_levels")
+    def check_levels(cls, v: list[float]):
+        if any(not 0.5 <= level < 1 for level in v):
+            raise ValueError("confidence levels must be in [0.5, 1)")
+        return v
+
+
+class RiskLevel(BaseModel):
+    confidence: float
+    historical_var: float
+    historical_es: float
+    parametric_var: float
+    parametric_es: float
+
+
+class PortfolioRisk(BaseModel):
+    calc_date: date
+    date_from: date
+    date_till: date
+    observations: int
+    horizon_days: int
+    market_value: float
+    risk: list[RiskLevel]
+    skipped: list[str]
+
+
+class JobStageInfo(BaseModel):
+    name: str
+    started_at: datetime
+    finished_at: datetime | None = None
+    duration_sec: float
+    rows: int = 0
+
+
+class JobInfo(BaseModel):
+    id: str
+    kind: str
+    params: dict
+    status: str
+    created_at: datetime
+    started_at: datetime | None = None
+    finished_at: datetime | None = None
+    progress: dict
+    stages: list[JobStageInfo]
+    error: str | None = None
+
+
+class LoadRunStage(BaseModel):
+    name: str
+    duration_sec: float
+    rows: int = 0
+
+
+class LoadRun(BaseModel):
+    id: str
+    kind: str
+    params: dict
+    status: str
+    started_at: datetime | None = None
+    finished_at: datetime
+    duration_sec: float
+    stages: list[LoadRunStage]
+    error: str | None = None
+
+
 class Token(BaseModel):
     access_token: str
     token_type: str
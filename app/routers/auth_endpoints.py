@@ -8,7 +8,7 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from auth.auth import authenticate_user, create_access_token
 from config import ACCESS_TOKEN_EXPIRE_MINUTES
 from models import schemas, crud
-from models.database import get_db
+from models.database import get_write_db
 from utils.hash_utils import get_password_hash
 
 router = APIRouter(
@@ -20,7 +20,7 @@ router = APIRouter(
 @router.post("/register")
 async def register_user(
         user_data: schemas.UserRegister,
-        db: AsyncSession = Depends(get_db)
+        db: AsyncSession = Depends(get_write_db)
 ):
     hashed_password = get_password_hash(user_data.password)
     user_to_db = schemas.UserToDB(
@@ -36,10 +36,12 @@ async def register_user(
     return {"message": "Пользователь успешно добавлен"}
 
 
+# Пользователь читается из основной БД: сразу после /auth/register
+# он может еще не появиться на реплике
 @router.post("/token")
 async def login_for_access_token(
         form_data: Annotated[OAuth2PasswordRequestForm, Depends()],
-        db: AsyncSession = Depends(get_db)
+        db: AsyncSession = Depends(get_write_db)
 ) -> schemas.Token:
     user = await authenticate_user(db=db,
                                    username=form_data.username,
@@ -1,16 +1,25 @@
+from datetime import date, datetime, timedelta
+from decimal import Decimal
 from typing import Sequence, Annotated
 
-from fastapi import APIRouter, Depends, Query, HTTPException
+import numpy as np
+from fastapi import APIRouter, Depends, Query, HTTPException, Request, Response
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from auth.auth import get_current_active_user
 from models import schemas, crud
-from models.database import get_db
+from models.database import get_read_db
 from models.models import Bond
 from utils.MOEX_gateway import MOEXGateway, NotEnoughObservations
+from utils.currency_rates import load_rate_history
+from utils.http_client import UpstreamError
+from utils.http_cache import conditional_response
 
 from utils.evaluating_bond_metrics import (without_coupons_metrics, one_coupon_metrics,
-                                           several_coupons_metrics)
+                                           several_coupons_metrics, history_metrics, build_schedules,
+                                           cash_flow_matrix, solve_ytm_matrix, scenario_fair_values,
+                                           market_prices)
+from utils.yield_curve import NSSParams, annual_zero_rates
 
 router = APIRouter(
     prefix="/bonds",
@@ -18,15 +27,41 @@ router = APIRouter(
 )
 
 
+def bond_version_date(bond_info: Bond, with_schedule: bool = False) -> datetime:
+    """
+    Функция для определения даты версии данных облигации: суммы в рублях
+    рассчитываются при чтении по текущим курсам, а цены обновляются
+    в течение дня, поэтому ответ меняется при загрузке облигации,
+    при загрузке курсов валют и при изменении внутридневных цен
+    (а метрики - и при перезаписи графика выплат).
+    Все времена записи берутся по часам БД (с часовым поясом),
+    поэтому их можно сравнивать между собой
+
+    :param bond_info: объект облигации
+    :param with_schedule: учитывать время перезаписи графика выплат
+    :return: дата последнего изменения данных облигации
+    """
+    return max(filter(None, (bond_info.updated_at, bond_info.rates_updated_at,
+                             bond_info.schedule_updated_at if with_schedule else None)))
+
+
 # Метод для получения списка доступных тикеров и названий облигаций
 @router.get("/",
             response_model=list[schemas.TickerBase],
             name="Получение тикеров и названий всех облигаций")
 async def get_all_bonds(
         current_user: Annotated[schemas.UserInDB, Depends(get_current_active_user)],
-        db: AsyncSession = Depends(get_db)
-) -> Sequence[Bond]:
-    bonds = await crud.get_bonds(db=db)
+        request: Request,
+        response: Response,
+        db: AsyncSession = Depends(get_read_db)
+) -> Sequence[dict] | Response:
+    loading_date = await crud.get_snapshot_loading_date(db=db)
+    if loading_date is not None:
+        not_modified = conditional_response(request, response, loading_date, key="bonds")
+        if not_modified is not None:
+            return not_modified
+
+    bonds = await crud.get_bond_tickers(db=db)
     return bonds
 
 
@@ -37,14 +72,20 @@ async def get_all_bonds(
 async def get_bond_info(
         current_user: Annotated[schemas.UserInDB, Depends(get_current_active_user)],
         ticker: str,
-        db: AsyncSession = Depends(get_db)
-) -> Bond:
+        request: Request,
+        response: Response,
+        db: AsyncSession = Depends(get_read_db)
+) -> Bond | Response:
     """
     Предупреждение! Информация о размере купона не гарантирует,
     что данный купон остается неизменным до погашения облигации,
     т.к. купон может быть переменным.
     """
     bond_info = await crud.get_bond_info_by_ticker(db=db, ticker=ticker)
+    not_modified = conditional_response(request, response, bond_version_date(bond_info),
+                                        key=f"info|{ticker}")
+    if not_modified is not None:
+        return not_modified
     return bond_info
 
 
@@ -54,36 +95,52 @@ async def get_bond_info(
 async def get_bond_metrics(
         current_user: Annotated[schemas.UserInDB, Depends(get_current_active_user)],
         ticker: str,
+        request: Request,
+        response: Response,
         r: float = Query(..., gt=1, lt=50,
                          description="Ставка дисконтирования/желаемая доходность (в процентах)",
                          alias="r"),
-        db: AsyncSession = Depends(get_db)
-) -> schemas.BondMetrics:
+        db: AsyncSession = Depends(get_read_db)
+) -> schemas.BondMetrics | Response:
     """
     Функция для получения рассчитанных метрик облигации по ее тикеру
 
-    Предупреждение! При расчете метрик не учитывается возможность того,
-    что облигации могут иметь переменный купон, т.к. Московская биржа
-    не предоставляет соответствующую информацию через свой MOEX ISS.
-    Потому все расчеты основаны на допущении, что размер купона и частота
+    Если загружен график выплат облигации (купоны и амортизации из MOEX ISS),
+    дисконтируются фактические денежные потоки; неизвестные будущие купоны
+    (у облигаций с переменным купоном) принимаются равными текущему.
+    Иначе расчеты основаны на допущении, что размер купона и частота
     его выплаты остаются неизменными до погашения облигации.
 
     :param current_user: проверка на доступ конкретного пользователя
     :param ticker: тикер облигации
+    :param request: объект запроса (для условных запросов с ETag)
+    :param response: объект ответа (для заголовков кэширования)
     :param r: ставка дисконтирования (в процентах)
     :param db: объект подключения к БД
     :return: объект класса BondMetrics (метрики облигации)
     """
 
     bond_info = await crud.get_bond_info_by_ticker(db=db, ticker=ticker)
+    not_modified = conditional_response(request, response, bond_version_date(bond_info, with_schedule=True),
+                                        key=f"metrics|{ticker}|{r}")
+    if not_modified is not None:
+        return not_modified
 
     if bond_info.prevwaprice_rub is None:
         raise HTTPException(status_code=422, detail='Недостаточно данных для расчетов '
                                                     '(отсутствует средневзвешенная цена '
                                                     'предыдущей торговой сессии)')
 
+    # График выплат из ISS (купоны и амортизации), если он загружен
+    schedule = build_schedules(await crud.get_coupon_schedule(
+        db=db, tickers=[ticker], kinds=("coupon", "amortization"))).get(ticker)
+
+    # Если загружен график выплат, дисконтируются фактические денежные потоки
+    if schedule is not None:
+        current_yield, round_ytm, fair_value = several_coupons_metrics(r, bond_info, schedule)
+
     # Если облигация бескупонная
-    if bond_info.coupon_value_rub == 0:
+    elif bond_info.coupon_value_rub == 0:
         current_yield, round_ytm, fair_value = without_coupons_metrics(r, bond_info)
 
     # Если дата ближайшего купона совпадает с датой погашения
@@ -129,6 +186,205 @@ async def get_bond_metrics(
     return bond_metrics
 
 
+@router.get("/{ticker}/metrics/history",
+            response_model=schemas.BondMetricsHistory,
+            name="Получение временного ряда метрик облигации по ее тикеру")
+async def get_bond_metrics_history(
+        current_user: Annotated[schemas.UserInDB, Depends(get_current_active_user)],
+        ticker: str,
+        r: float = Query(..., gt=1, lt=50,
+                         description="Ставка дисконтирования/желаемая доходность (в процентах)",
+                         alias="r"),
+        date_from: date | None = Query(None, description="Начальная дата периода"),
+        date_till: date | None = Query(None, description="Конечная дата периода"),
+        db: AsyncSession = Depends(get_read_db)
+) -> schemas.BondMetricsHistory:
+    """
+    Функция для получения временного ряда метрик облигации
+    (средневзвешенной цены, текущей доходности, доходности к погашению
+    и справедливой стоимости) по сохраненным историческим ценам.
+    Все точки ряда рассчитываются одним векторным проходом.
+
+    Если загружен график выплат из ISS, дисконтируются фактические купоны
+    и амортизации. Иначе, как и в /{ticker}/metrics, расчеты основаны на допущении,
+    что размер купона и частота его выплаты остаются неизменными до погашения.
+
+    :param current_user: проверка на доступ конкретного пользователя
+    :param ticker: тикер облигации
+    :param r: ставка дисконтирования (в процентах)
+    :param date_from: начальная дата периода
+    :param date_till: конечная дата периода
+    :param db: объект подключения к БД
+    :return: объект класса BondMetricsHistory (временной ряд метрик облигации)
+    """
+
+    bond_info = await crud.get_bond_info_by_ticker(db=db, ticker=ticker)
+    if bond_info.maturity_date is None:
+        raise HTTPException(status_code=422, detail='Недостаточно данных для расчетов '
+                                                    '(отсутствует дата погашения)')
+
+    rows = await crud.get_bond_history(db=db, ticker=ticker,
+                                       date_from=date_from, date_till=date_till)
+    if not rows:
+        raise HTTPException(status_code=404, detail='Нет сохраненных исторических цен '
+                                                    'за указанный период')
+
+    # Цены облигаций в валюте пересчитываются в рубли по курсу на дату торгов
+    # (as-of), если история курсов за период загружена, иначе берутся
+    # сохраненные при загрузке цены в рублях
+    fx = await load_rate_history(db=db, code=bond_info.cur_of_nominal,
+                                 date_from=rows[0].trade_date, date_till=rows[-1].trade_date)
+    trade_dates = np.array([row.trade_date for row in rows], dtype='datetime64[D]')
+    if fx is not None and bond_info.nominal_cur and bond_info.nominal_rub:
+        fx_rates = fx.asof(trade_dates)
+        prices = np.array([row.waprice_cur for row in rows], dtype=float) * fx_rates
+    else:
+        fx_rates = None
+        prices = np.array([row.waprice_rub for row in rows], dtype=float)
+    known = ~np.isnan(prices)
+    if not known.any():
+        raise HTTPException(status_code=404, detail='Нет сохраненных исторических цен '
+                                                    'за указанный период')
+    trade_dates, prices = trade_dates[known], prices[known]
+    if fx_rates is not None:
+        fx_rates = fx_rates[known]
+    schedule = build_schedules(await crud.get_coupon_schedule(
+        db=db, tickers=[ticker], kinds=("coupon", "amortization"))).get(ticker)
+    metrics = history_metrics(r, bond_info, trade_dates, prices, fx_rates, schedule)
+
+    history = [
+        schemas.BondMetricsPoint(
+            trade_date=trade_date,
+            prevwaprice_rub=round(Decimal(price), 4),
+            current_yield=round(Decimal(current_yield), 4),
+            ytm_prct=None if np.isnan(ytm) else round(Decimal(ytm), 4),
+            fair_value=round(Decimal(fair_value), 4)
+        )
+        for trade_date, price, current_yield, ytm, fair_value in zip(
+            trade_dates.tolist(), prices.tolist(), metrics['current_yield'].tolist(),
+            metrics['ytm_prct'].tolist(), metrics['fair_value'].tolist()
+        )
+    ]
+
+    return schemas.BondMetricsHistory(
+        ticker=bond_info.ticker,
+        name=bond_info.name,
+        r=r,
+        history=history
+    )
+
+
+# Сроки (в годах), в которых кривая бескупонной доходности отдается в ответе /bonds/curve
+CURVE_TERMS = (0.25, 0.5, 0.75, 1, 2, 3, 5, 7, 10, 15, 20, 30)
+
+
+# Метод для получения кривой бескупонной доходности ОФЗ
+# (подбирается при ночном пересчете метрик, в запросе не пересчитывается)
+@router.get("/curve",
+            response_model=schemas.YieldCurve,
+            name="Получение кривой бескупонной доходности ОФЗ")
+async def get_yield_curve(
+        current_user: Annotated[schemas.UserInDB, Depends(get_current_active_user)],
+        calc_date: date | None = Query(None, description="Дата расчета (по умолчанию - последняя)"),
+        db: AsyncSession = Depends(get_read_db)
+) -> schemas.YieldCurve:
+    curve = await crud.get_yield_curve(db=db, calc_date=calc_date)
+    params = NSSParams(curve.beta0, curve.beta1, curve.beta2, curve.beta3, curve.tau1, curve.tau2)
+    zero_yields = annual_zero_rates(params, np.array(CURVE_TERMS, dtype=float))
+    return schemas.YieldCurve(
+        calc_date=curve.calc_date,
+        board=curve.board,
+        beta0=curve.beta0,
+        beta1=curve.beta1,
+        beta2=curve.beta2,
+        beta3=curve.beta3,
+        tau1=curve.tau1,
+        tau2=curve.tau2,
+        bonds_count=curve.bonds_count,
+        rmse_bp=curve.rmse_bp,
+        points=[schemas.CurvePoint(term_years=term, zero_yield_prct=round(zero_yield, 4))
+                for term, zero_yield in zip(CURVE_TERMS, zero_yields.tolist())]
+    )
+
+
+# Метод для получения G-спредов облигаций к кривой ОФЗ
+# (рассчитываются при ночном пересчете метрик, по убыванию спреда)
+@router.get("/spreads",
+            response_model=list[schemas.BondSpread],
+            name="Получение G-спредов облигаций к кривой ОФЗ")
+async def get_bond_spreads(
+        current_user: Annotated[schemas.UserInDB, Depends(get_current_active_user)],
+        limit: int = Query(100, ge=1, le=1000, description="Число облигаций"),
+        offset: int = Query(0, ge=0, description="Смещение"),
+        db: AsyncSession = Depends(get_read_db)
+) -> Sequence[dict]:
+    return await crud.get_bond_spreads(db=db, limit=limit, offset=offset)
+
+
+# Метод для расчета стоимости облигаций по сценариям изменения ставок
+# (матрица облигации x сценарии за один запрос)
+@router.post("/scenarios",
+             response_model=schemas.ScenarioGrid,
+             name="Расчет стоимости облигаций по сценариям изменения ставок")
+async def get_bond_scenarios(
+        current_user: Annotated[schemas.UserInDB, Depends(get_current_active_user)],
+        scenario_request: schemas.ScenarioRequest,
+        db: AsyncSession = Depends(get_read_db)
+) -> schemas.ScenarioGrid:
+    """
+    Функция для расчета справедливой стоимости и изменения цены облигаций
+    при параллельных сдвигах и поворотах ставок. Каждая выплата облигации
+    дисконтируется по ее доходности к погашению, измененной на сдвиг
+    сценария для срока выплаты; вся матрица (облигации x сценарии)
+    считается одним вычислением над массивами денежных потоков.
+    Доходность считается по грязной цене, справедливая стоимость - чистая.
+
+    :param current_user: проверка на доступ конкретного пользователя
+    :param scenario_request: тикеры облигаций (если не указаны - все облигации) и сценарии
+    :param db: объект подключения к БД
+    :return: объект класса ScenarioGrid (матрицы стоимости и изменения цены,
+             строки - облигации, столбцы - сценарии)
+    """
+    tickers = scenario_request.tickers
+    bonds = await crud.get_bonds(db=db, tickers=tickers)
+    schedules = build_schedules(await crud.get_coupon_schedule(
+        db=db, tickers=tickers, kinds=("coupon", "amortization")))
+
+    val_date = np.datetime64(date.today(), 'D')
+    valued = [bond_info for bond_info in bonds
+              if bond_info.prevwaprice_rub and bond_info.nominal_rub and bond_info.maturity_date
+              and np.datetime64(bond_info.maturity_date, 'D') > val_date]
+    times, amounts = cash_flow_matrix(valued, val_date, schedules)
+    # Доходность считается по грязной цене, а справедливая стоимость
+    # приводится к чистой цене, чтобы сравнивать ее с ценой облигации
+    prices, accrued, dirty = market_prices(valued)
+    ytm = solve_ytm_matrix(times, amounts, dirty)
+    known = np.isfinite(ytm)
+
+    shocks = scenario_request.shocks
+    fair_value = scenario_fair_values(
+        times[known], amounts[known], ytm[known],
+        np.array([shock.parallel_bp for shock in shocks]),
+        np.array([shock.twist_bp for shock in shocks]),
+        np.array([shock.pivot_years for shock in shocks])
+    ) - accrued[known, None]
+    price_change = (fair_value / prices[known, None] - 1) * 100
+
+    valued_tickers = {bond_info.ticker for bond_info, ok in zip(valued, known.tolist()) if ok}
+    requested = tickers if tickers is not None else [bond_info.ticker for bond_info in bonds]
+    return schemas.ScenarioGrid(
+        calc_date=date.today(),
+        tickers=[bond_info.ticker for bond_info, ok in zip(valued, known.tolist()) if ok],
+        shocks=[shock.name or f"parallel {shock.parallel_bp:g} bp, twist {shock.twist_bp:g} bp"
+                for shock in shocks],
+        price=prices[known].round(4).tolist(),
+        ytm_prct=ytm[known].round(4).tolist(),
+        fair_value=fair_value.round(4).tolist(),
+        price_change_prct=price_change.round(4).tolist(),
+        skipped=[ticker for ticker in requested if ticker not in valued_tickers]
+    )
+
+
 @router.get("/correlation",
             response_model=schemas.BondsCorrelation,
             name="Получение корреляции между облигациями")
@@ -136,7 +392,7 @@ async def get_bonds_corr(
         current_user: Annotated[schemas.UserInDB, Depends(get_current_active_user)],
         ticker_1: str = Query(..., description="Тикер первой облигации"),
         ticker_2: str = Query(..., description="Тикер второй облигации"),
-        db: AsyncSession = Depends(get_db)
+        db: AsyncSession = Depends(get_read_db)
 ) -> schemas.BondsCorrelation:
     """
     Функция для получения данных о корреляции между двумя облигациями по их тикерам.
@@ -155,12 +411,22 @@ async def get_bonds_corr(
     bond_1_info = await crud.get_bond_info_by_ticker(db=db, ticker=ticker_1)
     bond_2_info = await crud.get_bond_info_by_ticker(db=db, ticker=ticker_2)
 
+    # Цены облигаций в валюте пересчитываются в рубли по курсу на дату торгов
+    date_till = date.today()
+    date_from = date_till - timedelta(days=365)
+    fx_1 = await load_rate_history(db=db, code=bond_1_info.cur_of_nominal,
+                                   date_from=date_from, date_till=date_till)
+    fx_2 = await load_rate_history(db=db, code=bond_2_info.cur_of_nominal,
+                                   date_from=date_from, date_till=date_till)
+
     moex = MOEXGateway()
 
     try:
-        corr_dict = await moex.load_hist_bond_data(ticker_1, ticker_2)
+        corr_dict = await moex.load_hist_bond_data(ticker_1, ticker_2, fx_1, fx_2)
     except NotEnoughObservations as e:
         raise HTTPException(status_code=422, detail=str(e))
+    except UpstreamError:
+        raise HTTPException(status_code=503, detail='Источник данных ISS MOEX временно недоступен')
     except Exception:
         raise HTTPException(status_code=500, detail=f'Ошибка при расчете корреляции')
 
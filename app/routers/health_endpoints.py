@@ -0,0 +1,49 @@
+import os
+from typing import Annotated
+
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import FileResponse
+
+from auth.auth import get_current_admin_user
+from models import schemas
+from models.database import pool_stats
+from utils.profiling import profile_path
+
+router = APIRouter(
+    prefix="/health",
+    tags=["health"]
+)
+
+
+# Метод для получения состояния пула соединений с БД
+@router.get("/db")
+async def get_db_pool_health() -> dict:
+    """
+    Функция для получения состояния пулов соединений с основной БД
+    и репликами: число занятых и свободных соединений, время ожидания
+    соединения, число таймаутов пула и ошибок подключения
+
+    :return: словарь со статистикой пулов
+    """
+    return {name: stats.snapshot() for name, stats in pool_stats.items()}
+
+
+# Метод для получения сохраненного профиля запроса
+@router.get("/profiles/{profile_id}")
+async def get_profile(
+        profile_id: str,
+        current_user: Annotated[schemas.UserInDB, Depends(get_current_admin_user)]
+) -> FileResponse:
+    """
+    Функция для получения профиля запроса в формате speedscope
+    (открывается на https://www.speedscope.app). Идентификатор профиля
+    возвращается в заголовке X-Profile-Id профилируемого запроса
+
+    :param profile_id: идентификатор профиля
+    :param current_user: текущий пользователь (администратор)
+    :return: файл профиля
+    """
+    path = profile_path(profile_id)
+    if not profile_id.isalnum() or not os.path.exists(path):
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return FileResponse(path, media_type="application/json")
@@ -0,0 +1,140 @@
+from datetime import date, timedelta
+from typing import Annotated
+
+import numpy as np
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from auth.auth import get_current_active_user
+from models import schemas, crud
+from models.database import get_read_db
+from utils.currency_rates import load_rate_history
+from utils.evaluating_bond_metrics import build_schedules
+from utils.portfolio import analyze_portfolio, aligned_price_matrix, value_at_risk
+
+MIN_RISK_OBSERVATIONS = 20  # минимальное число дневных доходностей для расчета VaR
+
+router = APIRouter(
+    prefix="/portfolios",
+    tags=["portfolios"]
+)
+
+
+# Метод для расчета показателей портфеля облигаций
+# (все облигации портфеля загружаются из БД одним запросом)
+@router.post("/analyze",
+             response_model=schemas.PortfolioAnalysis,
+             name="Расчет показателей портфеля облигаций")
+async def analyze(
+        current_user: Annotated[schemas.UserInDB, Depends(get_current_active_user)],
+        portfolio: schemas.PortfolioRequest,
+        db: AsyncSession = Depends(get_read_db)
+) -> schemas.PortfolioAnalysis:
+    """
+    Функция для расчета показателей портфеля облигаций: рыночная стоимость
+    и накопленный купонный доход, средневзвешенная (по стоимости) доходность
+    к погашению, модифицированная дюрация и выпуклость, распределение
+    стоимости по валютам номинала и помесячный график поступлений
+    (купоны и погашения) в российской валюте.
+
+    :param current_user: проверка на доступ конкретного пользователя
+    :param portfolio: позиции портфеля (тикер и количество облигаций)
+    :param db: объект подключения к БД
+    :return: объект класса PortfolioAnalysis (показатели портфеля)
+    """
+    quantities = {}
+    for position in portfolio.positions:
+        quantities[position.ticker] = quantities.get(position.ticker, 0) + position.quantity
+    tickers = list(quantities)
+
+    bonds = await crud.get_bonds(db=db, tickers=tickers)
+    schedules = build_schedules(await crud.get_coupon_schedule(
+        db=db, tickers=tickers, kinds=("coupon", "amortization")))
+    result = analyze_portfolio(bonds, quantities, np.datetime64(date.today(), 'D'), schedules)
+    if not result['tickers']:
+        raise HTTPException(status_code=422, detail='Недостаточно данных для расчетов '
+                                                    '(нет облигаций с ценой и датой погашения)')
+
+    analyzed = set(result['tickers'])
+    return schemas.PortfolioAnalysis(
+        calc_date=date.today(),
+        market_value=round(result['market_value'], 2),
+        accrued_interest=round(result['accrued_interest'], 2),
+        ytm_prct=round(result['ytm_prct'], 4),
+        modified_duration=round(result['modified_duration'], 4),
+        convexity=round(result['convexity'], 4),
+        currencies=[schemas.CurrencyExposure(currency=currency, market_value=round(value, 2),
+                                             share_prct=round(share, 4))
+                    for currency, value, share in result['currencies']],
+        cash_flow_ladder=[schemas.CashFlowLadderPoint(month=month, amount=round(amount, 2))
+                          for month, amount in result['cash_flow_ladder']],
+        skipped=[ticker for ticker in tickers if ticker not in analyzed]
+    )
+
+
+# Метод для расчета исторического и параметрического VaR и ES портфеля облигаций
+# по сохраненным историческим ценам
+@router.post("/risk",
+             response_model=schemas.PortfolioRisk,
+             name="Расчет VaR и ES портфеля облигаций")
+async def portfolio_risk(
+        current_user: Annotated[schemas.UserInDB, Depends(get_current_active_user)],
+        portfolio: schemas.PortfolioRiskRequest,
+        db: AsyncSession = Depends(get_read_db)
+) -> schemas.PortfolioRisk:
+    """
+    Функция для расчета VaR и ожидаемых потерь (ES) портфеля облигаций
+    по историческим ценам за последние window_days торговых дней
+    (исторический метод и нормальное приближение) для нескольких
+    уровней доверия. Цены облигаций выравниваются по датам в одну матрицу
+    (дни без сделок заполняются последней ценой, цены в валюте пересчитываются
+    в рубли по курсу на дату торгов), которая используется для всех уровней.
+
+    :param current_user: проверка на доступ конкретного пользователя
+    :param portfolio: позиции портфеля, окно (в торговых днях), уровни доверия и горизонт
+    :param db: объект подключения к БД
+    :return: объект класса PortfolioRisk (VaR и ES по уровням доверия, в рублях)
+    """
+    quantities = {}
+    for position in portfolio.positions:
+        quantities[position.ticker] = quantities.get(position.ticker, 0) + position.quantity
+
+    bonds = [bond_info for bond_info in await crud.get_bonds(db=db, tickers=list(quantities))
+             if bond_info.prevwaprice_rub]
+    tickers = [bond_info.ticker for bond_info in bonds]
+    currencies = {bond_info.ticker: bond_info.cur_of_nominal for bond_info in bonds}
+
+    # Календарных дней с запасом на выходные и праздники
+    date_till = date.today()
+    date_from = date_till - timedelta(days=portfolio.window_days * 2 + 14)
+    rows = await crud.get_portfolio_history(db=db, tickers=tickers, date_from=date_from) if tickers else []
+    fx = {}
+    for code in {code for code in currencies.values() if code}:
+        history = await load_rate_history(db=db, code=code, date_from=date_from, date_till=date_till)
+        if history is not None:
+            fx[code] = history
+
+    dates, prices = aligned_price_matrix(tickers, rows, currencies, fx)
+    dates, prices = dates[-(portfolio.window_days + 1):], prices[-(portfolio.window_days + 1):]
+    traded = ~np.isnan(prices).all(axis=0)
+    if len(dates) - 1 < MIN_RISK_OBSERVATIONS or not traded.any():
+        raise HTTPException(status_code=422, detail='Недостаточно данных для расчетов '
+                                                    '(мало исторических цен облигаций портфеля)')
+
+    values = np.array([float(bond_info.prevwaprice_rub) * quantities[bond_info.ticker]
+                       for bond_info in bonds])[traded]
+    risk = value_at_risk(prices[:, traded], values, portfolio.confidence_levels, portfolio.horizon_days)
+
+    analyzed = {ticker for ticker, ok in zip(tickers, traded.tolist()) if ok}
+    return schemas.PortfolioRisk(
+        calc_date=date_till,
+        date_from=dates[0].item(),
+        date_till=dates[-1].item(),
+        observations=len(dates) - 1,
+        horizon_days=portfolio.horizon_days,
+        market_value=round(float(values.sum()), 2),
+        risk=[schemas.RiskLevel(**{name: round(float(value), 2) if name != 'confidence' else value
+                                   for name, value in level.items()})
+              for level in risk],
+        skipped=[ticker for ticker in quantities if ticker not in analyzed]
+    )
@@ -1,9 +1,14 @@
-from fastapi import APIRouter, Depends
+from datetime import date
+
+from fastapi import APIRouter, Depends, Query, HTTPException, status
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from models import crud
-from models.database import get_db
-from utils.loading_to_db import load_currency_to_db, load_bonds_to_db
+from models import crud, schemas
+from models.database import get_write_db, get_read_db
+from utils.MOEX_gateway import MOEXGateway
+from utils.jobs import jobs, Job
+from utils.loading_to_db import (refresh_currencies, refresh_bonds, backfill_currency_rates,
+                                 load_history_to_db, load_coupon_schedules_to_db, precompute_metrics_to_db)
 
 router = APIRouter(
     prefix="/update",
@@ -11,21 +16,109 @@ router = APIRouter(
 )
 
 
-# Метод для первичной загрузки данных по валютам в БД
-@router.get("/currencies")
-async def update_all_currencies(
-        db: AsyncSession = Depends(get_db)
-):
-    await crud.delete_currencies(db=db)
-    await load_currency_to_db(db=db)
-    return {"message": "Данные по валютам успешно загружены"}
+# Метод для первичной загрузки данных по валютам в БД (в фоне)
+@router.get("/currencies",
+            response_model=schemas.JobInfo,
+            status_code=status.HTTP_202_ACCEPTED)
+async def update_all_currencies() -> Job:
+    return await jobs.submit("currencies", refresh_currencies)
+
+
+# Метод для загрузки истории курсов валют за период в БД (в фоне)
+# (без указания периода догружаются только недостающие курсы валют облигаций)
+@router.get("/rates",
+            response_model=schemas.JobInfo,
+            status_code=status.HTTP_202_ACCEPTED)
+async def update_currency_rates(
+        date_from: date | None = Query(None, description="Начальная дата"),
+        date_till: date | None = Query(None, description="Конечная дата")
+) -> Job:
+    if (date_from is None) != (date_till is None):
+        raise HTTPException(status_code=422, detail="date_from и date_till указываются вместе")
+    if date_from is not None and date_from > date_till:
+        raise HTTPException(status_code=422, detail="date_from должна быть не позже date_till")
+    return await jobs.submit("rates", backfill_currency_rates, date_from=date_from, date_till=date_till)
+
 
+# Метод для получения списка загружаемых режимов торгов
+@router.get("/boards")
+async def get_boards() -> list[str]:
+    return [source.board for source in MOEXGateway().BOARDS]
 
-# Метод для первичной загрузки данных по облигациям в БД
-@router.get("/bonds")
+
+# Метод для первичной загрузки данных по облигациям в БД (в фоне)
+# (при указании board загружается и обновляется только один режим торгов,
+# без учета приоритета режимов из ISS_BOARDS)
+@router.get("/bonds",
+            response_model=schemas.JobInfo,
+            status_code=status.HTTP_202_ACCEPTED)
 async def update_all_bonds(
-        db: AsyncSession = Depends(get_db)
+        board: str | None = Query(None, description="Режим торгов")
+) -> Job:
+    if board is not None and board not in [source.board for source in MOEXGateway().BOARDS]:
+        raise HTTPException(status_code=422, detail=f"Режим торгов {board} не задан в ISS_BOARDS")
+    return await jobs.submit("bonds", refresh_bonds, board=board)
+
+
+# Метод для удаления облигаций, не обновленных при сегодняшней загрузке
+@router.get("/bonds/cleanup")
+async def cleanup_bonds(
+        db: AsyncSession = Depends(get_write_db)
+):
+    await crud.delete_stale_bonds(db=db, loaded_before=date.today())
+    return {"message": "Устаревшие данные по облигациям успешно удалены"}
+
+
+# Метод для загрузки исторических цен облигаций в БД (в фоне)
+# (тикеры можно разбить на chunks частей и загружать их параллельно)
+@router.get("/history",
+            response_model=schemas.JobInfo,
+            status_code=status.HTTP_202_ACCEPTED)
+async def update_bonds_history(
+        chunk: int = Query(0, ge=0, description="Номер загружаемой части тикеров"),
+        chunks: int = Query(1, ge=1, description="Общее число частей")
+) -> Job:
+    return await jobs.submit("history", load_history_to_db, chunk=chunk, chunks=chunks)
+
+
+# Метод для загрузки графиков выплат облигаций в БД (в фоне)
+# (запрашиваются графики новых облигаций, флоатеров, облигаций с амортизацией
+# и со сдвинувшимся ближайшим купоном, при full - всех облигаций;
+# перезаписываются только изменившиеся графики)
+@router.get("/schedules",
+            response_model=schemas.JobInfo,
+            status_code=status.HTTP_202_ACCEPTED)
+async def update_coupon_schedules(
+        full: bool = Query(False, description="Запросить графики всех облигаций")
+) -> Job:
+    return await jobs.submit("schedules", load_coupon_schedules_to_db, full=full)
+
+
+# Метод для ночного пересчета метрик облигаций (в фоне)
+@router.get("/metrics",
+            response_model=schemas.JobInfo,
+            status_code=status.HTTP_202_ACCEPTED)
+async def update_bonds_metrics() -> Job:
+    return await jobs.submit("metrics", precompute_metrics_to_db)
+
+
+# Метод для получения статуса фоновой задачи обновления данных
+@router.get("/jobs/{job_id}",
+            response_model=schemas.JobInfo)
+async def get_update_job(job_id: str) -> Job:
+    job = jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+
+# Метод для получения итогов последних фоновых загрузок
+# (длительность и число строк по этапам)
+@router.get("/runs",
+            response_model=list[schemas.LoadRun])
+async def get_load_runs(
+        kind: str | None = Query(None, description="Вид задачи (currencies, bonds, history, schedules, metrics)"),
+        limit: int = Query(100, ge=1, le=1000, description="Число последних загрузок"),
+        db: AsyncSession = Depends(get_read_db)
 ):
-    await crud.delete_bonds(db=db)
-    await load_bonds_to_db(db=db)
-    return {"message": "Данные по облигациям успешно загружены"}
+    return await crud.get_load_runs(db=db, kind=kind, limit=limit)
@@ -0,0 +1,10 @@
+import os
+import sys
+
+# Модули приложения импортируются относительно каталога app (как при запуске uvicorn main:app)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Движок БД создается при импорте моделей, но подключение к БД в тестах не выполняется
+for name, value in (("DB_HOST", "localhost"), ("DB_PORT", "5432"), ("DB_NAME", "test"),
+                    ("DB_USER", "test"), ("DB_PASS", "test")):
+    os.environ.setdefault(name, value)
@@ -0,0 +1,199 @@
+import asyncio
+import unittest
+from time import monotonic
+from unittest import mock
+
+import aiohttp
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+from prometheus_client import Histogram
+
+from utils.http_client import HTTPClient, TokenBucket, UpstreamError, CircuitOpenError
+
+TEST_HISTOGRAM = Histogram("test_http_client_seconds", "Время запросов в тестах клиента", ["source"])
+
+
+class FakeUpstream:
+    """
+    Локальный сервер-заглушка: отдает ответы из очереди responses
+    (статус, заголовки, тело, задержка), после ее исчерпания - 200 с JSON
+    """
+    def __init__(self):
+        self.responses: list[tuple[int, dict, str, float]] = []
+        self.hits: list[float] = []
+
+    async def handle(self, request: web.Request) -> web.Response:
+        self.hits.append(monotonic())
+        status, headers, body, delay = self.responses.pop(0) if self.responses else (200, {}, '{"ok": 1}', 0)
+        if delay:
+            await asyncio.sleep(delay)
+        return web.Response(status=status, headers=headers, text=body)
+
+
+class HTTPClientTestCase(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.upstream = FakeUpstream()
+        app = web.Application()
+        app.router.add_get("/{tail:.*}", self.upstream.handle)
+        self.server = TestServer(app)
+        await self.server.start_server()
+        self.session = aiohttp.ClientSession()
+        self.url = str(self.server.make_url("/iss/test.json"))
+        # Без случайной добавки к задержке между повторами, чтобы тесты были быстрыми и детерминированными
+        patcher = mock.patch("utils.http_client.random.uniform", return_value=0)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    async def asyncTearDown(self):
+        await self.session.close()
+        await self.server.close()
+
+    def client(self, **kwargs) -> HTTPClient:
+        params = dict(rate=1000, burst=1000, max_retries=3, timeout=5, connect_timeout=5,
+                      breaker_threshold=10, breaker_reset=60)
+        params.update(kwargs)
+        return HTTPClient(**params)
+
+    async def get(self, client: HTTPClient):
+        return await client.get_json(self.session, self.url, TEST_HISTOGRAM, source="test")
+
+    async def test_retry_on_429_and_503_honours_retry_after(self):
+        self.upstream.responses = [(429, {"Retry-After": "1"}, "", 0), (503, {"Retry-After": "0"}, "", 0)]
+        client = self.client()
+
+        self.assertEqual(await self.get(client), {"ok": 1})
+        self.assertEqual(len(self.upstream.hits), 3)
+        self.assertGreaterEqual(self.upstream.hits[1] - self.upstream.hits[0], 1)
+        self.assertLess(self.upstream.hits[2] - self.upstream.hits[1], 0.5)
+
+    async def test_gives_up_after_max_retries(self):
+        self.upstream.responses = [(503, {"Retry-After": "0"}, "", 0)] * 3
+        client = self.client(max_retries=2)
+
+        with self.assertRaises(UpstreamError) as error:
+            await self.get(client)
+        self.assertEqual(error.exception.status, 503)
+        self.assertEqual(len(self.upstream.hits), 3)
+
+    async def test_client_error_is_not_retried(self):
+        self.upstream.responses = [(404, {}, "", 0)]
+        client = self.client()
+
+        with self.assertRaises(UpstreamError) as error:
+            await self.get(client)
+        self.assertEqual(error.exception.status, 404)
+        self.assertEqual(len(self.upstream.hits), 1)
+        self.assertEqual(client.breaker(self.server.make_url("/").raw_authority).state, "closed")
+
+    async def test_timeout_is_retried(self):
+        self.upstream.responses = [(200, {}, "{}", 1)]
+        client = self.client(timeout=0.2, max_retries=1)
+
+        self.assertEqual(await self.get(client), {"ok": 1})
+        self.assertEqual(len(self.upstream.hits), 2)
+
+    async def test_timeout_exhausts_retries(self):
+        self.upstream.responses = [(200, {}, "{}", 1)] * 2
+        client = self.client(timeout=0.2, max_retries=1)
+
+        with self.assertRaises(UpstreamError) as error:
+            await self.get(client)
+        self.assertIn("TimeoutError", str(error.exception))
+
+    async def test_token_bucket_paces_requests(self):
+        bucket = TokenBucket(rate=20, capacity=2)
+        started = monotonic()
+        for _ in range(6):
+            await bucket.acquire()
+        # Два запроса - сразу (всплеск), остальные четыре - с частотой 20 в секунду
+        self.assertGreaterEqual(monotonic() - started, 4 / 20 * 0.9)
+
+    async def test_client_paces_requests_per_host(self):
+        client = self.client(rate=20, burst=1)
+        await asyncio.gather(*(self.get(client) for _ in range(5)))
+
+        self.assertGreaterEqual(self.upstream.hits[-1] - self.upstream.hits[0], 4 / 20 * 0.9)
+
+    async def test_breaker_opens_half_opens_and_closes(self):
+        self.upstream.responses = [(503, {"Retry-After": "0"}, "", 0)] * 2
+        client = self.client(max_retries=0, breaker_threshold=2, breaker_reset=0.3)
+        breaker = client.breaker(self.server.make_url("/").raw_authority)
+
+        for _ in range(2):
+            with self.assertRaises(UpstreamError):
+                await self.get(client)
+        self.assertEqual(breaker.state, "open")
+        with self.assertRaises(CircuitOpenError):
+            await self.get(client)
+        self.assertEqual(len(self.upstream.hits), 2)
+
+        await asyncio.sleep(0.35)
+        self.assertEqual(breaker.state, "half-open")
+        self.assertEqual(await self.get(client), {"ok": 1})
+        self.assertEqual(breaker.state, "closed")
+
+    async def test_failed_trial_reopens_breaker(self):
+        self.upstream.responses = [(503, {"Retry-After": "0"}, "", 0)] * 3
+        client = self.client(max_retries=0, breaker_threshold=2, breaker_reset=0.3)
+        breaker = client.breaker(self.server.make_url("/").raw_authority)
+
+        for _ in range(2):
+            with self.assertRaises(UpstreamError):
+                await self.get(client)
+        await asyncio.sleep(0.35)
+        with self.assertRaises(UpstreamError):
+            await self.get(client)
+        self.assertEqual(breaker.state, "open")
+
+    async def test_half_open_allows_single_trial(self):
+        self.upstream.responses = [(503, {"Retry-After": "0"}, "", 0)] * 2 + [(200, {}, '{"ok": 1}', 0.2)]
+        client = self.client(max_retries=0, breaker_threshold=2, breaker_reset=0.3)
+
+        for _ in range(2):
+            with self.assertRaises(UpstreamError):
+                await self.get(client)
+        await asyncio.sleep(0.35)
+        trial = asyncio.create_task(self.get(client))
+        await asyncio.sleep(0.05)
+        with self.assertRaises(CircuitOpenError):
+            await self.get(client)
+        self.assertEqual(await trial, {"ok": 1})
+
+    async def test_unparsable_trial_does_not_wedge_breaker(self):
+        self.upstream.responses = ([(503, {"Retry-After": "0"}, "", 0)] * 2
+                                   + [(200, {"Content-Type": "text/html"}, "<html>maintenance</html>", 0)])
+        client = self.client(max_retries=0, breaker_threshold=2, breaker_reset=0.3)
+        breaker = client.breaker(self.server.make_url("/").raw_authority)
+
+        for _ in range(2):
+            with self.assertRaises(UpstreamError):
+                await self.get(client)
+        await asyncio.sleep(0.35)
+        with self.assertRaises(ValueError):
+            await self.get(client)
+        self.assertFalse(breaker.trial_in_progress)
+
+        await asyncio.sleep(0.35)
+        for _ in range(3):
+            self.assertEqual(await self.get(client), {"ok": 1})
+        self.assertEqual(breaker.state, "closed")
+
+    async def test_cancelled_trial_does_not_wedge_breaker(self):
+        self.upstream.responses = [(503, {"Retry-After": "0"}, "", 0)] * 2 + [(200, {}, '{"ok": 1}', 1)]
+        client = self.client(max_retries=0, breaker_threshold=2, breaker_reset=0.3)
+        breaker = client.breaker(self.server.make_url("/").raw_authority)
+
+        for _ in range(2):
+            with self.assertRaises(UpstreamError):
+                await self.get(client)
+        await asyncio.sleep(0.35)
+        trial = asyncio.create_task(self.get(client))
+        await asyncio.sleep(0.05)
+        trial.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await trial
+        self.assertFalse(breaker.trial_in_progress)
+
+        self.assertEqual(await self.get(client), {"ok": 1})
+        self.assertEqual(breaker.state, "closed")
+
@@ -1,22 +1,29 @@
-from datetime import datetime, timedelta, timezone
+import asyncio
+from datetime import date, datetime, timedelta, timezone
 from decimal import Decimal
 
 import aiohttp
 import xml.etree.ElementTree as ET
-import pandas as pd
+
+from config import CBR_BASE_URL
+from utils.http_client import http_client
+from utils.jobs import stage
+from utils.metrics import CBR_FETCH
 
 
 class CBRFGateway:
     """Класс-шлюз для работы с ЦБ РФ"""
     def __init__(self):
-        self.currency_url = "https://www.cbr.ru/scripts/XML_daily.asp?date_req="
+        self.currency_url = CBR_BASE_URL + "/scripts/XML_daily.asp?date_req="
+        self.dynamic_url = (CBR_BASE_URL + "/scripts/XML_dynamic.asp?date_req1={date_from}"
+                            "&date_req2={date_till}&VAL_NM_RQ={valute_id}")
 
     async def load_currency_data(self) -> list[dict]:
         """
         Функция для загрузки данных по валютам,
         полученных с помощью функции fetch_currency_data()
 
-        :return: список валют, их кода и курса
+        :return: список валют, их кода, идентификатора ЦБ РФ, курса и даты курса
         """
         async with aiohttp.ClientSession() as session:
             offset = timezone(timedelta(hours=3))
@@ -32,30 +39,99 @@ class CBRFGateway:
             currency_dict = await self.fetch_currency_data(session=session, request_date=request_date)
             return currency_dict
 
-    async def fetch_currency_data(self, session: aiohttp.ClientSession, request_date: datetime) -> list[dict]:
+    async def fetch_currency_data(self, session: aiohttp.ClientSession, request_date: datetime | date) -> list[dict]:
         """
         Функция для получения данных по валютам с сайта ЦБ РФ
 
         :param session: объект сессии подключения к источнику
         :param request_date: дата запроса
-        :return: список валют, их кода и курса
-        """
-
-        async with session.get(self.currency_url + request_date.strftime('%d/%m/%Y')) as response:
-            if response.status == 200:
-                xml_data = await response.text()
-                root = ET.fromstring(xml_data)
-
-                currency_data = []
-                for currency in root.findall('./Valute'):
-                    currency_name = currency.find('./Name').text
-                    currency_code = currency.find('./CharCode').text
-                    curs = Decimal(currency.find('./Value').text.replace(',', '.'))
-
-                    currency_data.append([currency_name, currency_code, curs])
-                    currency_data.append(['Российский рубль', 'SUR', 1.000])
-                    df = pd.DataFrame(currency_data, columns=['currency_name', 'currency_code', 'curs'])
-                currency_dict = df.to_dict(orient='records')
-                return currency_dict
-            else:
-                raise Exception(f"API error: {response.status}")
+        :return: список валют, их кода, идентификатора ЦБ РФ, курса и даты курса
+        """
+
+        with stage("fetch"):
+            xml_data = await http_client.get_bytes(session, self.currency_url + request_date.strftime('%d/%m/%Y'),
+                                                   CBR_FETCH)
+
+        with stage("parse") as parse_stage:
+            currency_data = self.parse_daily_rates(xml_data)
+            parse_stage.rows += len(currency_data)
+        return currency_data
+
+    @staticmethod
+    def parse_daily_rates(xml_data: bytes) -> list[dict]:
+        """
+        Функция для разбора ответа XML_daily за один проход.
+        Курс пересчитывается за одну единицу валюты (Value / Nominal),
+        рубль добавляется один раз с курсом 1
+
+        :param xml_data: ответ ЦБ РФ
+        :return: список валют, их кода, идентификатора ЦБ РФ, курса и даты курса
+        """
+        root = ET.fromstring(xml_data)
+        rate_date = datetime.strptime(root.get('Date'), '%d.%m.%Y').date()
+
+        currency_data = [{'currency_name': 'Российский рубль', 'currency_code': 'SUR',
+                          'valute_id': None, 'curs': Decimal(1), 'rate_date': rate_date}]
+        for currency in root.iter('Valute'):
+            value = Decimal(currency.findtext('Value').replace(',', '.'))
+            currency_data.append({
+                'currency_name': currency.findtext('Name'),
+                'currency_code': currency.findtext('CharCode'),
+                'valute_id': currency.get('ID'),
+                'curs': value / int(currency.findtext('Nominal')),
+                'rate_date': rate_date
+            })
+        return currency_data
+
+    async def load_rates_range(self, date_from: date, date_till: date,
+                               codes: list[str] | None = None) -> list[dict]:
+        """
+        Функция для загрузки курсов валют за период: по каждой валюте
+        выполняется один запрос XML_dynamic, валюты загружаются параллельно
+
+        :param date_from: начальная дата
+        :param date_till: конечная дата
+        :param codes: коды валют (если не указаны - все валюты ЦБ РФ)
+        :return: список курсов (код валюты, дата, курс за единицу)
+        """
+        async with aiohttp.ClientSession() as session:
+            currency_data = await self.fetch_currency_data(session=session, request_date=date_till)
+            valutes = {
+                currency['currency_code']: currency['valute_id'] for currency in currency_data
+                if currency['valute_id'] is not None and (codes is None or currency['currency_code'] in codes)
+            }
+            rates = await asyncio.gather(*[
+                self.fetch_rate_history(session=session, code=code, valute_id=valute_id,
+                                        date_from=date_from, date_till=date_till)
+                for code, valute_id in valutes.items()
+            ])
+        return [rate for currency_rates in rates for rate in currency_rates]
+
+    async def fetch_rate_history(self, session: aiohttp.ClientSession, code: str, valute_id: str,
+                                 date_from: date, date_till: date) -> list[dict]:
+        """
+        Функция для получения курсов одной валюты за период с сайта ЦБ РФ
+
+        :param session: объект сессии подключения к источнику
+        :param code: код валюты (USD)
+        :param valute_id: идентификатор валюты ЦБ РФ (R01235)
+        :param date_from: начальная дата
+        :param date_till: конечная дата
+        :return: список курсов (код валюты, дата, курс за единицу)
+        """
+        url = self.dynamic_url.format(date_from=date_from.strftime('%d/%m/%Y'),
+                                      date_till=date_till.strftime('%d/%m/%Y'), valute_id=valute_id)
+        with stage("fetch"):
+            xml_data = await http_client.get_bytes(session, url, CBR_FETCH)
+
+        with stage("parse") as parse_stage:
+            rates = [
+                {
+                    'code': code,
+                    'rate_date': datetime.strptime(record.get('Date'), '%d.%m.%Y').date(),
+                    'rate': Decimal(record.findtext('Value').replace(',', '.')) / int(record.findtext('Nominal'))
+                }
+                for record in ET.fromstring(xml_data).iter('Record')
+            ]
+            parse_stage.rows += len(rates)
+        return rates
@@ -1,4 +1,7 @@
-from typing import Any
+import asyncio
+import json
+import logging
+from dataclasses import dataclass
 
 import aiohttp
 import pandas as pd
@@ -11,232 +14,573 @@ from decimal import Decimal
 from scipy import stats
 from scipy.stats import norm
 
+from config import (HISTORY_SYNC_CONCURRENCY, ISS_BASE_URL, ISS_STREAMING_PARSE,
+                    ISS_BOARDS, ISS_BOARD_CONCURRENCY)
+from utils.currency_rates import RateHistory
+from utils.http_client import http_client, SingleFlight
+from utils.jobs import stage
+from utils.metrics import observe, ISS_FETCH, CORRELATION_COMPUTE
+
+try:
+    import ijson
+except ImportError:  # ijson - необязательная зависимость, без нее ответ разбирается целиком
+    ijson = None
+
+# Столбцы ответа ISS securities, которые сохраняются в таблицу облигаций
+# (остальные столбцы при разборе ответа отбрасываются)
+BOND_COLUMNS = ['SECID', 'SECNAME', 'PREVWAPRICE', 'FACEVALUE', 'COUPONVALUE', 'COUPONPERIOD',
+                'ACCRUEDINT', 'FACEUNIT', 'CURRENCYID', 'LOTSIZE', 'ISSUESIZE', 'PREVDATE',
+                'NEXTCOUPON', 'MATDATE']
+FLOAT_COLUMNS = ('PREVWAPRICE', 'FACEVALUE', 'COUPONVALUE')
+# Столбцы блока marketdata для внутридневного обновления цен
+MARKETDATA_COLUMNS = ['SECID', 'LAST', 'WAPRICE', 'YIELD', 'SYSTIME']
+# Блоки ответа ISS bondization: вид выплаты -> (столбец даты, столбец суммы, столбец процента)
+BONDIZATION_BLOCKS = {
+    'coupon': ('coupons', 'coupondate', 'value', 'valueprc'),
+    'amortization': ('amortizations', 'amortdate', 'value', 'valueprc'),
+    'offer': ('offers', 'offerdate', 'value', 'price'),
+}
+SCHEDULE_PRECISION = Decimal('0.000001')  # точность сумм в таблице coupon_schedule
+
+logger = logging.getLogger(__name__)
+
+
+# Одновременные запросы одного и того же режима торгов или истории тикера
+# за те же даты объединяются в один запрос к ISS
+board_flights = SingleFlight("board")
+history_flights = SingleFlight("history")
+
+
+async def as_completed_results(coros: list):
+    """
+    Функция для получения результатов корутин в порядке их завершения.
+    Если генератор закрыт раньше (ошибка записи в БД, отмена задачи),
+    незавершенные корутины отменяются, а не остаются висеть
+
+    :param coros: список корутин
+    :return: асинхронный генератор результатов
+    """
+    tasks = [asyncio.ensure_future(coro) for coro in coros]
+    try:
+        for task in asyncio.as_completed(tasks):
+            yield await task
+    finally:
+        for task in tasks:
+            task.cancel()
+
 
 # Исключение - слишком мало наблюдений
 class NotEnoughObservations(Exception):
     pass
 
 
+@dataclass(frozen=True)
+class BoardSource:
+    """Режим торгов ISS, из которого загружаются облигации"""
+    engine: str
+    market: str
+    board: str
+    priority: int  # меньше - выше приоритет при совпадении SECID
+
+    @property
+    def url(self) -> str:
+        return (ISS_BASE_URL + f'/iss/engines/{self.engine}/markets/{self.market}'
+                               f'/boards/{self.board}/securities.json')
+
+    @property
+    def marketdata_url(self) -> str:
+        return self.url + '?iss.meta=off&iss.only=marketdata&marketdata.columns=' + ','.join(MARKETDATA_COLUMNS)
+
+
+def parse_board_sources(sources: list[str]) -> list[BoardSource]:
+    """
+    Функция для разбора списка режимов торгов из настроек
+
+    :param sources: список строк engine/market/board в порядке приоритета
+    :return: список объектов BoardSource
+    """
+    boards = []
+    for priority, source in enumerate(sources):
+        parts = source.split('/')
+        if len(parts) != 3 or not all(parts):
+            raise ValueError(f"Режим торгов должен быть задан как engine/market/board: {source}")
+        boards.append(BoardSource(*parts, priority=priority))
+    return boards
+
+
 class MOEXGateway:
     """Класс-шлюз для работы с ISS MOEX"""
     def __init__(self):
-        self.CORP_B_URL = 'https://iss.moex.com/iss/engines/stock/markets/bonds/boards/TQCB/securities.json'
-        self.GOV_B_URL = 'https://iss.moex.com/iss/engines/stock/markets/bonds/boards/TQOB/securities.json'
-        self.HIST_URL = 'https://iss.moex.com/iss/history/engines/stock/markets/bonds/securities/{ticker}.json?from={start_date}&till={end_date}&marketprice_board=1&start={point}'
+        self.BOARDS = parse_board_sources(ISS_BOARDS)
+        self.BONDIZATION_URL = ISS_BASE_URL + '/iss/securities/{ticker}/bondization.json?iss.meta=off&limit=unlimited'
+        self.HIST_URL = ISS_BASE_URL + '/iss/history/engines/stock/markets/bonds/securities/{ticker}.json?from={start_date}&till={end_date}&marketprice_board=1&start={point}'
 
-    async def load_bond_data(self, curr_dict: dict) -> list[dict]:
+    async def load_bond_data(self, board: str | None = None) -> list[dict]:
         """
         Функция для загрузки данных по облигациям,
-        полученных с помощью функции fetch_bond_data()
-
-        :param curr_dict: словарь с данными о валютах и их курсах
+        полученных с помощью функции fetch_bond_data().
+        Режимы торгов загружаются параллельно, но не более ISS_BOARD_CONCURRENCY
+        одновременно. Данные режима сразу объединяются с уже загруженными
+        (облигация из нескольких режимов берется из режима с высшим приоритетом),
+        поэтому в памяти одновременно находятся не более ISS_BOARD_CONCURRENCY
+        ответов ISS независимо от числа режимов.
+        Суммы в рублях не рассчитываются: они вычисляются при чтении
+        из БД по текущим курсам валют
+
+        :param board: режим торгов (если не указан, загружаются все режимы из BOARDS)
         :return: список словарей с данными по облигациям
         """
-        async with aiohttp.ClientSession() as session:
-            corp_df = await self.fetch_bond_data(session=session, url=self.CORP_B_URL, curr_dict=curr_dict)
-            gov_df = await self.fetch_bond_data(session=session, url=self.GOV_B_URL, curr_dict=curr_dict)
-            total_df = pd.concat([corp_df, gov_df], ignore_index=True)
-            bonds_dict = total_df.to_dict(orient='records')
+        sources = [source for source in self.BOARDS if board is None or source.board == board]
+        semaphore = asyncio.Semaphore(ISS_BOARD_CONCURRENCY)
+        bonds: dict[str, tuple[int, dict]] = {}
+
+        async def load_board(source: BoardSource) -> None:
+            async with semaphore:
+                df = await self.fetch_bond_data(url=source.url, board=source.board)
+                with stage("merge") as merge_stage:
+                    for bond in df.to_dict(orient='records'):
+                        bond['board'] = source.board
+                        kept = bonds.get(bond['ticker'])
+                        if kept is None or source.priority < kept[0]:
+                            bonds[bond['ticker']] = (source.priority, bond)
+                    merge_stage.rows += len(df)
+
+        await asyncio.gather(*(load_board(source) for source in sources))
+        return [bond for _, bond in bonds.values()]
+
+    async def load_marketdata(self) -> dict[str, tuple]:
+        """
+        Функция для загрузки внутридневных цен облигаций (блок marketdata)
+        по всем режимам торгов из BOARDS. Запрашиваются только нужные столбцы,
+        облигация из нескольких режимов берется по приоритету режимов
 
-            return bonds_dict
+        :return: словарь тикер -> (LAST, WAPRICE, YIELD, SYSTIME)
+        """
+        semaphore = asyncio.Semaphore(ISS_BOARD_CONCURRENCY)
+        marketdata: dict[str, tuple[int, tuple]] = {}
+
+        async def load_board(session: aiohttp.ClientSession, source: BoardSource) -> None:
+            async with semaphore:
+                data = await http_client.get_json(session, source.marketdata_url, ISS_FETCH,
+                                                  endpoint="marketdata")
+            block = data["marketdata"]
+            positions = [block["columns"].index(column) for column in MARKETDATA_COLUMNS]
+            for row in block["data"]:
+                secid, *values = (row[i] for i in positions)
+                kept = marketdata.get(secid)
+                if kept is None or source.priority < kept[0]:
+                    marketdata[secid] = (source.priority, tuple(values))
 
-    async def fetch_bond_data(self, session: aiohttp.ClientSession, url: str, curr_dict: dict) -> pd.DataFrame:
+        async with aiohttp.ClientSession() as session:
+            await asyncio.gather(*(load_board(session, source) for source in self.BOARDS))
+        return {secid: values for secid, (_, values) in marketdata.items()}
+
+    async def fetch_bond_data(self, url: str, board: str | None = None) -> pd.DataFrame:
         """
         Функция для получения данных по облигациям с сайта Московской биржи
+        (запрос выполняется в сессии board_flights)
 
-        :param session: объект сессии подключения к источнику
         :param url: url источника
-        :param curr_dict: словарь с данными о валютах и их курсах
+        :param board: режим торгов (для учета времени загрузки по режимам)
         :return: датафрейм с данными об облигациях
         """
-        async with session.get(url) as response:
-            if response.status == 200:
-                data = await response.json()
-
-                if data is not None:
-
-                    columns = [
-                        column for column in data["securities"]["columns"]
-                    ]
-                    df = pd.DataFrame(columns=columns)
-                    rows = data["securities"]["data"]
-
-                    for row in rows:
-                        rows_data = dict(zip(columns, [i for i in row]))
-                        df = pd.concat([df, pd.DataFrame([rows_data])], ignore_index=True)
-
-                    df['MATDATE'] = df['MATDATE'].apply(lambda x: x if x != '0000-00-00' else None)
-                    df['NEXTCOUPON'] = df['NEXTCOUPON'].apply(lambda x: x if x != '0000-00-00' else None)
-                    df['PREVDATE'] = df['PREVDATE'].apply(lambda x: x if x != '0000-00-00' else None)
-                    df['PREVWAPRICE'] = df['PREVWAPRICE'].fillna(0)
-                    df['COUPONVALUE'] = df['COUPONVALUE'].fillna(0)
-                    df['PREVWAPRICE'] = df['PREVWAPRICE'] * df['FACEVALUE'] / 100
-
-                    df['prevwaprice_rub'] = df.apply(
-                        self.convert_currency_cur,
-                        col_name="PREVWAPRICE",
-                        key_name="FACEUNIT", curr_dict=curr_dict, axis=1
-                    )
-                    df['nominal_rub'] = df.apply(
-                        self.convert_currency_cur,
-                        col_name='FACEVALUE',
-                        key_name="FACEUNIT", curr_dict=curr_dict, axis=1
-                    )
-                    df['accum_coupon_rub'] = df.apply(
-                        self.convert_currency_cur,
-                        col_name='ACCRUEDINT',
-                        key_name="CURRENCYID", curr_dict=curr_dict, axis=1
-                    )
-                    df['coupon_value_rub'] = df.apply(
-                        self.convert_currency_cur,
-                        col_name='COUPONVALUE',
-                        key_name="FACEUNIT", curr_dict=curr_dict, axis=1
-                    )
-
-                    df = df[['SECID', 'SECNAME', 'PREVWAPRICE',
-                             'FACEVALUE', 'COUPONVALUE', 'COUPONPERIOD',
-                             'ACCRUEDINT', 'FACEUNIT', 'CURRENCYID',
-                             'LOTSIZE', 'ISSUESIZE', 'PREVDATE',
-                             'NEXTCOUPON', 'MATDATE', 'prevwaprice_rub',
-                             'nominal_rub', 'accum_coupon_rub', 'coupon_value_rub']]
-
-                    df = df.rename(columns={'SECID': 'ticker', 'SECNAME': 'name',
-                                            'PREVWAPRICE': 'prevwaprice_cur',
-                                            'FACEVALUE': 'nominal_cur', 'COUPONVALUE': 'coupon_value_cur',
-                                            'COUPONPERIOD': 'coupon_period', 'ACCRUEDINT': 'accum_coupon_cur',
-                                            'FACEUNIT': 'cur_of_nominal', 'CURRENCYID': 'cur_of_market',
-                                            'LOTSIZE': 'lot_size', 'ISSUESIZE': 'issue_size',
-                                            'PREVDATE': 'prev_date', 'NEXTCOUPON': 'next_coupon_date',
-                                            'MATDATE': 'maturity_date'})
-                    df['loading_date'] = date.today()
-                return df
-            else:
-                raise Exception(f'API error: {response.status}')
+        data = await board_flights.do(url, lambda session: self.fetch_board_snapshot(session, url, board))
+
+        with stage("build") as build_stage:
+            df = pd.DataFrame({
+                column: np.array(values, dtype=float if column in FLOAT_COLUMNS else object)
+                for column, values in data.items()
+            })
+
+            df['MATDATE'] = df['MATDATE'].apply(lambda x: x if x != '0000-00-00' else None)
+            df['NEXTCOUPON'] = df['NEXTCOUPON'].apply(lambda x: x if x != '0000-00-00' else None)
+            df['PREVDATE'] = df['PREVDATE'].apply(lambda x: x if x != '0000-00-00' else None)
+            df['PREVWAPRICE'] = df['PREVWAPRICE'].fillna(0)
+            df['COUPONVALUE'] = df['COUPONVALUE'].fillna(0)
+            df['PREVWAPRICE'] = df['PREVWAPRICE'] * df['FACEVALUE'] / 100
+
+            df = df[['SECID', 'SECNAME', 'PREVWAPRICE',
+                     'FACEVALUE', 'COUPONVALUE', 'COUPONPERIOD',
+                     'ACCRUEDINT', 'FACEUNIT', 'CURRENCYID',
+                     'LOTSIZE', 'ISSUESIZE', 'PREVDATE',
+                     'NEXTCOUPON', 'MATDATE']]
+
+            df = df.rename(columns={'SECID': 'ticker', 'SECNAME': 'name',
+                                    'PREVWAPRICE': 'prevwaprice_cur',
+                                    'FACEVALUE': 'nominal_cur', 'COUPONVALUE': 'coupon_value_cur',
+                                    'COUPONPERIOD': 'coupon_period', 'ACCRUEDINT': 'accum_coupon_cur',
+                                    'FACEUNIT': 'cur_of_nominal', 'CURRENCYID': 'cur_of_market',
+                                    'LOTSIZE': 'lot_size', 'ISSUESIZE': 'issue_size',
+                                    'PREVDATE': 'prev_date', 'NEXTCOUPON': 'next_coupon_date',
+                                    'MATDATE': 'maturity_date'})
+            df['loading_date'] = date.today()
+            build_stage.rows += len(df)
+        return df
 
     @staticmethod
-    def convert_currency_cur(row: Any, col_name: str, curr_dict: dict, key_name: str) -> Decimal | None:
+    async def fetch_board_snapshot(session: aiohttp.ClientSession, url: str,
+                                   board: str | None = None) -> dict[str, list]:
         """
-        Функция для конвертации данных, выраженных в ин.валюте, в рубли
+        Функция для получения и разбора ответа ISS со списком облигаций режима торгов.
+        Из ответа сохраняются только столбцы BOND_COLUMNS. При установленном
+        пакете ijson ответ разбирается потоково по мере чтения, без загрузки
+        всего документа в память (время разбора входит в этап fetch)
 
-        :param row: строка / запись из датафрейма
-        :param col_name: наименование столбца, в котором данные перевести в рубли
-        :param curr_dict: словарь с данными о валютах и их курсах
-        :param key_name: наименование валюты, использованной для расчета
-        :return: объект типа Decimal: сумма в рублях
+        :param session: объект сессии подключения к источнику
+        :param url: url источника
+        :param board: режим торгов (для учета времени загрузки по режимам)
+        :return: словарь столбец -> список значений
         """
-        currency_id = row[key_name]
-        if currency_id in curr_dict and row[col_name]:
-            return Decimal(Decimal(row[col_name]) * curr_dict[currency_id])
-        else:
-            return None
-
-    async def load_hist_bond_data(self, ticker_1: str, ticker_2: str) -> dict:
+        if ijson is not None and ISS_STREAMING_PARSE:
+            with stage(f"fetch:{board}" if board else "fetch") as fetch_stage:
+                data = await http_client.get_stream(session, url, ISS_FETCH, read=read_securities_columns,
+                                                    endpoint="securities")
+                fetch_stage.rows += len(data['SECID'])
+            return data
+
+        with stage(f"fetch:{board}" if board else "fetch"):
+            body = await http_client.get_bytes(session, url, ISS_FETCH, endpoint="securities")
+
+        with stage("parse") as parse_stage:
+            securities = json.loads(body)["securities"]
+            positions = [securities["columns"].index(column) for column in BOND_COLUMNS]
+            rows = securities["data"]
+            data = {column: [row[i] for row in rows] for column, i in zip(BOND_COLUMNS, positions)}
+            parse_stage.rows += len(rows)
+        return data
+
+    async def load_hist_bond_data(self, ticker_1: str, ticker_2: str,
+                                  fx_1: RateHistory | None = None,
+                                  fx_2: RateHistory | None = None) -> dict:
         """
         Функция для загрузки данных по историческим ценам облигаций
         и расчет коэф.корреляции между ними
 
         :param ticker_1: тикер первой облигации
         :param ticker_2: тикер второй облигации
+        :param fx_1: история курсов валюты номинала первой облигации (None - без пересчета)
+        :param fx_2: история курсов валюты номинала второй облигации (None - без пересчета)
         :return: словарь с разными коэффициентами корреляции двух облигаций
         """
-        async with aiohttp.ClientSession() as session:
-            df1 = await self.fetch_hist_bond_data(session, ticker_1)
-            df2 = await self.fetch_hist_bond_data(session, ticker_2)
-            merged_df = pd.merge(df1, df2, on='trade_date', how='outer')
-            merged_df = merged_df.dropna()
-            if merged_df.shape[0] < 30:
-                raise NotEnoughObservations("Как минимум в одной из облигаций слишком мало "
-                                            "наблюдений (менее 30) для расчета корреляции")
-
-            col_1 = merged_df.close_price_x
-            col_2 = merged_df.close_price_y
-
-            # Проверка на нормальность
-            loc, scale = norm.fit(col_1)
-            n = norm(loc=loc, scale=scale)
-            norm_1 = 0.05 <= stats.kstest(col_1, n.cdf).pvalue
-
-            loc, scale = norm.fit(col_2)
-            n = norm(loc=loc, scale=scale)
-            norm_2 = 0.05 <= stats.kstest(col_2, n.cdf).pvalue
-
-            col_dict = {
-                1: col_1,
-                2: col_2
-            }
-            # Проверка на выбросы
-            for i in range(1, 3):
-                col = col_dict[i]
-
-                q1 = np.percentile(col, 25)
-                q3 = np.percentile(col, 75)
-                IQR = q3 - q1
-                lower_bound = q1 - 1.5 * IQR
-                upper_bound = q3 + 1.5 * IQR
-                outliers = [x for x in col
-                            if x < lower_bound or x > upper_bound]
-                if outliers:
-                    if i == 1:
-                        outliers_1 = True
-                    elif i == 2:
-                        outliers_2 = True
-                else:
-                    if i == 1:
-                        outliers_1 = False
-                    elif i == 2:
-                        outliers_2 = False
-
-            corr_p = stats.pearsonr(col_1, col_2).pvalue
-            corr_s = stats.spearmanr(col_1, col_2).pvalue
-            corr_k = stats.kendalltau(col_1, col_2).pvalue
-            model = sm.ols('y ~ x', data={'x': col_1, 'y': col_2})
-            results = model.fit(cov_type='HC1')
-            rob_corr = results.params[1]
-
-            if norm_1 and norm_2 and not outliers_1 and not outliers_2:
-                advice = 'Рекомендуется ориентироваться на коэффициент Пирсона'
-            elif (not norm_1 or not norm_2) and not outliers_1 and not outliers_2:
-                advice = 'Рекомендуется ориентироваться на коэффициент Спирмена или Кендалла'
-            elif outliers_1 or outliers_2:
-                advice = ('Рекомендуется ориентироваться на корреляцию, оцененную через регрессию '
-                          '(Robust_correlation)')
+        df1, df2 = await asyncio.gather(
+            self.fetch_hist_bond_data(ticker_1),
+            self.fetch_hist_bond_data(ticker_2)
+        )
+        return self.compute_correlation(self.prices_to_rub(df1, fx_1), self.prices_to_rub(df2, fx_2))
+
+    @staticmethod
+    def prices_to_rub(df: pd.DataFrame, fx: RateHistory | None) -> pd.DataFrame:
+        """
+        Функция для пересчета исторических цен облигации в валюте в рубли
+        по курсу на дату торгов (или ближайшую предыдущую дату).
+        Цены в процентах от номинала умножаются на курс, поэтому
+        динамика отражает и изменение цены, и изменение курса
+
+        :param df: датафрейм с историческими ценами облигации
+        :param fx: история курсов валюты номинала (None - без пересчета)
+        :return: новый датафрейм с ценами в рублях
+        """
+        if fx is None:
+            return df
+        dates = np.array(df.trade_date, dtype='datetime64[D]')
+        return df.assign(close_price=fx.to_rub(dates, df.close_price.to_numpy(dtype=float)))
+
+    @staticmethod
+    @observe(CORRELATION_COMPUTE)
+    def compute_correlation(df1: pd.DataFrame, df2: pd.DataFrame) -> dict:
+        """
+        Функция для расчета коэф.корреляции между историческими ценами
+        двух облигаций и рекомендации по выбору коэффициента
+
+        :param df1: датафрейм с историческими ценами первой облигации
+        :param df2: датафрейм с историческими ценами второй облигации
+        :return: словарь с разными коэффициентами корреляции двух облигаций
+        """
+        merged_df = pd.merge(df1, df2, on='trade_date', how='outer')
+        merged_df = merged_df.dropna()
+        if merged_df.shape[0] < 30:
+            raise NotEnoughObservations("Как минимум в одной из облигаций слишком мало "
+                                        "наблюдений (менее 30) для расчета корреляции")
+
+        col_1 = merged_df.close_price_x
+        col_2 = merged_df.close_price_y
+
+        # Проверка на нормальность
+        loc, scale = norm.fit(col_1)
+        n = norm(loc=loc, scale=scale)
+        norm_1 = 0.05 <= stats.kstest(col_1, n.cdf).pvalue
+
+        loc, scale = norm.fit(col_2)
+        n = norm(loc=loc, scale=scale)
+        norm_2 = 0.05 <= stats.kstest(col_2, n.cdf).pvalue
+
+        col_dict = {
+            1: col_1,
+            2: col_2
+        }
+        # Проверка на выбросы
+        for i in range(1, 3):
+            col = col_dict[i]
+
+            q1 = np.percentile(col, 25)
+            q3 = np.percentile(col, 75)
+            IQR = q3 - q1
+            lower_bound = q1 - 1.5 * IQR
+            upper_bound = q3 + 1.5 * IQR
+            outliers = [x for x in col
+                        if x < lower_bound or x > upper_bound]
+            if outliers:
+                if i == 1:
+                    outliers_1 = True
+                elif i == 2:
+                    outliers_2 = True
             else:
-                advice = ''
+                if i == 1:
+                    outliers_1 = False
+                elif i == 2:
+                    outliers_2 = False
+
+        corr_p = stats.pearsonr(col_1, col_2).pvalue
+        corr_s = stats.spearmanr(col_1, col_2).pvalue
+        corr_k = stats.kendalltau(col_1, col_2).pvalue
+        model = sm.ols('y ~ x', data={'x': col_1, 'y': col_2})
+        results = model.fit(cov_type='HC1')
+        rob_corr = results.params['x']
+
+        if norm_1 and norm_2 and not outliers_1 and not outliers_2:
+            advice = 'Рекомендуется ориентироваться на коэффициент Пирсона'
+        elif (not norm_1 or not norm_2) and not outliers_1 and not outliers_2:
+            advice = 'Рекомендуется ориентироваться на коэффициент Спирмена или Кендалла'
+        elif outliers_1 or outliers_2:
+            advice = ('Рекомендуется ориентироваться на корреляцию, оцененную через регрессию '
+                      '(Robust_correlation)')
+        else:
+            advice = ''
 
-            corr_dict = {
-                'corr_p': corr_p,
-                'corr_s': corr_s,
-                'corr_k': corr_k,
-                'rob_corr': rob_corr,
-                'advice': advice
-            }
+        corr_dict = {
+            'corr_p': corr_p,
+            'corr_s': corr_s,
+            'corr_k': corr_k,
+            'rob_corr': rob_corr,
+            'advice': advice
+        }
 
-            return corr_dict
+        return corr_dict
 
-    async def fetch_hist_bond_data(self, session: aiohttp.ClientSession, ticker: str) -> pd.DataFrame:
+    async def fetch_hist_bond_data(self, ticker: str) -> pd.DataFrame:
         """
         Функция для получения данных по историческим ценам облигации
-        с сайта Московской биржи (за год)
+        с сайта Московской биржи (за год). Одновременные запросы
+        одного тикера за те же даты выполняются одним запросом к ISS
+        (в сессии history_flights), поэтому возвращаемый датафрейм нельзя изменять
 
-        :param session: объект сессии подключения к источнику
         :param ticker: тикер облигации
         :return: датафрейм с данными по историческим ценам облигации
         """
         end_date = datetime.today().strftime("%Y-%m-%d")
         start_date = (datetime.today() - timedelta(days=365)).strftime("%Y-%m-%d")
+        return await history_flights.do(
+            (ticker, start_date, end_date),
+            lambda session: self.fetch_hist_bond_pages(session, ticker, start_date, end_date)
+        )
 
+    async def fetch_hist_bond_pages(self, session: aiohttp.ClientSession, ticker: str,
+                                    start_date: str, end_date: str) -> pd.DataFrame:
+        """
+        Функция для получения страниц исторических цен облигации за период
+
+        :param session: объект сессии подключения к источнику
+        :param ticker: тикер облигации
+        :param start_date: начальная дата (YYYY-MM-DD)
+        :param end_date: конечная дата (YYYY-MM-DD)
+        :return: датафрейм с данными по историческим ценам облигации
+        """
         df = pd.DataFrame(columns=['trade_date', 'close_price'])
         for point in ["0", "100", "200"]:
             full_url = self.HIST_URL.format(**locals())
-            async with session.get(full_url) as response:
-                if response.status == 200:
-                    data = await response.json()
+            data = await http_client.get_json(session, full_url, ISS_FETCH, endpoint="history")
 
-                    if data is not None:
-                        columns = ['trade_date', 'close_price']
-                        rows = data["history"]["data"]
-                        data = [[row[1], row[9]] for row in rows]
+            if data is not None:
+                columns = ['trade_date', 'close_price']
+                rows = data["history"]["data"]
+                data = [[row[1], row[9]] for row in rows]
 
-                        new_df = pd.DataFrame(data, columns=columns)
-                        df = pd.concat([df, new_df])
-        return df
+                new_df = pd.DataFrame(data, columns=columns)
+                df = pd.concat([df, new_df])
+        return df.astype({'close_price': float})
+
+    async def load_hist_prices(self, last_dates: dict[str, date | None], curr_dict: dict):
+        """
+        Функция для инкрементальной загрузки исторических цен облигаций:
+        по каждому тикеру запрашиваются только строки новее последней
+        сохраненной даты торгов (или за год, если истории еще нет).
+        Тикеры обрабатываются параллельно с ограничением HISTORY_SYNC_CONCURRENCY.
+
+        :param last_dates: словарь тикер -> последняя сохраненная дата торгов
+        :param curr_dict: словарь с данными о валютах и их курсах
+        :return: асинхронный генератор списков словарей с историческими ценами
+        """
+        today = date.today()
+        default_start = today - timedelta(days=365)
+        semaphore = asyncio.Semaphore(HISTORY_SYNC_CONCURRENCY)
+
+        async def fetch_one(session: aiohttp.ClientSession, ticker: str, start_date: date) -> list[dict]:
+            # Ошибка по одному тикеру (например, 404 по погашенной облигации)
+            # не прерывает загрузку остальных: тикер догрузится при следующем запуске
+            async with semaphore:
+                try:
+                    return await self.fetch_hist_prices(session=session, ticker=ticker,
+                                                        start_date=start_date, curr_dict=curr_dict)
+                except Exception:
+                    logger.exception("Не удалось загрузить исторические цены %s", ticker)
+                    with stage("failed") as failed_stage:
+                        failed_stage.rows += 1
+                    return []
+
+        async with aiohttp.ClientSession() as session:
+            tasks = [
+                fetch_one(session, ticker, last_date + timedelta(days=1) if last_date else default_start)
+                for ticker, last_date in last_dates.items()
+                if last_date is None or last_date < today
+            ]
+            async for history in as_completed_results(tasks):
+                yield history
+
+    async def fetch_hist_prices(self, session: aiohttp.ClientSession, ticker: str,
+                                start_date: date, curr_dict: dict) -> list[dict]:
+        """
+        Функция для получения исторических цен облигации с сайта
+        Московской биржи начиная с даты start_date (с учетом всех страниц ответа)
+
+        :param session: объект сессии подключения к источнику
+        :param ticker: тикер облигации
+        :param start_date: дата, начиная с которой запрашиваются данные
+        :param curr_dict: словарь с данными о валютах и их курсах
+        :return: список словарей с историческими ценами облигации
+        """
+        end_date = datetime.today().strftime("%Y-%m-%d")
+        start_date = start_date.strftime("%Y-%m-%d")
+
+        records = []
+        point = 0
+        while True:
+            full_url = self.HIST_URL.format(ticker=ticker, start_date=start_date,
+                                            end_date=end_date, point=point)
+            with stage("fetch"):
+                data = await http_client.get_json(session, full_url, ISS_FETCH, endpoint="history")
+
+            with stage("transform"):
+                columns = {name: i for i, name in enumerate(data["history"]["columns"])}
+                rows = data["history"]["data"]
+                for row in rows:
+                    face_value = row[columns["FACEVALUE"]]
+                    waprice = row[columns["WAPRICE"]]
+                    waprice_cur = waprice * face_value / 100 if waprice and face_value else None
+                    rate = curr_dict.get(row[columns["FACEUNIT"]])
+                    records.append({
+                        'ticker': ticker,
+                        'trade_date': date.fromisoformat(row[columns["TRADEDATE"]]),
+                        'close_price': row[columns["LEGALCLOSEPRICE"]],
+                        'waprice_cur': waprice_cur,
+                        'waprice_rub': (Decimal(str(waprice_cur)) * rate
+                                        if waprice_cur is not None and rate is not None else None),
+                    })
+
+            # Переходим к следующей странице, пока не выгрузим все строки
+            cursor = dict(zip(data["history.cursor"]["columns"], data["history.cursor"]["data"][0]))
+            point = cursor["INDEX"] + cursor["PAGESIZE"]
+            if not rows or point >= cursor["TOTAL"]:
+                break
+        return records
+
+
+    async def load_coupon_schedules(self, tickers: list[str]):
+        """
+        Функция для загрузки графиков выплат (купоны, амортизации, оферты)
+        облигаций с ISS bondization. Тикеры обрабатываются параллельно
+        с ограничением HISTORY_SYNC_CONCURRENCY
+
+        :param tickers: список тикеров
+        :return: асинхронный генератор пар (тикер, список выплат или None,
+                 если график тикера загрузить не удалось)
+        """
+        semaphore = asyncio.Semaphore(HISTORY_SYNC_CONCURRENCY)
+
+        async def fetch_one(session: aiohttp.ClientSession, ticker: str) -> tuple[str, list[dict] | None]:
+            async with semaphore:
+                try:
+                    return ticker, await self.fetch_coupon_schedule(session=session, ticker=ticker)
+                except Exception:
+                    logger.exception("Не удалось загрузить график выплат %s", ticker)
+                    with stage("failed") as failed_stage:
+                        failed_stage.rows += 1
+                    return ticker, None
+
+        async with aiohttp.ClientSession() as session:
+            async for result in as_completed_results([fetch_one(session, ticker) for ticker in tickers]):
+                yield result
+
+    async def fetch_coupon_schedule(self, session: aiohttp.ClientSession, ticker: str) -> list[dict]:
+        """
+        Функция для получения графика выплат облигации с сайта Московской биржи.
+        Суммы выплат - на одну облигацию в валюте номинала (для будущих
+        купонов флоатеров сумма неизвестна и равна None)
+
+        :param session: объект сессии подключения к источнику
+        :param ticker: тикер облигации
+        :return: список словарей с выплатами облигации
+        """
+        with stage("fetch"):
+            data = await http_client.get_json(session, self.BONDIZATION_URL.format(ticker=ticker),
+                                              ISS_FETCH, endpoint="bondization")
+
+        # Ключ (вид, дата) уникален в таблице coupon_schedule, повторы строк ISS отбрасываются
+        schedule = {}
+        for kind, (block_name, date_column, value_column, prct_column) in BONDIZATION_BLOCKS.items():
+            block = data.get(block_name)
+            if not block:
+                continue
+            columns = {name: i for i, name in enumerate(block["columns"])}
+            for row in block["data"]:
+                pay_date = row[columns[date_column]]
+                if not pay_date or pay_date == '0000-00-00':
+                    continue
+                value, prct = row[columns[value_column]], row[columns[prct_column]]
+                schedule[kind, pay_date] = {
+                    'ticker': ticker,
+                    'kind': kind,
+                    'pay_date': date.fromisoformat(pay_date),
+                    'value': None if value is None else Decimal(str(value)).quantize(SCHEDULE_PRECISION),
+                    'value_prct': None if prct is None else Decimal(str(prct)).quantize(SCHEDULE_PRECISION),
+                }
+        return list(schedule.values())
+
+
+async def read_securities_columns(response: aiohttp.ClientResponse) -> dict[str, list]:
+    """
+    Функция для потокового разбора блока securities ответа ISS:
+    значения столбцов BOND_COLUMNS собираются по столбцам по мере
+    чтения ответа, остальные столбцы и блоки ответа не сохраняются
+
+    :param response: ответ ISS
+    :return: словарь столбец -> список значений
+    """
+    columns: list[str] = []
+    positions: dict[int, list] = {}
+    data = {column: [] for column in BOND_COLUMNS}
+    position = 0
+    async for prefix, event, value in ijson.parse_async(response.content, use_float=True):
+        # Самое частое событие - значение ячейки, поэтому проверяется первым
+        if prefix == 'securities.data.item.item':
+            if position in positions:
+                positions[position].append(value)
+            position += 1
+        elif prefix == 'securities.data.item':
+            position = 0
+        elif prefix == 'securities.columns.item':
+            columns.append(value)
+        elif prefix == 'securities.columns' and event == 'end_array':
+            positions = {columns.index(column): data[column] for column in BOND_COLUMNS}
+        elif prefix == 'securities.data' and event == 'end_array':
+            break
+    return data
@@ -0,0 +1,83 @@
+from datetime import date, timedelta
+
+import numpy as np
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from models import crud
+
+
+def to_rate_records(currency_data: list[dict]) -> list[dict]:
+    """
+    Функция для преобразования ответа XML_daily в записи таблицы currency_rates
+    (рубль в таблицу не записывается)
+
+    :param currency_data: список валют с курсами и датой курса
+    :return: список курсов (код валюты, дата, курс за единицу)
+    """
+    return [
+        {'code': currency['currency_code'], 'rate_date': currency['rate_date'], 'rate': currency['curs']}
+        for currency in currency_data if currency['valute_id'] is not None
+    ]
+
+
+# Запас дней до начала периода, чтобы у первых дат был курс предыдущего
+# рабочего дня (с учетом длинных праздников)
+RATE_LOOKBACK = timedelta(days=14)
+
+
+class RateHistory:
+    """
+    История курсов одной валюты для пересчета цен в рубли:
+    каждой дате сопоставляется курс на эту дату или, если курс
+    на нее не устанавливался, на ближайшую предыдущую дату (as-of).
+    Датам раньше первого загруженного курса сопоставляется первый курс
+    (история курсов могла быть еще не догружена за весь период цен)
+    """
+    def __init__(self, code: str, rate_dates: np.ndarray, rates: np.ndarray):
+        self.code = code
+        self.rate_dates = rate_dates
+        self.rates = rates
+
+    def asof(self, dates: np.ndarray) -> np.ndarray:
+        """
+        Функция для векторного поиска курсов на даты (as-of)
+
+        :param dates: массив дат (datetime64[D])
+        :return: массив курсов (первый курс для дат раньше первого курса)
+        """
+        idx = np.searchsorted(self.rate_dates, dates, side='right') - 1
+        return self.rates[np.clip(idx, 0, None)]
+
+    def to_rub(self, dates: np.ndarray, amounts: np.ndarray) -> np.ndarray:
+        """
+        Функция для пересчета сумм в валюте в рубли по курсу на дату каждой суммы
+
+        :param dates: массив дат (datetime64[D])
+        :param amounts: массив сумм в валюте
+        :return: массив сумм в рублях
+        """
+        return amounts * self.asof(dates)
+
+
+async def load_rate_history(db: AsyncSession, code: str | None,
+                            date_from: date, date_till: date) -> RateHistory | None:
+    """
+    Функция для загрузки истории курсов валюты за период из таблицы currency_rates
+
+    :param db: объект подключения к БД
+    :param code: код валюты
+    :param date_from: начальная дата
+    :param date_till: конечная дата
+    :return: объект RateHistory или None (рубль или курсы за период не загружены)
+    """
+    if code is None or code in ('SUR', 'RUB'):
+        return None
+    rows = await crud.get_currency_rate_history(db=db, code=code, date_from=date_from - RATE_LOOKBACK,
+                                                date_till=date_till)
+    if not rows:
+        return None
+    return RateHistory(
+        code=code,
+        rate_dates=np.array([row.rate_date for row in rows], dtype='datetime64[D]'),
+        rates=np.array([row.rate for row in rows], dtype=float)
+    )
@@ -1,9 +1,14 @@
-from datetime import datetime
+from dataclasses import dataclass, asdict
 from decimal import Decimal
+from itertools import groupby
 
+import numpy as np
 from scipy.optimize import fsolve
 
 from models import schemas
+from utils.metrics import observe, YTM_SOLVE, SCENARIO_COMPUTE
+from utils.yield_curve import (fit_nss_curve, annual_zero_rates, curve_prices,
+                               MIN_CURVE_BONDS, MIN_CURVE_TERM)
 
 
 def without_coupons_metrics(r: float, bond_info: schemas.BondInfo) -> tuple:
@@ -34,7 +39,8 @@ def without_coupons_metrics(r: float, bond_info: schemas.BondInfo) -> tuple:
         return [fair_value - bond_info.prevwaprice_rub]
 
     # Считаем доходность к погашению
-    ytm = fsolve(f, [0.05], bond_info)
+    with observe(YTM_SOLVE, method="fsolve"):
+        ytm = fsolve(f, [0.05], bond_info)
     round_ytm = round(Decimal(ytm[0]), 4)
 
     # Считаем справедливую стоимость облигации на основе ставки дисконтирования r
@@ -68,75 +74,412 @@ def one_coupon_metrics(r: float, bond_info: schemas.BondInfo) -> tuple:
         return fair_value
 
     # Функция для построения модели разницы между справедливой стоимостью
-    # и средневзвешенной ценой облигации (используется для расчета ytm)
+    # и грязной ценой облигации (используется для расчета ytm)
     def f(x, bond_info: schemas.BondInfo):
         fair_value = evaluate_fair_value_one_coupon(x[0], bond_info)
-        return [fair_value - bond_info.prevwaprice_rub]
+        return [fair_value - dirty_price(bond_info)]
 
     # Считаем доходность к погашению
-    ytm = fsolve(f, [0.05], bond_info)
+    with observe(YTM_SOLVE, method="fsolve"):
+        ytm = fsolve(f, [0.05], bond_info)
     round_ytm = round(Decimal(ytm[0]), 4)
 
-    # Считаем справедливую стоимость облигации
-    fair_value = evaluate_fair_value_one_coupon(r, bond_info)
+    # Считаем справедливую стоимость облигации (чистую, как и средневзвешенная цена)
+    fair_value = evaluate_fair_value_one_coupon(r, bond_info) - (bond_info.accum_coupon_rub or 0)
 
     return current_yield, round_ytm, fair_value
 
 
-def several_coupons_metrics(r: float, bond_info: schemas.BondInfo) -> tuple:
+def several_coupons_metrics(r: float, bond_info: schemas.BondInfo,
+                            schedule: "CashFlowSchedule | None" = None) -> tuple:
     """
     Функция для расчета текущей доходности,
     доходности к погашению, справедливой стоимости
-    облигации с несколькими купонами в конце срока погашения
+    облигации с несколькими купонами до погашения
+    (или по графику выплат ISS, если он загружен)
 
     :param r: ставка дисконтирования (в процентах)
     :param bond_info: объект класса BondInfo (информация по облигации)
+    :param schedule: график выплат облигации (None - купоны считаются неизменными)
     :return: кортеж с рассчитанными метриками облигации
     """
 
     # Считаем текущую доходность
-    current_yield = round((bond_info.coupon_value_rub * Decimal((365 / bond_info.coupon_period)))
-                          / bond_info.prevwaprice_rub * 100, 4)
+    if bond_info.coupon_value_rub and bond_info.coupon_period:
+        current_yield = round((bond_info.coupon_value_rub * Decimal((365 / bond_info.coupon_period)))
+                              / bond_info.prevwaprice_rub * 100, 4)
+    else:
+        current_yield = Decimal(0)
+
+    # Денежные потоки и дата оценки - массивы, поэтому доходность к погашению
+    # и справедливая стоимость считаются без цикла по датам купонов.
+    # Доходность считается по грязной цене (см. dirty_price)
+    val_dates = np.array([np.datetime64(bond_info.loading_date, 'D')])
+    cf_dates, cf_amounts = coupon_cash_flows(bond_info, val_dates[0], schedule)
+    ytm = solve_ytm(cf_dates, cf_amounts, val_dates, np.array([float(dirty_price(bond_info))]))
+    round_ytm = round(Decimal(ytm[0]), 4)
 
-    # Функция расчета справедливой стоимости облигации с несколькими купонами
-    def evaluate_fair_value_many_coupons(rate, bond_info: schemas.BondInfo):
-        # Считаем справедливую стоимость номинала
-        time_to_maturity_days = (bond_info.maturity_date - bond_info.loading_date).days
-        time_to_maturity_years = time_to_maturity_days / 365
-        fair_value_nominal = bond_info.nominal_rub / Decimal((1 + rate / 100) ** time_to_maturity_years)
+    # Считаем справедливую стоимость (чистую, как и средневзвешенная цена)
+    fair_value = round(Decimal(discount_cash_flows(cf_dates, cf_amounts, val_dates, r)[0])
+                       - (bond_info.accum_coupon_rub or 0), 4)
 
-        # Считаем справедливую стоимость ближайшего купона
-        time_to_next_coupon_days = (bond_info.next_coupon_date - bond_info.loading_date).days
-        time_to_next_coupon_years = time_to_next_coupon_days / 365
-        fair_value_coupon = (bond_info.coupon_value_rub /
-                             Decimal((1 + rate / 100) ** time_to_next_coupon_years))
-
-        # Считаем справедливую стоимость остальных купонов
-        next_date = bond_info.next_coupon_date + datetime.timedelta(bond_info.coupon_period)
-        other_coupons_value = 0
-        while next_date <= bond_info.maturity_date:
-            time_to_next_other_coupon_days = (next_date - bond_info.loading_date).days
-            time_to_next_other_coupon_years = time_to_next_other_coupon_days / 365
-            fair_value_other_coupon = (bond_info.coupon_value_rub /
-                                       Decimal((1 + rate / 100) ** time_to_next_other_coupon_years))
-            other_coupons_value += fair_value_other_coupon
-            next_date += datetime.timedelta(bond_info.coupon_period)
-
-        # Считаем общую справедливую стоимость
-        fair_value = round(fair_value_nominal + fair_value_coupon + other_coupons_value, 4)
-        return fair_value
+    return current_yield, round_ytm, fair_value
 
-    # Функция для построения модели разницы между справедливой стоимостью
-    # и средневзвешенной ценой облигации (используется для расчета ytm)
-    def f(x, bond_info: schemas.BondInfo):
-        fair_value = evaluate_fair_value_many_coupons(x[0], bond_info)
-        return [fair_value - bond_info.prevwaprice_rub]
 
-    # Считаем доходность к погашению
-    ytm = fsolve(f, [0.05], bond_info)
-    round_ytm = round(Decimal(ytm[0]), 4)
+@dataclass
+class CashFlowSchedule:
+    """График выплат облигации из таблицы coupon_schedule (в валюте номинала)"""
+    pay_dates: np.ndarray  # даты выплат (datetime64[D])
+    amounts: np.ndarray  # суммы выплат (NaN - сумма будущего купона неизвестна)
+    has_redemption: bool  # есть ли в графике погашение номинала
 
-    # Считаем справедливую стоимость
-    fair_value = evaluate_fair_value_many_coupons(r, bond_info)
 
-    return current_yield, round_ytm, fair_value
+def build_schedules(rows: list) -> dict[str, CashFlowSchedule]:
+    """
+    Функция для построения графиков выплат облигаций в виде массивов
+    (один раз на облигацию, чтобы расчеты не обходили выплаты в цикле)
+
+    :param rows: строки таблицы coupon_schedule (купоны и амортизации),
+                 отсортированные по тикеру и дате выплаты
+    :return: словарь тикер -> график выплат
+    """
+    schedules = {}
+    for ticker, ticker_rows in groupby(rows, key=lambda row: row.ticker):
+        ticker_rows = list(ticker_rows)
+        schedules[ticker] = CashFlowSchedule(
+            pay_dates=np.array([row.pay_date for row in ticker_rows], dtype='datetime64[D]'),
+            amounts=np.array([np.nan if row.value is None else float(row.value) for row in ticker_rows]),
+            has_redemption=any(row.kind == 'amortization' for row in ticker_rows)
+        )
+    return schedules
+
+
+def coupon_cash_flows(bond_info: schemas.BondInfo, start_date: np.datetime64,
+                      schedule: CashFlowSchedule | None = None) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Функция для построения графика денежных потоков облигации (в рублях).
+    Если загружен график выплат ISS, используются фактические купоны
+    и амортизации (неизвестные будущие купоны флоатеров принимаются равными
+    текущему купону). Иначе размер купона и его период считаются неизменными,
+    а даты купонов восстанавливаются назад от даты ближайшего купона
+    вплоть до start_date, чтобы график подходил и для прошлых дат оценки.
+
+    :param bond_info: объект класса BondInfo (информация по облигации)
+    :param start_date: самая ранняя дата оценки
+    :param schedule: график выплат облигации
+    :return: кортеж из массива дат выплат и массива сумм выплат
+    """
+    if schedule is not None:
+        fx = (float(bond_info.nominal_rub) / float(bond_info.nominal_cur)
+              if bond_info.nominal_rub and bond_info.nominal_cur else 1.0)
+        amounts = np.where(np.isnan(schedule.amounts), float(bond_info.coupon_value_cur or 0), schedule.amounts)
+        if schedule.has_redemption or bond_info.maturity_date is None:
+            return schedule.pay_dates, amounts * fx
+        return (np.append(schedule.pay_dates, np.datetime64(bond_info.maturity_date, 'D')),
+                np.append(amounts, float(bond_info.nominal_cur or 0)) * fx)
+
+    maturity = np.datetime64(bond_info.maturity_date, 'D')
+    pay_dates = [maturity]
+    amounts = [float(bond_info.nominal_rub)]
+
+    coupon = float(bond_info.coupon_value_rub or 0)
+    if coupon and bond_info.coupon_period and bond_info.next_coupon_date:
+        step = np.timedelta64(bond_info.coupon_period, 'D')
+        next_coupon = np.datetime64(bond_info.next_coupon_date, 'D')
+        n_back = max(int((next_coupon - start_date) / step), 0) + 1
+        n_forward = int((maturity - next_coupon) / step)
+        coupon_dates = next_coupon + step * np.arange(-n_back, n_forward + 1)
+        coupon_dates = coupon_dates[coupon_dates <= maturity]
+        pay_dates.extend(coupon_dates)
+        amounts.extend([coupon] * len(coupon_dates))
+
+    return np.array(pay_dates, dtype='datetime64[D]'), np.array(amounts, dtype=float)
+
+
+def discount_cash_flows(cf_dates: np.ndarray, cf_amounts: np.ndarray,
+                        val_dates: np.ndarray, rates: np.ndarray | float) -> np.ndarray:
+    """
+    Функция для векторного расчета справедливой стоимости облигации
+    сразу на множество дат оценки (учитываются только будущие потоки)
+
+    :param cf_dates: массив дат выплат
+    :param cf_amounts: массив сумм выплат
+    :param val_dates: массив дат оценки
+    :param rates: ставка дисконтирования (в процентах), число или массив по датам оценки
+    :return: массив справедливых стоимостей по датам оценки
+    """
+    t = (cf_dates[None, :] - val_dates[:, None]).astype(float) / 365
+    future = t > 0
+    rates = np.broadcast_to(np.asarray(rates, dtype=float), val_dates.shape)[:, None]
+    discount = np.where(future, (1 + rates / 100) ** -np.where(future, t, 0), 0)
+    return discount @ cf_amounts
+
+
+def solve_ytm(cf_dates: np.ndarray, cf_amounts: np.ndarray, val_dates: np.ndarray,
+              prices: np.ndarray) -> np.ndarray:
+    """
+    Функция для векторного расчета доходности к погашению облигации
+    сразу для всех дат оценки (вместо отдельного fsolve на каждую дату)
+
+    :param cf_dates: массив дат выплат
+    :param cf_amounts: массив сумм выплат
+    :param val_dates: массив дат оценки
+    :param prices: массив цен облигации по датам оценки
+    :return: массив доходностей к погашению (в процентах)
+    """
+    t = (cf_dates[None, :] - val_dates[:, None]).astype(float) / 365
+    future = t > 0
+    return solve_ytm_matrix(np.where(future, t, 0),
+                            np.where(future, cf_amounts[None, :], 0),
+                            prices)
+
+
+def cash_flow_matrix(bonds: list, val_date: np.datetime64,
+                     schedules: dict[str, CashFlowSchedule] | None = None) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Функция для построения выровненной матрицы будущих денежных потоков
+    множества облигаций на дату оценки (строки - облигации,
+    столбцы дополняются нулями до максимального числа выплат)
+
+    :param bonds: список объектов с информацией по облигациям
+    :param val_date: дата оценки
+    :param schedules: словарь тикер -> график выплат (для облигаций с загруженным графиком)
+    :return: кортеж из матрицы сроков до выплат (в годах) и матрицы сумм выплат
+    """
+    schedules = schedules or {}
+    flows = []
+    for bond_info in bonds:
+        cf_dates, cf_amounts = coupon_cash_flows(bond_info, val_date, schedules.get(bond_info.ticker))
+        future = cf_dates > val_date
+        flows.append(((cf_dates[future] - val_date).astype(float) / 365, cf_amounts[future]))
+
+    width = max((len(t) for t, _ in flows), default=0)
+    times = np.zeros((len(flows), width))
+    amounts = np.zeros((len(flows), width))
+    for i, (t, a) in enumerate(flows):
+        times[i, :len(t)] = t
+        amounts[i, :len(a)] = a
+    return times, amounts
+
+
+def dirty_price(bond_info: schemas.BondInfo) -> Decimal:
+    """
+    Функция для расчета грязной цены облигации (средневзвешенная цена
+    плюс накопленный купонный доход). Денежные потоки облигации включают
+    весь ближайший купон, поэтому доходность к погашению считается по грязной цене
+
+    :param bond_info: объект класса BondInfo (информация по облигации)
+    :return: грязная цена облигации в рублях
+    """
+    return bond_info.prevwaprice_rub + (bond_info.accum_coupon_rub or 0)
+
+
+def market_prices(bonds: list) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Функция для получения массивов цен облигаций: чистая цена используется
+    для стоимости и сравнения со справедливой стоимостью, грязная (см. dirty_price) -
+    для расчета доходности к погашению
+
+    :param bonds: список объектов с информацией по облигациям
+    :return: кортеж из массивов чистых цен, накопленного купонного дохода и грязных цен
+    """
+    prices = np.array([float(bond_info.prevwaprice_rub) for bond_info in bonds])
+    dirty = np.array([float(dirty_price(bond_info)) for bond_info in bonds])
+    return prices, dirty - prices, dirty
+
+
+def solve_ytm_matrix(times: np.ndarray, amounts: np.ndarray, prices: np.ndarray,
+                     guess: float = 10.0, tol: float = 1e-8, max_iter: int = 50) -> np.ndarray:
+    """
+    Функция для векторного расчета доходности к погашению методом Ньютона
+    по матрице денежных потоков (одна строка - одна облигация или дата оценки)
+
+    :param times: матрица сроков до выплат (в годах), нули для отсутствующих выплат
+    :param amounts: матрица сумм выплат, нули для отсутствующих выплат
+    :param prices: массив цен по строкам матрицы
+    :param guess: начальное приближение доходности (в процентах)
+    :param tol: точность решения
+    :param max_iter: максимальное число итераций
+    :return: массив доходностей к погашению (в процентах)
+    """
+    with observe(YTM_SOLVE, method="vectorized"):
+        return _newton_ytm(times, amounts, prices, guess, tol, max_iter)
+
+
+def _newton_ytm(times: np.ndarray, amounts: np.ndarray, prices: np.ndarray,
+                guess: float, tol: float, max_iter: int) -> np.ndarray:
+    ytm = np.full(prices.shape, guess, dtype=float)
+    for _ in range(max_iter):
+        base = 1 + ytm[:, None] / 100
+        pv = amounts * base ** -times
+        f = pv.sum(axis=1) - prices
+        df = -(pv * times / base).sum(axis=1) / 100
+        step = np.divide(f, df, out=np.zeros_like(f), where=df != 0)
+        ytm = np.maximum(ytm - step, -99.0)
+        if np.nanmax(np.abs(step), initial=0) < tol:
+            break
+
+    ytm[~(amounts > 0).any(axis=1) | np.isnan(prices)] = np.nan
+    return ytm
+
+
+# Число облигаций в одном блоке сценарного расчета: массив блока
+# (облигации x сценарии x выплаты) ограничен по памяти
+SCENARIO_CHUNK = 500
+
+
+def rate_shocks(parallel_bp: np.ndarray, twist_bp: np.ndarray, pivot_years: np.ndarray,
+                times: np.ndarray) -> np.ndarray:
+    """
+    Функция для расчета изменения ставки дисконтирования по сценариям
+    для каждого срока выплаты: параллельный сдвиг плюс поворот вокруг срока
+    pivot_years (при сроке 0 ставка меняется на -twist_bp, при сроке
+    2 * pivot_years и дальше - на +twist_bp, между ними - линейно)
+
+    :param parallel_bp: массив параллельных сдвигов по сценариям (в базисных пунктах)
+    :param twist_bp: массив поворотов по сценариям (в базисных пунктах)
+    :param pivot_years: массив сроков поворота по сценариям (в годах)
+    :param times: массив сроков до выплат (в годах), размерность (..., 1, выплаты)
+    :return: массив изменений ставки (в процентах), размерность (..., сценарии, выплаты)
+    """
+    parallel_bp, twist_bp, pivot_years = (np.asarray(x, dtype=float)[:, None]
+                                          for x in (parallel_bp, twist_bp, pivot_years))
+    rotation = np.clip((times - pivot_years) / pivot_years, -1, 1)
+    return (parallel_bp + twist_bp * rotation) / 100
+
+
+def scenario_fair_values(times: np.ndarray, amounts: np.ndarray, ytm: np.ndarray,
+                         parallel_bp: np.ndarray, twist_bp: np.ndarray,
+                         pivot_years: np.ndarray) -> np.ndarray:
+    """
+    Функция для расчета справедливой стоимости облигаций по сценариям
+    изменения ставок: каждая выплата дисконтируется по доходности
+    к погашению облигации, измененной на сдвиг сценария для срока выплаты.
+    Матрица (облигации x сценарии) считается одним вычислением
+    над массивами (по блокам облигаций, чтобы ограничить память)
+
+    :param times: матрица сроков до выплат (в годах), нули для отсутствующих выплат
+    :param amounts: матрица сумм выплат, нули для отсутствующих выплат
+    :param ytm: массив доходностей к погашению облигаций (в процентах)
+    :param parallel_bp: массив параллельных сдвигов по сценариям (в базисных пунктах)
+    :param twist_bp: массив поворотов по сценариям (в базисных пунктах)
+    :param pivot_years: массив сроков поворота по сценариям (в годах)
+    :return: матрица справедливых стоимостей (облигации x сценарии)
+    """
+    fair_values = np.empty((len(ytm), len(parallel_bp)))
+    with observe(SCENARIO_COMPUTE):
+        for start in range(0, len(ytm), SCENARIO_CHUNK):
+            block = slice(start, start + SCENARIO_CHUNK)
+            t = times[block, None, :]
+            rates = ytm[block, None, None] + rate_shocks(parallel_bp, twist_bp, pivot_years, t)
+            fair_values[block] = (amounts[block, None, :] * (1 + rates / 100) ** -t).sum(axis=2)
+    return fair_values
+
+
+def history_metrics(r: float, bond_info: schemas.BondInfo,
+                    trade_dates: np.ndarray, prices: np.ndarray,
+                    fx_rates: np.ndarray | None = None,
+                    schedule: CashFlowSchedule | None = None) -> dict[str, np.ndarray]:
+    """
+    Функция для расчета временного ряда метрик облигации
+    (текущей доходности, доходности к погашению, справедливой стоимости)
+    по историческим ценам одним векторным проходом.
+    Для облигаций в валюте цены переданы в рублях по курсу на дату торгов,
+    а денежные потоки - в рублях по текущему курсу, поэтому для расчета
+    доходностей цены приводятся к текущему курсу, а справедливая
+    стоимость пересчитывается по курсу на дату торгов.
+    В отличие от метрик на текущую дату, доходность считается по чистой цене:
+    в истории цен накопленный купонный доход на даты торгов не сохраняется
+
+    :param r: ставка дисконтирования (в процентах)
+    :param bond_info: объект класса BondInfo (информация по облигации)
+    :param trade_dates: массив дат торгов
+    :param prices: массив средневзвешенных цен облигации в рублях
+    :param fx_rates: массив курсов валюты номинала на даты торгов (None - рублевая облигация)
+    :param schedule: график выплат облигации (None - купоны считаются неизменными)
+    :return: словарь с массивами рассчитанных метрик
+    """
+    cf_dates, cf_amounts = coupon_cash_flows(bond_info, trade_dates.min(), schedule)
+    fair_value = discount_cash_flows(cf_dates, cf_amounts, trade_dates, r)
+    if fx_rates is not None:
+        fx_now = float(bond_info.nominal_rub) / float(bond_info.nominal_cur)
+        prices = prices / fx_rates * fx_now
+        fair_value = fair_value / fx_now * fx_rates
+
+    coupon = float(bond_info.coupon_value_rub or 0)
+    if coupon and bond_info.coupon_period:
+        current_yield = coupon * 365 / bond_info.coupon_period / prices * 100
+    else:
+        current_yield = np.zeros_like(prices)
+
+    return {
+        'current_yield': current_yield,
+        'ytm_prct': solve_ytm(cf_dates, cf_amounts, trade_dates, prices),
+        'fair_value': fair_value,
+    }
+
+
+def precompute_bond_metrics(bonds: list, val_date: np.datetime64,
+                            schedules: dict[str, CashFlowSchedule] | None = None,
+                            curve_board: str | None = None) -> tuple[list[dict], dict | None]:
+    """
+    Функция для расчета текущей доходности и доходности к погашению
+    сразу по всем облигациям одним векторным проходом (для ночного пересчета).
+    По облигациям режима curve_board подбирается кривая бескупонной доходности,
+    по которой тем же проходом рассчитываются G-спред и справедливая стоимость
+    рублевых облигаций. Доходность и кривая считаются по грязной цене
+    (с накопленным купонным доходом), справедливая стоимость - чистая
+
+    :param bonds: список объектов с информацией по облигациям
+    :param val_date: дата оценки
+    :param schedules: словарь тикер -> график выплат (для облигаций с загруженным графиком)
+    :param curve_board: режим торгов ОФЗ для подбора кривой (None - кривая не подбирается)
+    :return: кортеж из списка словарей с рассчитанными метриками облигаций
+             и словаря с параметрами кривой (None, если кривая не подобрана)
+    """
+    schedules = schedules or {}
+    bonds = [bond_info for bond_info in bonds
+             if bond_info.prevwaprice_rub and bond_info.nominal_rub and bond_info.maturity_date]
+    times, amounts = cash_flow_matrix(bonds, val_date, schedules)
+    # Доходность и кривая считаются по грязной цене (см. dirty_price)
+    prices, accrued, dirty_prices = market_prices(bonds)
+    ytm = solve_ytm_matrix(times, amounts, dirty_prices)
+
+    # Рублевые облигации с фиксированными выплатами (у флоатеров будущие купоны неизвестны)
+    is_ruble = np.array([bond_info.cur_of_nominal in ('SUR', 'RUB') for bond_info in bonds], dtype=bool)
+    is_fixed = np.array([not np.isnan(schedules[bond_info.ticker].amounts).any()
+                         if bond_info.ticker in schedules else True
+                         for bond_info in bonds], dtype=bool)
+    on_curve_board = np.array([bond_info.board == curve_board for bond_info in bonds], dtype=bool)
+    term = times.max(axis=1, initial=0)
+    on_curve = on_curve_board & is_ruble & is_fixed & np.isfinite(ytm) & (term >= MIN_CURVE_TERM)
+
+    curve = None
+    curve_yield = curve_fair_value = np.full(len(bonds), np.nan)
+    if curve_board is not None and on_curve.sum() >= MIN_CURVE_BONDS:
+        params, rmse_bp = fit_nss_curve(times[on_curve], amounts[on_curve], dirty_prices[on_curve], ytm[on_curve])
+        curve = {'calc_date': val_date.item(), 'board': curve_board, **asdict(params),
+                 'bonds_count': int(on_curve.sum()), 'rmse_bp': rmse_bp}
+        curve_yield = np.where(is_ruble, annual_zero_rates(params, term), np.nan)
+        # Справедливая стоимость приводится к чистой цене, как и цена облигации
+        curve_fair_value = np.where(is_ruble, curve_prices(params, times, amounts) - accrued, np.nan)
+    g_spread = (ytm - curve_yield) * 100
+
+    metrics = []
+    for i, (bond_info, price, ytm_prct) in enumerate(zip(bonds, prices.tolist(), ytm.tolist())):
+        coupon = float(bond_info.coupon_value_rub or 0)
+        current_yield = coupon * 365 / bond_info.coupon_period / price * 100 if coupon and bond_info.coupon_period else 0
+        metrics.append({
+            'ticker': bond_info.ticker,
+            'calc_date': val_date.item(),
+            'current_yield': round(Decimal(current_yield), 4),
+            'ytm_prct': to_decimal(ytm_prct),
+            'curve_yield': to_decimal(curve_yield[i]),
+            'g_spread': to_decimal(g_spread[i]),
+            'curve_fair_value': to_decimal(curve_fair_value[i]),
+        })
+    return metrics, curve
+
+
+def to_decimal(value: float) -> Decimal | None:
+    return None if np.isnan(value) else round(Decimal(float(value)), 4)
@@ -0,0 +1,71 @@
+import hashlib
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+
+from fastapi import Request, Response
+
+from config import CACHE_MAX_AGE
+from utils.responses import response_format
+
+
+def snapshot_headers(loading_date: datetime, key: str = "") -> dict[str, str]:
+    """
+    Функция для формирования заголовков кэширования ответа,
+    зависящих только от даты загрузки снимка данных
+    (ETag различается для ответов в JSON и MessagePack)
+
+    :param loading_date: дата загрузки данных
+    :param key: дополнительный ключ ответа (тикер, параметры запроса)
+    :return: словарь с заголовками ETag, Last-Modified и Cache-Control
+             (private: ответы доступны только по токену, поэтому
+             не должны сохраняться общими прокси и CDN)
+    """
+    loading_date = loading_date.replace(tzinfo=loading_date.tzinfo or timezone.utc)
+    digest = hashlib.md5(f"{loading_date.isoformat()}|{key}|{response_format()}".encode()).hexdigest()[:16]
+    return {
+        "ETag": f'W/"{digest}"',
+        "Last-Modified": format_datetime(loading_date.astimezone(timezone.utc), usegmt=True),
+        "Cache-Control": f"private, max-age={CACHE_MAX_AGE}, must-revalidate",
+    }
+
+
+def is_not_modified(request: Request, headers: dict[str, str]) -> bool:
+    """
+    Функция для проверки условного запроса (If-None-Match / If-Modified-Since)
+
+    :param request: объект запроса
+    :param headers: заголовки кэширования ответа
+    :return: True, если у клиента актуальная версия ответа
+    """
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        etags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+        return "*" in etags or headers["ETag"].removeprefix("W/") in etags
+
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since is not None:
+        try:
+            return parsedate_to_datetime(headers["Last-Modified"]) <= parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+    return False
+
+
+def conditional_response(request: Request, response: Response,
+                         loading_date: datetime, key: str = "") -> Response | None:
+    """
+    Функция для обработки условного запроса: возвращает ответ 304,
+    если данные не изменились, иначе проставляет заголовки кэширования
+    в ответ эндпоинта и возвращает None
+
+    :param request: объект запроса
+    :param response: объект ответа эндпоинта
+    :param loading_date: дата загрузки данных
+    :param key: дополнительный ключ ответа (тикер, параметры запроса)
+    :return: ответ 304 или None
+    """
+    headers = snapshot_headers(loading_date, key)
+    if is_not_modified(request, headers):
+        return Response(status_code=304, headers=headers)
+    response.headers.update(headers)
+    return None
@@ -0,0 +1,254 @@
+import asyncio
+import random
+from time import monotonic
+from typing import Any, Awaitable, Callable, Hashable
+from urllib.parse import urlsplit
+
+import aiohttp
+from prometheus_client import Histogram
+
+from config import (
+    HTTP_TIMEOUT, HTTP_CONNECT_TIMEOUT, HTTP_MAX_RETRIES, HTTP_RATE_LIMIT, HTTP_RATE_BURST,
+    HTTP_BREAKER_THRESHOLD, HTTP_BREAKER_RESET_SEC
+)
+from utils.metrics import observe, UPSTREAM_RETRIES, UPSTREAM_CIRCUIT_OPEN, UPSTREAM_COALESCED
+
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+
+# Исключение - ошибка обращения к внешнему источнику данных (ISS MOEX, ЦБ РФ)
+class UpstreamError(Exception):
+    def __init__(self, host: str, message: str, status: int | None = None):
+        super().__init__(f"{host}: {message}")
+        self.host = host
+        self.status = status
+
+
+# Исключение - источник временно исключен из обращений после серии ошибок
+class CircuitOpenError(UpstreamError):
+    def __init__(self, host: str, retry_after: float):
+        super().__init__(host, f"circuit open, retry in {retry_after:.1f} s")
+        self.retry_after = retry_after
+
+
+class TokenBucket:
+    """
+    Ограничитель частоты запросов к одному хосту: не более rate
+    запросов в секунду в среднем, всплесками до capacity запросов
+    """
+    def __init__(self, rate: float, capacity: int):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.updated_at = monotonic()
+        self.lock = asyncio.Lock()
+
+    async def acquire(self) -> None:
+        async with self.lock:
+            while True:
+                now = monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+                self.updated_at = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+class CircuitBreaker:
+    """
+    Автомат отключения хоста: после failure_threshold ошибок подряд
+    запросы к хосту сразу завершаются ошибкой в течение reset_timeout секунд,
+    затем пропускается один пробный запрос
+    """
+    def __init__(self, host: str, failure_threshold: int, reset_timeout: float):
+        self.host = host
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at: float | None = None
+        self.trial_in_progress = False
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if monotonic() - self.opened_at < self.reset_timeout:
+            return "open"
+        return "half-open"
+
+    def before_request(self) -> None:
+        state = self.state
+        if state == "open" or (state == "half-open" and self.trial_in_progress):
+            raise CircuitOpenError(self.host, max(self.reset_timeout - (monotonic() - self.opened_at), 0))
+        if state == "half-open":
+            self.trial_in_progress = True
+
+    def release_trial(self) -> None:
+        self.trial_in_progress = False
+
+    def record_success(self) -> None:
+        self.failures = 0
+        self.opened_at = None
+        self.trial_in_progress = False
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        self.trial_in_progress = False
+        if self.opened_at is not None or self.failures >= self.failure_threshold:
+            if self.opened_at is None:
+                UPSTREAM_CIRCUIT_OPEN.labels(host=self.host).inc()
+            self.opened_at = monotonic()
+
+
+class HTTPClient:
+    """
+    Общий клиент для запросов к внешним источникам данных:
+    ограничение частоты запросов по хосту, повтор с экспоненциальной
+    задержкой при 5xx, 429 и сетевых ошибках, таймауты и автомат отключения
+    недоступного хоста. Состояние хранится на уровне процесса,
+    поэтому действует для всех сессий и шлюзов
+    """
+    def __init__(self, rate: float = HTTP_RATE_LIMIT, burst: int = HTTP_RATE_BURST,
+                 max_retries: int = HTTP_MAX_RETRIES, timeout: float = HTTP_TIMEOUT,
+                 connect_timeout: float = HTTP_CONNECT_TIMEOUT,
+                 breaker_threshold: int = HTTP_BREAKER_THRESHOLD,
+                 breaker_reset: float = HTTP_BREAKER_RESET_SEC):
+        self.rate = rate
+        self.burst = burst
+        self.max_retries = max_retries
+        self.timeout = aiohttp.ClientTimeout(total=timeout, connect=connect_timeout)
+        self.breaker_threshold = breaker_threshold
+        self.breaker_reset = breaker_reset
+        self.buckets: dict[str, TokenBucket] = {}
+        self.breakers: dict[str, CircuitBreaker] = {}
+
+    def bucket(self, host: str) -> TokenBucket:
+        if host not in self.buckets:
+            self.buckets[host] = TokenBucket(self.rate, self.burst)
+        return self.buckets[host]
+
+    def breaker(self, host: str) -> CircuitBreaker:
+        if host not in self.breakers:
+            self.breakers[host] = CircuitBreaker(host, self.breaker_threshold, self.breaker_reset)
+        return self.breakers[host]
+
+    async def get(self, session: aiohttp.ClientSession, url: str, histogram: Histogram,
+                  read: str | Callable[[aiohttp.ClientResponse], Awaitable[Any]] = "json", **labels):
+        """
+        Функция для GET-запроса к внешнему источнику данных
+
+        :param session: объект сессии подключения к источнику
+        :param url: url источника
+        :param histogram: гистограмма для замера времени запроса
+        :param read: формат ответа (json, text, bytes) или функция,
+                     читающая ответ (например, потоково)
+        :param labels: значения меток гистограммы
+        :return: данные ответа
+        """
+        host = urlsplit(url).netloc
+        breaker = self.breaker(host)
+        for attempt in range(self.max_retries + 1):
+            breaker.before_request()
+            await self.bucket(host).acquire()
+            retry_after = None
+            try:
+                with observe(histogram, **labels):
+                    async with session.get(url, timeout=self.timeout) as response:
+                        if response.status == 200:
+                            if callable(read):
+                                data = await read(response)
+                            elif read == "json":
+                                data = await response.json(content_type=None)
+                            elif read == "text":
+                                data = await response.text()
+                            else:
+                                data = await response.read()
+                            breaker.record_success()
+                            return data
+                        if response.status not in RETRY_STATUSES:
+                            breaker.record_success()
+                            raise UpstreamError(host, f"API error: {response.status}", status=response.status)
+                        retry_after = response.headers.get("Retry-After", "")
+                        error = UpstreamError(host, f"API error: {response.status}", status=response.status)
+                        reason = str(response.status)
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                error = UpstreamError(host, f"{type(e).__name__}: {e}" if str(e) else type(e).__name__)
+                reason = type(e).__name__
+            except UpstreamError:
+                raise
+            except Exception:
+                # Ответ не удалось разобрать (например, HTML-страница вместо JSON) - тоже ошибка источника
+                breaker.record_failure()
+                raise
+            finally:
+                # Пробный запрос завершен при любом исходе (в том числе при отмене),
+                # иначе автомат остался бы в полуоткрытом состоянии навсегда
+                breaker.release_trial()
+
+            breaker.record_failure()
+            if attempt == self.max_retries:
+                raise error
+            UPSTREAM_RETRIES.labels(host=host, reason=reason).inc()
+            delay = float(retry_after) if retry_after and retry_after.isdigit() else 2 ** attempt
+            await asyncio.sleep(delay + random.uniform(0, 1))
+
+    async def get_json(self, session: aiohttp.ClientSession, url: str, histogram: Histogram, **labels) -> dict:
+        return await self.get(session, url, histogram, read="json", **labels)
+
+    async def get_text(self, session: aiohttp.ClientSession, url: str, histogram: Histogram, **labels) -> str:
+        return await self.get(session, url, histogram, read="text", **labels)
+
+    async def get_stream(self, session: aiohttp.ClientSession, url: str, histogram: Histogram,
+                         read: Callable[[aiohttp.ClientResponse], Awaitable[Any]], **labels) -> Any:
+        return await self.get(session, url, histogram, read=read, **labels)
+
+    async def get_bytes(self, session: aiohttp.ClientSession, url: str, histogram: Histogram, **labels) -> bytes:
+        return await self.get(session, url, histogram, read="bytes", **labels)
+
+
+http_client = HTTPClient()
+
+
+class SingleFlight:
+    """
+    Объединение одинаковых одновременных запросов к источнику: пока запрос
+    с ключом key выполняется, остальные вызовы с тем же ключом не обращаются
+    к источнику, а ждут его результат (или ошибку).
+    Общий запрос выполняется в собственной сессии, а не в сессии первого
+    вызова: она закрывается при его отмене, а запрос ждут остальные вызовы
+    """
+    def __init__(self, name: str):
+        self.name = name
+        self.calls: dict[Hashable, asyncio.Future] = {}
+        self.session: aiohttp.ClientSession | None = None
+        self.session_loop: asyncio.AbstractEventLoop | None = None
+
+    def get_session(self) -> aiohttp.ClientSession:
+        loop = asyncio.get_running_loop()
+        if self.session is None or self.session.closed or self.session_loop is not loop:
+            self.session = aiohttp.ClientSession()
+            self.session_loop = loop
+        return self.session
+
+    async def close(self) -> None:
+        if self.session is not None and not self.session.closed:
+            await self.session.close()
+
+    async def do(self, key: Hashable, func: Callable[[aiohttp.ClientSession], Awaitable[Any]]) -> Any:
+        """
+        Функция для выполнения запроса с объединением одновременных вызовов
+
+        :param key: ключ запроса
+        :param func: функция, выполняющая запрос в переданной сессии
+        :return: результат запроса
+        """
+        future = self.calls.get(key)
+        if future is None:
+            future = asyncio.ensure_future(func(self.get_session()))
+            self.calls[key] = future
+            future.add_done_callback(lambda _: self.calls.pop(key, None))
+        else:
+            UPSTREAM_COALESCED.labels(kind=self.name).inc()
+        # shield: отмена одного из ожидающих не отменяет общий запрос
+        return await asyncio.shield(future)
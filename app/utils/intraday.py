@@ -0,0 +1,73 @@
+import asyncio
+import logging
+from datetime import datetime
+from decimal import Decimal
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from config import INTRADAY_REFRESH_MINUTES
+from models import crud
+from models.database import SessionLocal
+from utils.MOEX_gateway import MOEXGateway
+from utils.metrics import INTRADAY_UPDATED
+
+logger = logging.getLogger(__name__)
+
+
+def to_decimal(value: float | None) -> Decimal | None:
+    return None if value is None else Decimal(str(value))
+
+
+class IntradayRefresher:
+    """
+    Фоновое обновление внутридневных цен облигаций (LAST, WAPRICE, YIELD).
+    Каждые interval секунд загружается блок marketdata всех режимов торгов,
+    результат сравнивается с последним записанным состоянием в памяти
+    процесса, и в БД одним пакетным UPDATE записываются только облигации,
+    у которых цены изменились
+    """
+    def __init__(self, interval: float = INTRADAY_REFRESH_MINUTES * 60):
+        self.interval = interval
+        self.state: dict[str, tuple] = {}
+
+    def reset(self) -> None:
+        """Функция для сброса состояния (при следующем обновлении записываются все облигации)"""
+        self.state.clear()
+
+    async def refresh(self, db: AsyncSession) -> int:
+        """
+        Функция для однократного обновления внутридневных цен
+
+        :param db: объект подключения к БД
+        :return: число облигаций с изменившимися ценами
+        """
+        marketdata = await MOEXGateway().load_marketdata()
+        changed = {secid: values for secid, values in marketdata.items()
+                   if self.state.get(secid) != values[:3]}
+        await crud.update_marketdata(db=db, marketdata=[
+            {
+                'b_ticker': secid,
+                'last_price': to_decimal(last),
+                'intraday_waprice': to_decimal(waprice),
+                'intraday_yield': to_decimal(yield_prct),
+                'marketdata_time': datetime.fromisoformat(systime) if systime else datetime.now(),
+            }
+            for secid, (last, waprice, yield_prct, systime) in changed.items()
+        ])
+        # Состояние обновляется только после успешной записи
+        self.state.update({secid: values[:3] for secid, values in changed.items()})
+        INTRADAY_UPDATED.inc(len(changed))
+        return len(changed)
+
+    async def run(self) -> None:
+        """Функция для периодического обновления (ошибки пишутся в лог и не прерывают цикл)"""
+        while True:
+            try:
+                async with SessionLocal() as db:
+                    await self.refresh(db=db)
+            except Exception:
+                logger.exception("Не удалось обновить внутридневные цены")
+            await asyncio.sleep(self.interval)
+
+
+intraday_refresher = IntradayRefresher()
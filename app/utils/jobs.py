@@ -0,0 +1,250 @@
+import asyncio
+import json
+import logging
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from datetime import datetime
+from time import perf_counter
+from typing import Awaitable, Callable
+
+from fastapi import HTTPException
+
+from models import crud
+from models.database import SessionLocal
+
+# Пары видов задач, которые не выполняются одновременно (пишут в одни
+# и те же таблицы или читают данные, которые перезаписывает другая задача)
+CONFLICTING_KINDS = {frozenset(pair) for pair in (
+    ("currencies", "bonds"), ("currencies", "history"), ("currencies", "metrics"),
+    ("bonds", "history"), ("bonds", "schedules"), ("bonds", "metrics"),
+)}
+# Виды задач, части которых (с разным значением параметра) выполняются параллельно
+PARTITIONED_KINDS = {"history": "chunk"}
+
+
+@dataclass
+class JobStage:
+    """Этап фоновой задачи обновления данных"""
+    name: str
+    started_at: datetime
+    finished_at: datetime | None = None
+    duration_sec: float = 0.0
+    rows: int = 0
+    entries: int = 0
+
+
+@dataclass
+class Job:
+    """Фоновая задача обновления данных"""
+    kind: str
+    params: dict
+    id: str = field(default_factory=lambda: uuid.uuid4().hex)
+    status: str = "queued"
+    created_at: datetime = field(default_factory=datetime.now)
+    started_at: datetime | None = None
+    finished_at: datetime | None = None
+    progress: dict = field(default_factory=dict)
+    stages: list[JobStage] = field(default_factory=list)
+    error: str | None = None
+
+    @property
+    def key(self) -> tuple:
+        return self.kind, tuple(sorted(self.params.items()))
+
+    @property
+    def is_finished(self) -> bool:
+        return self.status in ("done", "failed")
+
+    def conflicts_with(self, other: "Job") -> bool:
+        """
+        Функция для проверки, может ли задача выполняться одновременно с другой:
+        задачи одного вида выполняются по одной (кроме разных частей одной
+        загрузки), задачи разных видов - если не пишут в общие таблицы
+
+        :param other: объект другой задачи
+        :return: True, если задачи не могут выполняться одновременно
+        """
+        if self.kind != other.kind:
+            return frozenset((self.kind, other.kind)) in CONFLICTING_KINDS
+        partition = PARTITIONED_KINDS.get(self.kind)
+        if partition is None:
+            return True
+        return ({k: v for k, v in self.params.items() if k != partition}
+                != {k: v for k, v in other.params.items() if k != partition})
+
+
+current_job: ContextVar[Job | None] = ContextVar("current_job", default=None)
+
+
+def make_event_logger() -> logging.Logger:
+    """
+    Функция для создания логгера событий загрузки данных:
+    каждое событие пишется в stdout отдельной строкой JSON
+
+    :return: объект логгера
+    """
+    event_logger = logging.getLogger("load_events")
+    if not event_logger.handlers:
+        handler = logging.StreamHandler()
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        event_logger.addHandler(handler)
+        event_logger.setLevel(logging.INFO)
+        event_logger.propagate = False
+    return event_logger
+
+
+event_logger = make_event_logger()
+
+
+def log_event(event: str, job: Job, **fields) -> None:
+    """
+    Функция для записи события фоновой задачи в лог в формате JSON
+
+    :param event: вид события (stage, job)
+    :param job: объект задачи
+    :param fields: поля события
+    :return: None
+    """
+    event_logger.info(json.dumps(
+        {"ts": datetime.now().isoformat(), "event": event, "job_id": job.id,
+         "kind": job.kind, "params": job.params, **fields},
+        default=str
+    ))
+
+
+@contextmanager
+def stage(name: str):
+    """
+    Контекстный менеджер для замера времени этапа текущей фоновой задачи
+    (повторные входы в этап с тем же именем суммируются). Возвращает
+    объект этапа, в поле rows которого учитывается число обработанных строк.
+    Итоги этапа пишутся в лог событием stage один раз, по завершении задачи.
+    Вне фоновой задачи время не учитывается
+
+    :param name: наименование этапа (fetch, parse, build, validate, write, commit)
+    """
+    job = current_job.get()
+    if job is None:
+        yield JobStage(name=name, started_at=datetime.now())
+        return
+
+    job_stage = next((s for s in job.stages if s.name == name), None)
+    if job_stage is None:
+        job_stage = JobStage(name=name, started_at=datetime.now())
+        job.stages.append(job_stage)
+    start = perf_counter()
+    try:
+        yield job_stage
+    finally:
+        job_stage.duration_sec += perf_counter() - start
+        job_stage.entries += 1
+        job_stage.finished_at = datetime.now()
+
+
+def set_progress(done: int, total: int) -> None:
+    """
+    Функция для обновления прогресса текущей фоновой задачи
+
+    :param done: число обработанных элементов
+    :param total: общее число элементов
+    :return: None
+    """
+    job = current_job.get()
+    if job is not None:
+        job.progress = {"done": done, "total": total}
+
+
+class JobRegistry:
+    """Реестр фоновых задач обновления данных (в памяти процесса)"""
+    def __init__(self, max_finished: int = 100):
+        self.max_finished = max_finished
+        self.jobs: dict[str, Job] = {}
+        self.active: dict[tuple, Job] = {}
+        self.tasks: set[asyncio.Task] = set()
+        self.lock = asyncio.Lock()
+
+    async def submit(self, kind: str, func: Callable[..., Awaitable[None]], **params) -> Job:
+        """
+        Функция для постановки задачи в фон. Если такая же задача
+        (тот же вид и параметры) уже выполняется, новая не запускается,
+        а возвращается уже выполняющаяся. Если выполняется задача, с которой
+        новая не может выполняться одновременно (см. Job.conflicts_with),
+        возвращается ошибка 409
+
+        :param kind: вид задачи (currencies, bonds, history, schedules, metrics)
+        :param func: функция загрузки, принимающая объект подключения к БД
+        :param params: параметры функции загрузки
+        :return: объект задачи
+        """
+        async with self.lock:
+            job = Job(kind=kind, params=params)
+            running = self.active.get(job.key)
+            if running is not None:
+                return running
+            conflict = next((active for active in self.active.values() if job.conflicts_with(active)), None)
+            if conflict is not None:
+                raise HTTPException(status_code=409, detail=f"Выполняется задача {conflict.kind} "
+                                                            f"{conflict.params} (id {conflict.id})")
+
+            self.jobs[job.id] = job
+            self.active[job.key] = job
+            self._prune()
+            task = asyncio.create_task(self._run(job, func))
+            self.tasks.add(task)
+            task.add_done_callback(self.tasks.discard)
+            return job
+
+    def get(self, job_id: str) -> Job | None:
+        return self.jobs.get(job_id)
+
+    async def _run(self, job: Job, func: Callable[..., Awaitable[None]]) -> None:
+        current_job.set(job)
+        job.status = "running"
+        job.started_at = datetime.now()
+        try:
+            async with SessionLocal() as db:
+                await func(db=db, **job.params)
+            job.status = "done"
+        except Exception as e:
+            job.status = "failed"
+            job.error = repr(e)
+        finally:
+            job.finished_at = datetime.now()
+            self.active.pop(job.key, None)
+            await self._save_run(job)
+
+    async def _save_run(self, job: Job) -> None:
+        """
+        Функция для записи итогов задачи в лог и в таблицу load_runs
+        (для отслеживания длительности загрузок во времени).
+        Ошибка записи не влияет на статус задачи
+        """
+        stages = [{"name": s.name, "duration_sec": round(s.duration_sec, 6), "rows": s.rows}
+                  for s in job.stages]
+        duration = (job.finished_at - job.started_at).total_seconds()
+        # Одно событие на этап (а не на каждый вход в этап, например по каждому тикеру)
+        for s in job.stages:
+            log_event("stage", job, stage=s.name, duration_sec=round(s.duration_sec, 6),
+                      rows=s.rows, entries=s.entries)
+        log_event("job", job, status=job.status, duration_sec=round(duration, 6),
+                  stages=stages, error=job.error)
+        try:
+            async with SessionLocal() as db:
+                await crud.add_load_run(db=db, run={
+                    "id": job.id, "kind": job.kind, "status": job.status,
+                    "params": json.loads(json.dumps(job.params, default=str)),
+                    "started_at": job.started_at, "finished_at": job.finished_at,
+                    "duration_sec": duration, "stages": stages, "error": job.error
+                })
+        except Exception:
+            event_logger.exception("Не удалось сохранить итоги задачи %s", job.id)
+
+    def _prune(self) -> None:
+        finished = [job_id for job_id, job in self.jobs.items() if job.is_finished]
+        for job_id in finished[:max(len(finished) - self.max_finished, 0)]:
+            del self.jobs[job_id]
+
+
+jobs = JobRegistry()
@@ -1 +1 @@
-from sqlalchemy import selectfrom sqlalchemy.ext.asyncio import AsyncSessionfrom models import schemas, modelsfrom utils.CBRF_gateway import CBRFGatewayfrom utils.MOEX_gateway import MOEXGatewayasync def load_currency_to_db(db: AsyncSession) -> None:    """    Функция для загрузки данных по валютам в БД (по расписанию)    :param db: объект подключения к БД    :return: None    """    cbrf = CBRFGateway()    currency_data = await cbrf.load_currency_data()    for currency_dict in currency_data:        curr_df = schemas.Currency(**currency_dict)        db_currencies = models.Currency(**curr_df.dict())        db.add(db_currencies)        await db.commit()async def load_bonds_to_db(db: AsyncSession) -> None:    """    Функция для загрузки данных по облигациям в БД (по расписанию)    :param db: объект подключения к БД    :return: None    """    result = await db.execute(        select(            models.Currency.currency_code,            models.Currency.curs            )        )    data = [row for row in result]    curr_dict = dict(data)    moex = MOEXGateway()    bonds_data = await moex.load_bond_data(curr_dict=curr_dict)    for bond_dict in bonds_data:        bond_df = schemas.BondInfo(**bond_dict)        db_bonds = models.Bond(**bond_df.dict())        db.add(db_bonds)        await db.commit()
\ No newline at end of file
+from contextlib import aclosingfrom datetime import date, datetime, timedeltaimport numpy as npfrom sqlalchemy import selectfrom sqlalchemy.ext.asyncio import AsyncSessionfrom config import YIELD_CURVE_BOARDfrom models import schemas, models, crudfrom utils.CBRF_gateway import CBRFGatewayfrom utils.MOEX_gateway import MOEXGatewayfrom utils.currency_rates import to_rate_records, RATE_LOOKBACKfrom utils.evaluating_bond_metrics import precompute_bond_metrics, build_schedulesfrom utils.intraday import intraday_refresherfrom utils.jobs import stage, set_progress# Столбцы, не записываемые при загрузке облигаций: суммы в рублях рассчитываются# при чтении из БД, а внутридневные цены обновляются IntradayRefresherNOT_LOADED_COLUMNS = {'prevwaprice_rub', 'nominal_rub', 'coupon_value_rub', 'accum_coupon_rub',                      'last_price', 'last_price_cur', 'last_price_rub', 'intraday_waprice',                      'intraday_yield', 'marketdata_time'}async def load_currency_to_db(db: AsyncSession) -> None:    """    Функция для загрузки данных по валютам в БД (по расписанию)    :param db: объект подключения к БД    :return: None    """    cbrf = CBRFGateway()    currency_data = await cbrf.load_currency_data()    loading_date = datetime.now()    with stage("write") as write_stage:        currencies = [{**schemas.Currency(**currency_dict).dict(), 'loading_date': loading_date}                      for currency_dict in currency_data]        await crud.upsert_currencies(db=db, currencies=currencies)        write_stage.rows += len(currencies)        rates = to_rate_records(currency_data)        await crud.upsert_currency_rates(db=db, rates=rates)        write_stage.rows += len(rates)async def refresh_currencies(db: AsyncSession) -> None:    """    Функция для обновления данных по валютам в БД. Курсы обновляются    по коду валюты одной транзакцией, поэтому суммы облигаций в рублях,    рассчитываемые по ним при чтении, не пропадают на время обновления    :param db: объект подключения к БД    :return: None    """    await load_currency_to_db(db=db)async def backfill_currency_rates(db: AsyncSession, date_from: date | None = None,                                  date_till: date | None = None) -> None:    """    Функция для загрузки истории курсов валют за период в БД    (по одному запросу XML_dynamic на валюту, валюты загружаются параллельно).    Если период не указан, догружаются только недостающие курсы валют    номинала облигаций: с первой даты сохраненных исторических цен    (но не позже, чем за год до сегодняшнего дня - период расчета корреляции)    до первого уже сохраненного курса    :param db: объект подключения к БД    :param date_from: начальная дата    :param date_till: конечная дата    :return: None    """    codes = None    if date_from is None or date_till is None:        with stage("read"):            first_rates = await crud.get_first_rate_dates(db=db)            first_trades = await crud.get_first_trade_dates_by_currency(db=db)        year_ago = date.today() - timedelta(days=365)        needed = {code: min(first_trade or year_ago, year_ago) for code, first_trade in first_trades.items()}        codes = [code for code, needed_from in needed.items()                 if first_rates.get(code) is None or first_rates[code] > needed_from]        if not codes:            return        date_from = min(needed[code] for code in codes) - RATE_LOOKBACK        date_till = max(first_rates.get(code) or date.today() for code in codes)    cbrf = CBRFGateway()    rates = await cbrf.load_rates_range(date_from=date_from, date_till=date_till, codes=codes)    with stage("write") as write_stage:        await crud.upsert_currency_rates(db=db, rates=rates)        write_stage.rows += len(rates)async def refresh_bonds(db: AsyncSession, board: str | None = None) -> None:    """    Функция для обновления данных по облигациям в БД    (при указании board обновляется только один режим торгов).    Облигации только вставляются или обновляются, поэтому таблица    не пустеет на время загрузки; облигации, не обновленные    при загрузке, удаляются отдельно (/update/bonds/cleanup)    :param db: объект подключения к БД    :param board: режим торгов    :return: None    """    await load_bonds_to_db(db=db, board=board)async def load_bonds_to_db(db: AsyncSession, board: str | None = None) -> None:    """    Функция для загрузки данных по облигациям в БД (по расписанию).    Облигации вставляются или обновляются по тикеру, поэтому режимы торгов    можно загружать независимо и параллельно    :param db: объект подключения к БД    :param board: режим торгов (если не указан, загружаются все режимы)    :return: None    """    moex = MOEXGateway()    bonds_data = await moex.load_bond_data(board=board)    with stage("validate") as validate_stage:        bonds = [schemas.BondInfo(**bond_dict).dict(exclude=NOT_LOADED_COLUMNS) for bond_dict in bonds_data]        validate_stage.rows += len(bonds)    with stage("write") as write_stage:        await crud.upsert_bonds(db=db, bonds=bonds)        write_stage.rows += len(bonds)    with stage("commit"):        await db.commit()    # Облигации перезаписаны, поэтому внутридневные цены записываются заново    intraday_refresher.reset()async def load_history_to_db(db: AsyncSession, chunk: int = 0, chunks: int = 1) -> None:    """    Функция для инкрементальной загрузки исторических цен облигаций в БД    (по расписанию): по каждому тикеру догружаются только новые дни торгов.    Тикеры можно разбить на chunks частей и загружать их независимо    :param db: объект подключения к БД    :param chunk: номер загружаемой части тикеров    :param chunks: общее число частей    :return: None    """    result = await db.execute(        select(            models.Currency.currency_code,            models.Currency.curs            )        )    curr_dict = dict([row for row in result])    last_dates = await crud.get_last_trade_dates(db=db)    last_dates = {ticker: last_dates[ticker] for ticker in sorted(last_dates)[chunk::chunks]}    moex = MOEXGateway()    set_progress(0, len(last_dates))    done = 0    async with aclosing(moex.load_hist_prices(last_dates=last_dates, curr_dict=curr_dict)) as histories:        async for history in histories:            with stage("write") as write_stage:                await crud.add_bond_history(db=db, history=history)                write_stage.rows += len(history)            done += 1            set_progress(done, len(last_dates))def schedule_may_change(stored: list[tuple], next_coupon: date | None) -> bool:    """    Функция для проверки, нужно ли запрашивать график выплат облигации заново.    График облигации с постоянным купоном без амортизации известен до погашения,    поэтому запрашиваются только графики новых облигаций, флоатеров    (суммы будущих купонов еще не известны), облигаций с амортизацией    и облигаций, ближайший купон которых по данным биржи не совпадает    с сохраненным графиком (график сдвинулся или дополнен)    :param stored: сохраненный график (вид выплаты, дата, сумма, процент)    :param next_coupon: дата ближайшего купона из таблицы облигаций    :return: True, если график нужно запросить    """    if not stored:        return True    coupons = {pay_date: value for kind, pay_date, value, _ in stored if kind == 'coupon'}    if any(value is None for value in coupons.values()):        return True    if sum(1 for kind, *_ in stored if kind == 'amortization') > 1:        return True    return next_coupon is not None and next_coupon not in couponsasync def load_coupon_schedules_to_db(db: AsyncSession, full: bool = False) -> None:    """    Функция для загрузки графиков выплат облигаций в БД (по расписанию).    Запрашиваются только графики, которые могли измениться (см. schedule_may_change),    или графики всех облигаций при full. Графики запрашиваются параллельно,    но перезаписываются только те, что изменились с прошлой загрузки    :param db: объект подключения к БД    :param full: запросить графики всех облигаций    :return: None    """    with stage("read"):        stored = {}        for row in await crud.get_coupon_schedule(db=db):            stored.setdefault(row.ticker, []).append((row.kind, row.pay_date, row.value, row.value_prct))        next_coupons = await crud.get_next_coupon_dates(db=db)        tickers = [            ticker for ticker, next_coupon in next_coupons.items()            if full or schedule_may_change(stored.get(ticker, []), next_coupon and next_coupon.date())        ]    moex = MOEXGateway()    set_progress(0, len(tickers))    done = 0    async with aclosing(moex.load_coupon_schedules(tickers=tickers)) as schedules:        async for ticker, schedule in schedules:            done += 1            set_progress(done, len(tickers))            if schedule is None:  # график не загружен, сохраненный не меняется                continue            with stage("compare"):                loaded = sorted((item['kind'], item['pay_date'], item['value'], item['value_prct'])                                for item in schedule)                changed = loaded != sorted(stored.get(ticker, []))            if changed:                with stage("write") as write_stage:                    await crud.replace_coupon_schedule(db=db, ticker=ticker, schedule=schedule)                    write_stage.rows += len(schedule)async def precompute_metrics_to_db(db: AsyncSession) -> None:    """    Функция для ночного пересчета метрик всех облигаций в БД:    подбирается кривая бескупонной доходности ОФЗ, и по ней    рассчитываются G-спреды облигаций    :param db: объект подключения к БД    :return: None    """    with stage("fetch"):        bonds = await crud.get_bonds(db=db)        schedule_rows = await crud.get_coupon_schedule(db=db, kinds=("coupon", "amortization"))    with stage("transform"):        metrics, curve = precompute_bond_metrics(bonds, np.datetime64(date.today(), 'D'),                                                 build_schedules(schedule_rows), YIELD_CURVE_BOARD)    with stage("write") as write_stage:        if curve is not None:            await crud.upsert_yield_curve(db=db, curve=curve)        await crud.upsert_precomputed_metrics(db=db, metrics=metrics)        write_stage.rows += len(metrics)
\ No newline at end of file
@@ -0,0 +1,179 @@
+from contextlib import contextmanager
+from functools import wraps
+from time import perf_counter
+
+from prometheus_client import Counter, Gauge, Histogram, REGISTRY
+from prometheus_client.core import GaugeMetricFamily, CounterMetricFamily
+from starlette.routing import Match
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from models.database import pool_stats
+from utils.profiling import add_timing
+
+REQUESTS = Counter(
+    "http_requests_total", "Число HTTP-запросов",
+    ["method", "route", "status"]
+)
+REQUEST_LATENCY = Histogram(
+    "http_request_duration_seconds", "Время обработки HTTP-запроса",
+    ["method", "route"]
+)
+REQUESTS_IN_FLIGHT = Gauge(
+    "http_requests_in_flight", "Число выполняющихся HTTP-запросов",
+    ["method", "route"]
+)
+
+ISS_FETCH = Histogram(
+    "iss_fetch_seconds", "Время запроса к ISS MOEX",
+    ["endpoint"]
+)
+CBR_FETCH = Histogram(
+    "cbr_fetch_seconds", "Время запроса к ЦБ РФ"
+)
+YTM_SOLVE = Histogram(
+    "ytm_solve_seconds", "Время расчета доходности к погашению",
+    ["method"],
+    buckets=(.0001, .0005, .001, .0025, .005, .01, .025, .05, .1, .25, .5, 1, 2.5)
+)
+CORRELATION_COMPUTE = Histogram(
+    "correlation_compute_seconds", "Время расчета коэффициентов корреляции"
+)
+CURVE_FIT = Histogram(
+    "curve_fit_seconds", "Время подбора кривой бескупонной доходности"
+)
+SCENARIO_COMPUTE = Histogram(
+    "scenario_compute_seconds", "Время расчета стоимости облигаций по сценариям изменения ставок"
+)
+RISK_COMPUTE = Histogram(
+    "risk_compute_seconds", "Время расчета VaR и ES портфеля"
+)
+UPSTREAM_RETRIES = Counter(
+    "upstream_retries_total", "Число повторных запросов к внешним источникам",
+    ["host", "reason"]
+)
+UPSTREAM_CIRCUIT_OPEN = Counter(
+    "upstream_circuit_open_total", "Число отключений внешнего источника после серии ошибок",
+    ["host"]
+)
+UPSTREAM_COALESCED = Counter(
+    "upstream_coalesced_total", "Число запросов к источникам, объединенных с уже выполняющимся",
+    ["kind"]
+)
+INTRADAY_UPDATED = Counter(
+    "intraday_updated_rows_total", "Число облигаций с изменившимися внутридневными ценами"
+)
+DB_QUERY = Histogram(
+    "db_query_seconds", "Время выполнения запроса к БД",
+    ["query"],
+    buckets=(.0005, .001, .0025, .005, .01, .025, .05, .1, .25, .5, 1, 2.5, 5)
+)
+
+# Категории разбивки времени профилируемого запроса (заголовок Server-Timing)
+PROFILE_CATEGORIES = {
+    DB_QUERY: "db",
+    ISS_FETCH: "http",
+    CBR_FETCH: "http",
+    YTM_SOLVE: "compute",
+    CORRELATION_COMPUTE: "compute",
+    CURVE_FIT: "compute",
+    SCENARIO_COMPUTE: "compute",
+    RISK_COMPUTE: "compute",
+}
+
+
+@contextmanager
+def observe(histogram: Histogram, **labels):
+    """
+    Контекстный менеджер для замера времени выполнения блока кода.
+    Время также учитывается в разбивке профилируемого запроса
+
+    :param histogram: гистограмма, в которую записывается время
+    :param labels: значения меток гистограммы
+    """
+    start = perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = perf_counter() - start
+        (histogram.labels(**labels) if labels else histogram).observe(elapsed)
+        add_timing(PROFILE_CATEGORIES.get(histogram, "other"), elapsed)
+
+
+def db_timed(func):
+    """
+    Декоратор для замера времени выполнения асинхронной функции crud
+    (метка query - имя функции)
+    """
+    @wraps(func)
+    async def wrapper(*args, **kwargs):
+        with observe(DB_QUERY, query=func.__name__):
+            return await func(*args, **kwargs)
+    return wrapper
+
+
+class PoolCollector:
+    """Коллектор метрик пулов соединений с БД (считываются в момент опроса)"""
+    def collect(self):
+        checked_out = GaugeMetricFamily("db_pool_checked_out", "Число занятых соединений пула", labels=["db"])
+        checked_in = GaugeMetricFamily("db_pool_checked_in", "Число свободных соединений пула", labels=["db"])
+        wait_max = GaugeMetricFamily("db_pool_wait_max_seconds", "Максимальное время ожидания соединения",
+                                     labels=["db"])
+        wait_total = CounterMetricFamily("db_pool_wait_seconds", "Суммарное время ожидания соединения",
+                                         labels=["db"])
+        checkouts = CounterMetricFamily("db_pool_checkouts", "Число выдач соединений из пула", labels=["db"])
+        timeouts = CounterMetricFamily("db_pool_timeouts", "Число таймаутов ожидания соединения", labels=["db"])
+        failures = CounterMetricFamily("db_connect_failures", "Число ошибок подключения к БД", labels=["db"])
+        for name, stats in pool_stats.items():
+            checked_out.add_metric([name], stats.engine.pool.checkedout())
+            checked_in.add_metric([name], stats.engine.pool.checkedin())
+            wait_max.add_metric([name], stats.wait_max_sec)
+            wait_total.add_metric([name], stats.wait_total_sec)
+            checkouts.add_metric([name], stats.checkouts)
+            timeouts.add_metric([name], stats.pool_timeouts)
+            failures.add_metric([name], stats.connect_failures)
+        yield from (checked_out, checked_in, wait_max, wait_total, checkouts, timeouts, failures)
+
+
+REGISTRY.register(PoolCollector())
+
+
+class MetricsMiddleware:
+    """
+    ASGI-middleware для подсчета запросов, времени их обработки
+    и числа выполняющихся запросов в разрезе шаблона маршрута
+    (например, /bonds/{ticker}/info, а не конкретного тикера)
+    """
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    def route_template(self, scope: Scope) -> str:
+        for route in scope["app"].router.routes:
+            match, _ = route.matches(scope)
+            if match == Match.FULL:
+                return route.path
+        return "unmatched"
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        route = self.route_template(scope)
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        in_flight = REQUESTS_IN_FLIGHT.labels(method=method, route=route)
+        in_flight.inc()
+        start = perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            REQUEST_LATENCY.labels(method=method, route=route).observe(perf_counter() - start)
+            REQUESTS.labels(method=method, route=route, status=status).inc()
+            in_flight.dec()
@@ -0,0 +1,186 @@
+from datetime import date
+
+import numpy as np
+from scipy.stats import norm
+
+from utils.currency_rates import RateHistory
+from utils.evaluating_bond_metrics import CashFlowSchedule, cash_flow_matrix, solve_ytm_matrix, market_prices
+from utils.metrics import observe, RISK_COMPUTE
+
+EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+
+
+def duration_convexity(times: np.ndarray, amounts: np.ndarray,
+                       ytm: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Функция для векторного расчета модифицированной дюрации и выпуклости
+    облигаций по выровненной матрице денежных потоков (при доходности к погашению)
+
+    :param times: матрица сроков до выплат (в годах), нули для отсутствующих выплат
+    :param amounts: матрица сумм выплат, нули для отсутствующих выплат
+    :param ytm: массив доходностей к погашению облигаций (в процентах)
+    :return: кортеж из массивов модифицированной дюрации и выпуклости (в годах)
+    """
+    base = 1 + ytm[:, None] / 100
+    pv = amounts * base ** -times
+    price = pv.sum(axis=1)
+    macaulay = (pv * times).sum(axis=1) / price
+    modified = macaulay / base[:, 0]
+    convexity = (pv * times * (times + 1)).sum(axis=1) / (price * base[:, 0] ** 2)
+    return modified, convexity
+
+
+def cash_flow_ladder(times: np.ndarray, amounts: np.ndarray, quantities: np.ndarray,
+                     val_date: np.datetime64) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Функция для построения помесячного графика поступлений по портфелю:
+    выплаты всех облигаций, умноженные на количество, суммируются по месяцам
+    одной группировкой (без цикла по облигациям и купонам)
+
+    :param times: матрица сроков до выплат (в годах), нули для отсутствующих выплат
+    :param amounts: матрица сумм выплат, нули для отсутствующих выплат
+    :param quantities: массив количества облигаций в портфеле
+    :param val_date: дата оценки
+    :return: кортеж из массива месяцев (datetime64[M]) и массива сумм поступлений
+    """
+    paid = amounts > 0
+    pay_dates = val_date + np.rint(times[paid] * 365).astype('timedelta64[D]')
+    months, index = np.unique(pay_dates.astype('datetime64[M]'), return_inverse=True)
+    flows = (amounts * quantities[:, None])[paid]
+    return months, np.bincount(index, weights=flows, minlength=len(months))
+
+
+def analyze_portfolio(bonds: list, quantities: dict[str, float], val_date: np.datetime64,
+                      schedules: dict[str, CashFlowSchedule] | None = None) -> dict:
+    """
+    Функция для расчета показателей портфеля облигаций: стоимость,
+    средневзвешенная доходность к погашению, модифицированная дюрация,
+    выпуклость, распределение по валютам и помесячный график поступлений.
+    Все облигации обрабатываются одним векторным проходом по матрице
+    денежных потоков, поэтому время расчета не зависит от числа купонов
+
+    :param bonds: список объектов с информацией по облигациям портфеля
+    :param quantities: словарь тикер -> количество облигаций
+    :param val_date: дата оценки
+    :param schedules: словарь тикер -> график выплат (для облигаций с загруженным графиком)
+    :return: словарь с показателями портфеля
+    """
+    bonds = [bond_info for bond_info in bonds
+             if bond_info.prevwaprice_rub and bond_info.nominal_rub and bond_info.maturity_date]
+    times, amounts = cash_flow_matrix(bonds, val_date, schedules)
+    # Доходность считается по грязной цене, стоимость портфеля - по чистой
+    # (накопленный купонный доход выводится отдельно)
+    prices, accrued, dirty = market_prices(bonds)
+    ytm = solve_ytm_matrix(times, amounts, dirty)
+
+    known = np.isfinite(ytm)
+    bonds = [bond_info for bond_info, ok in zip(bonds, known.tolist()) if ok]
+    times, amounts, prices, accrued, ytm = times[known], amounts[known], prices[known], accrued[known], ytm[known]
+    qty = np.array([quantities[bond_info.ticker] for bond_info in bonds], dtype=float)
+
+    values = prices * qty
+    market_value = values.sum()
+    weights = values / market_value if market_value else values
+    modified, convexity = duration_convexity(times, amounts, ytm)
+    months, flows = cash_flow_ladder(times, amounts, qty, val_date)
+
+    currencies = np.array([bond_info.cur_of_nominal or 'SUR' for bond_info in bonds], dtype=object)
+    codes, index = np.unique(currencies.astype(str), return_inverse=True)
+    exposure = np.bincount(index, weights=values, minlength=len(codes))
+
+    return {
+        'tickers': [bond_info.ticker for bond_info in bonds],
+        'market_value': float(market_value),
+        'accrued_interest': float(accrued @ qty),
+        'ytm_prct': float(weights @ ytm),
+        'modified_duration': float(weights @ modified),
+        'convexity': float(weights @ convexity),
+        'currencies': list(zip(codes.tolist(), exposure.tolist(),
+                               (exposure / market_value * 100 if market_value else exposure).tolist())),
+        'cash_flow_ladder': list(zip(months.astype('datetime64[D]').tolist(), flows.tolist())),
+    }
+
+
+def aligned_price_matrix(tickers: list[str], rows: list, currencies: dict[str, str | None],
+                         fx: dict[str, RateHistory]) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Функция для построения выровненной матрицы цен облигаций в рублях
+    (строки - даты торгов, столбцы - облигации). Цены облигаций в валюте
+    пересчитываются по курсу на дату торгов (если история курсов загружена),
+    пропуски (дни без сделок) заполняются последней известной ценой
+
+    :param tickers: список тикеров (порядок столбцов матрицы)
+    :param rows: строки таблицы bond_history (ticker, trade_date, waprice_cur, waprice_rub)
+    :param currencies: словарь тикер -> валюта номинала
+    :param fx: словарь валюта -> история курсов
+    :return: кортеж из массива дат торгов и матрицы цен (NaN до первой сделки)
+    """
+    column = {ticker: i for i, ticker in enumerate(tickers)}
+    columns = np.fromiter((column[row.ticker] for row in rows), dtype=int, count=len(rows))
+    # Даты переводятся в числа дней напрямую (преобразование объектов date в datetime64 медленнее)
+    trade_dates = (np.fromiter((row.trade_date.toordinal() for row in rows), dtype=np.int64, count=len(rows))
+                   - EPOCH_ORDINAL).astype('datetime64[D]')
+    prices = np.fromiter((np.nan if row.waprice_rub is None else row.waprice_rub for row in rows),
+                         dtype=float, count=len(rows))
+
+    # Цены в валюте - по курсу на дату торгов (as-of), одним проходом по каждой валюте
+    column_codes = np.array([currencies.get(ticker) or 'SUR' for ticker in tickers], dtype=object)
+    for code, history in fx.items():
+        in_code = (column_codes == code)[columns]
+        prices_cur = np.fromiter((row.waprice_cur for row, ok in zip(rows, in_code.tolist()) if ok),
+                                 dtype=float, count=int(in_code.sum()))
+        converted = history.to_rub(trade_dates[in_code], prices_cur)
+        prices[in_code] = np.where(np.isnan(converted), prices[in_code], converted)
+
+    dates, index = np.unique(trade_dates, return_inverse=True)
+    matrix = np.full((len(dates), len(tickers)), np.nan)
+    matrix[index, columns] = prices
+
+    # Заполнение пропусков последней известной ценой: номер строки последней
+    # известной цены по каждому столбцу (накопленный максимум)
+    known = ~np.isnan(matrix)
+    last = np.maximum.accumulate(np.where(known, np.arange(len(dates))[:, None], 0), axis=0)
+    filled = matrix[last, np.arange(len(tickers))]
+    filled[~np.maximum.accumulate(known, axis=0)] = np.nan
+    return dates, filled
+
+
+def value_at_risk(prices: np.ndarray, values: np.ndarray, levels: list[float],
+                  horizon_days: int = 1) -> list[dict]:
+    """
+    Функция для расчета исторического и параметрического (нормального)
+    VaR и ожидаемых потерь (ES) портфеля. Доходности всех облигаций
+    считаются одной матрицей, прибыль/убыток портфеля по дням - одним
+    матричным произведением, после чего один и тот же ряд используется
+    для всех уровней доверия
+
+    :param prices: выровненная матрица цен (строки - даты, столбцы - облигации)
+    :param values: массив стоимости позиций портфеля (в рублях)
+    :param levels: уровни доверия (например, 0.95 и 0.99)
+    :param horizon_days: горизонт (в торговых днях), масштабирование корнем из времени
+    :return: список словарей с VaR и ES (положительные числа - потери, в рублях)
+    """
+    with observe(RISK_COMPUTE):
+        returns = prices[1:] / prices[:-1] - 1
+        returns[np.isnan(returns)] = 0  # до первой сделки облигация в портфеле не меняется в цене
+
+        pnl = returns @ values
+        mean = pnl.mean()
+        # Дисперсия ряда прибыли/убытка равна V' * Cov(R) * V, но без построения ковариационной матрицы
+        std = pnl.std(ddof=1)
+        scale = np.sqrt(horizon_days)
+        sorted_pnl = np.sort(pnl)
+
+        risk = []
+        for level in levels:
+            historical_var = -np.quantile(sorted_pnl, 1 - level)
+            tail = sorted_pnl[sorted_pnl <= -historical_var]
+            z = norm.ppf(1 - level)
+            risk.append({
+                'confidence': level,
+                'historical_var': historical_var * scale,
+                'historical_es': -tail.mean() * scale if len(tail) else historical_var * scale,
+                'parametric_var': -(mean * horizon_days + z * std * scale),
+                'parametric_es': -(mean * horizon_days - std * scale * norm.pdf(z) / (1 - level)),
+            })
+    return risk
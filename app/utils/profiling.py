@@ -0,0 +1,142 @@
+import asyncio
+import logging
+import os
+import uuid
+from contextvars import ContextVar
+from time import perf_counter
+
+import jwt
+from jwt.exceptions import InvalidTokenError
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from config import (
+    SECRET_KEY, ALGORITHM, PROFILING_ENABLED, PROFILING_ADMINS, PROFILING_DIR, PROFILING_INTERVAL,
+    PROFILING_MAX_FILES
+)
+
+try:
+    from pyinstrument import Profiler
+    from pyinstrument.renderers import SpeedscopeRenderer
+except ImportError:  # pyinstrument - необязательная зависимость, без нее профилирование отключено
+    Profiler = None
+
+logger = logging.getLogger(__name__)
+
+PROFILE_HEADER = b"x-profile"
+
+# Разбивка времени запроса по категориям (db, http, compute, serialization);
+# None - запрос не профилируется
+current_timings: ContextVar[dict[str, float] | None] = ContextVar("current_timings", default=None)
+
+
+def add_timing(category: str, seconds: float) -> None:
+    """
+    Функция для учета времени в разбивке профилируемого запроса.
+    Вне профилируемого запроса ничего не делает
+
+    :param category: категория (db, http, compute, serialization)
+    :param seconds: время в секундах
+    :return: None
+    """
+    timings = current_timings.get()
+    if timings is not None:
+        timings[category] = timings.get(category, 0.0) + seconds
+
+
+def is_admin_request(headers: dict) -> bool:
+    """
+    Функция для проверки, что запрос выполняется администратором
+    (по имени пользователя из JWT-токена, без обращения к БД)
+
+    :param headers: заголовки запроса
+    :return: True, если пользователь есть в списке PROFILING_ADMINS
+    """
+    scheme, _, token = headers.get(b"authorization", b"").decode("latin-1").partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        return False
+    try:
+        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+    except InvalidTokenError:
+        return False
+    return payload.get("sub") in PROFILING_ADMINS
+
+
+def profile_path(profile_id: str) -> str:
+    return os.path.join(PROFILING_DIR, f"{profile_id}.speedscope.json")
+
+
+def save_profile(profile_id: str, profile: str) -> None:
+    """
+    Функция для сохранения профиля в каталог PROFILING_DIR.
+    Хранятся только PROFILING_MAX_FILES последних профилей
+
+    :param profile_id: идентификатор профиля
+    :param profile: профиль в формате speedscope
+    :return: None
+    """
+    os.makedirs(PROFILING_DIR, exist_ok=True)
+    with open(profile_path(profile_id), "w") as f:
+        f.write(profile)
+
+    with os.scandir(PROFILING_DIR) as entries:
+        profiles = [entry for entry in entries if entry.name.endswith(".speedscope.json")]
+    if len(profiles) > PROFILING_MAX_FILES:
+        profiles.sort(key=lambda entry: entry.stat().st_mtime)
+        for entry in profiles[:len(profiles) - PROFILING_MAX_FILES]:
+            try:
+                os.remove(entry.path)
+            except FileNotFoundError:  # профиль уже удален при сохранении другого
+                pass
+
+
+class ProfilingMiddleware:
+    """
+    ASGI-middleware для выборочного профилирования запросов.
+    Запрос профилируется, если включен PROFILING_ENABLED или
+    администратор передал заголовок X-Profile: 1. Сэмплирующий
+    профиль (pyinstrument) сохраняется в формате speedscope,
+    его идентификатор возвращается в заголовке X-Profile-Id,
+    а разбивка времени по категориям - в заголовке Server-Timing.
+    Для остальных запросов middleware ничего не делает
+    """
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    def should_profile(self, scope: Scope) -> bool:
+        if PROFILING_ENABLED:
+            return True
+        headers = dict(scope["headers"])
+        return headers.get(PROFILE_HEADER) == b"1" and is_admin_request(headers)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or Profiler is None or not self.should_profile(scope):
+            await self.app(scope, receive, send)
+            return
+
+        profile_id = uuid.uuid4().hex
+        timings = {}
+        token = current_timings.set(timings)
+        profiler = Profiler(interval=PROFILING_INTERVAL, async_mode="enabled")
+        start = perf_counter()
+
+        async def send_with_timings(message):
+            if message["type"] == "http.response.start":
+                timings["total"] = perf_counter() - start
+                server_timing = ", ".join(f"{name};dur={sec * 1000:.1f}" for name, sec in timings.items())
+                message["headers"] = [
+                    *message.get("headers", []),
+                    (b"server-timing", server_timing.encode("latin-1")),
+                    (b"x-profile-id", profile_id.encode("latin-1"))
+                ]
+            await send(message)
+
+        profiler.start()
+        try:
+            await self.app(scope, receive, send_with_timings)
+        finally:
+            profiler.stop()
+            current_timings.reset(token)
+            try:
+                await asyncio.to_thread(save_profile, profile_id, profiler.output(SpeedscopeRenderer()))
+            except Exception:
+                logger.exception("Не удалось сохранить профиль %s", profile_id)
@@ -0,0 +1,89 @@
+from contextvars import ContextVar
+from decimal import Decimal
+from time import perf_counter
+from typing import Any
+
+import orjson
+from fastapi.responses import JSONResponse
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from utils.profiling import add_timing
+
+try:
+    import msgpack
+except ImportError:  # MessagePack - необязательная зависимость
+    msgpack = None
+
+MSGPACK_MEDIA_TYPES = ("application/msgpack", "application/x-msgpack")
+
+accept_msgpack: ContextVar[bool] = ContextVar("accept_msgpack", default=False)
+
+
+def response_format() -> str:
+    """
+    Функция для определения формата ответа текущего запроса
+
+    :return: msgpack, если клиент его принимает и пакет установлен, иначе json
+    """
+    return "msgpack" if msgpack is not None and accept_msgpack.get() else "json"
+
+
+def _default(obj: Any) -> Any:
+    """
+    Функция для сериализации типов, которые orjson и msgpack
+    не поддерживают нативно. Decimal передается строкой,
+    как и при стандартной сериализации pydantic
+
+    :param obj: сериализуемый объект
+    :return: сериализуемое представление объекта
+    """
+    if isinstance(obj, Decimal):
+        return str(obj)
+    if hasattr(obj, "isoformat"):
+        return obj.isoformat()
+    raise TypeError(f"Object of type {type(obj).__name__} is not serializable")
+
+
+class FastResponse(JSONResponse):
+    """
+    Класс ответа с быстрой сериализацией через orjson.
+    Если клиент запросил MessagePack (Accept: application/msgpack)
+    и пакет msgpack установлен, ответ кодируется в MessagePack
+    """
+    def render(self, content: Any) -> bytes:
+        start = perf_counter()
+        try:
+            if response_format() == "msgpack":
+                self.media_type = MSGPACK_MEDIA_TYPES[0]
+                return msgpack.packb(content, default=_default, datetime=False)
+            return orjson.dumps(content, default=_default,
+                                option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY)
+        finally:
+            add_timing("serialization", perf_counter() - start)
+
+
+class ContentNegotiationMiddleware:
+    """
+    ASGI-middleware, запоминающее на время запроса,
+    принимает ли клиент ответ в формате MessagePack
+    """
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or msgpack is None:
+            await self.app(scope, receive, send)
+            return
+
+        accept = dict(scope["headers"]).get(b"accept", b"").decode("latin-1")
+        token = accept_msgpack.set(any(media_type in accept for media_type in MSGPACK_MEDIA_TYPES))
+
+        async def send_with_vary(message):
+            if message["type"] == "http.response.start":
+                message["headers"] = [*message.get("headers", []), (b"vary", b"Accept")]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_vary)
+        finally:
+            accept_msgpack.reset(token)
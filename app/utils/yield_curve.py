@@ -0,0 +1,105 @@
+from dataclasses import dataclass
+
+import numpy as np
+from scipy.optimize import least_squares
+
+from utils.metrics import observe, CURVE_FIT
+
+# Начальные приближения параметров формы кривой (tau1, tau2) для подбора:
+# решение с наименьшей ошибкой выбирается из нескольких стартов,
+# т.к. функция ошибки по tau не выпуклая
+TAU_STARTS = ((0.5, 3.0), (1.0, 5.0), (2.0, 10.0), (3.0, 15.0))
+# Границы параметров (beta - в процентах, tau - в годах)
+NSS_LOWER = (0.0, -30.0, -50.0, -50.0, 0.05, 0.05)
+NSS_UPPER = (30.0, 30.0, 50.0, 50.0, 10.0, 30.0)
+MIN_CURVE_BONDS = 6  # минимальное число облигаций для подбора кривой
+MIN_CURVE_TERM = 0.25  # облигации со сроком до погашения меньше (в годах) не участвуют в подборе
+
+
+@dataclass
+class NSSParams:
+    """Параметры кривой бескупонной доходности Нельсона-Сигеля-Свенссона"""
+    beta0: float
+    beta1: float
+    beta2: float
+    beta3: float
+    tau1: float
+    tau2: float
+
+
+def nss_zero_rates(params: NSSParams, t: np.ndarray) -> np.ndarray:
+    """
+    Функция для расчета бескупонной доходности по кривой
+    Нельсона-Сигеля-Свенссона (непрерывное начисление, в процентах)
+    сразу для массива сроков любой размерности
+
+    :param params: параметры кривой
+    :param t: массив сроков (в годах)
+    :return: массив бескупонных доходностей той же размерности
+    """
+    t = np.maximum(np.asarray(t, dtype=float), 1e-6)
+    x1, x2 = t / params.tau1, t / params.tau2
+    f1 = (1 - np.exp(-x1)) / x1
+    f2 = f1 - np.exp(-x1)
+    f3 = (1 - np.exp(-x2)) / x2 - np.exp(-x2)
+    return params.beta0 + params.beta1 * f1 + params.beta2 * f2 + params.beta3 * f3
+
+
+def annual_zero_rates(params: NSSParams, t: np.ndarray) -> np.ndarray:
+    """
+    Функция для перевода бескупонной доходности кривой в годовое начисление
+    (в процентах), чтобы сравнивать ее с доходностью к погашению облигаций
+
+    :param params: параметры кривой
+    :param t: массив сроков (в годах)
+    :return: массив бескупонных доходностей с годовым начислением
+    """
+    return np.expm1(nss_zero_rates(params, t) / 100) * 100
+
+
+def curve_prices(params: NSSParams, times: np.ndarray, amounts: np.ndarray) -> np.ndarray:
+    """
+    Функция для расчета стоимости облигаций дисконтированием по кривой
+    (по выровненной матрице денежных потоков, одна строка - одна облигация)
+
+    :param params: параметры кривой
+    :param times: матрица сроков до выплат (в годах), нули для отсутствующих выплат
+    :param amounts: матрица сумм выплат, нули для отсутствующих выплат
+    :return: массив стоимостей облигаций
+    """
+    discount = np.exp(-nss_zero_rates(params, times) / 100 * times)
+    return (amounts * discount).sum(axis=1)
+
+
+def fit_nss_curve(times: np.ndarray, amounts: np.ndarray, prices: np.ndarray,
+                  ytm: np.ndarray) -> tuple[NSSParams, float]:
+    """
+    Функция для подбора кривой Нельсона-Сигеля-Свенссона по ценам облигаций
+    (методом наименьших квадратов). Ошибка цены каждой облигации делится
+    на ее цену и дюрацию, поэтому минимизируются ошибки в доходности
+
+    :param times: матрица сроков до выплат (в годах), нули для отсутствующих выплат
+    :param amounts: матрица сумм выплат, нули для отсутствующих выплат
+    :param prices: массив цен облигаций
+    :param ytm: массив доходностей к погашению облигаций (в процентах)
+    :return: кортеж из параметров кривой и среднеквадратичной ошибки (в базисных пунктах)
+    """
+    pv = amounts * (1 + ytm[:, None] / 100) ** -times
+    duration = (pv * times).sum(axis=1) / pv.sum(axis=1)
+    scale = prices * np.maximum(duration, MIN_CURVE_TERM) / 1e4
+
+    def residuals(x: np.ndarray) -> np.ndarray:
+        return (curve_prices(NSSParams(*x), times, amounts) - prices) / scale
+
+    order = np.argsort(duration)
+    short, long = ytm[order[:3]].mean(), ytm[order[-3:]].mean()
+    best = None
+    with observe(CURVE_FIT):
+        for tau1, tau2 in TAU_STARTS:
+            start = np.clip([long, short - long, 0.0, 0.0, tau1, tau2], NSS_LOWER, NSS_UPPER)
+            result = least_squares(residuals, start, bounds=(NSS_LOWER, NSS_UPPER))
+            if best is None or result.cost < best.cost:
+                best = result
+
+    rmse_bp = float(np.sqrt(np.mean(best.fun ** 2)))
+    return NSSParams(*best.x.tolist()), rmse_bp
@@ -0,0 +1,402 @@
+"""
+Локальный сервер-заглушка ISS MOEX и ЦБ РФ для проверки и бенчмарков
+без доступа к сети. Отдает записанные ответы (каталог recordings),
+а при их отсутствии - синтетические данные заданного объема
+с настраиваемой задержкой, размером страницы и долей ошибок.
+В режиме --record запросы проксируются к настоящим источникам,
+а ответы сохраняются для последующего воспроизведения.
+
+Запуск:
+    python stub_server/server.py --port 8081 --securities 50000 --latency 50
+Сервис направляется на заглушку переменными окружения:
+    ISS_BASE_URL=http://localhost:8081 CBR_BASE_URL=http://localhost:8081
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import random
+from datetime import date, datetime, timedelta
+from functools import lru_cache
+
+import aiohttp
+from aiohttp import web
+
+ISS_URL = "https://iss.moex.com"
+CBR_URL = "https://www.cbr.ru"
+RECORDINGS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "recordings")
+
+SECURITIES_COLUMNS = [
+    "SECID", "BOARDID", "SHORTNAME", "PREVWAPRICE", "YIELDATPREVWAPRICE", "COUPONVALUE",
+    "NEXTCOUPON", "ACCRUEDINT", "PREVPRICE", "LOTSIZE", "FACEVALUE", "BOARDNAME", "STATUS",
+    "MATDATE", "DECIMALS", "COUPONPERIOD", "ISSUESIZE", "PREVLEGALCLOSEPRICE", "PREVDATE",
+    "SECNAME", "REMARKS", "MARKETCODE", "INSTRID", "SECTORID", "MINSTEP", "FACEUNIT",
+    "BUYBACKPRICE", "BUYBACKDATE", "ISIN", "LATNAME", "REGNUMBER", "CURRENCYID",
+    "ISSUESIZEPLACED", "LISTLEVEL", "SECTYPE", "COUPONPERCENT", "OFFERDATE", "SETTLEDATE",
+    "LOTVALUE", "FACEVALUEONSETTLEDATE"
+]
+MARKETDATA_COLUMNS = [
+    "SECID", "BOARDID", "BID", "OFFER", "LAST", "WAPRICE", "YIELD", "DURATION",
+    "NUMTRADES", "VOLTODAY", "VALTODAY", "UPDATETIME", "SYSTIME"
+]
+HISTORY_COLUMNS = [
+    "BOARDID", "TRADEDATE", "SHORTNAME", "SECID", "NUMTRADES", "VALUE", "LOW", "HIGH",
+    "CLOSE", "LEGALCLOSEPRICE", "ACCINT", "WAPRICE", "YIELDCLOSE", "OPEN", "VOLUME",
+    "MARKETPRICE2", "MARKETPRICE3", "MATDATE", "DURATION", "YIELDATWAP", "COUPONPERCENT",
+    "COUPONVALUE", "LASTTRADEDATE", "FACEVALUE", "CURRENCYID", "FACEUNIT"
+]
+COUPONS_COLUMNS = [
+    "isin", "name", "issuevalue", "coupondate", "recorddate", "startdate", "initialfacevalue",
+    "facevalue", "faceunit", "value", "valueprc", "value_rub", "secid", "primary_boardid"
+]
+AMORTIZATIONS_COLUMNS = [
+    "isin", "name", "issuevalue", "amortdate", "facevalue", "initialfacevalue", "faceunit",
+    "valueprc", "value", "value_rub", "data_source", "secid", "primary_boardid"
+]
+OFFERS_COLUMNS = [
+    "isin", "name", "issuevalue", "offerdate", "offerdatestart", "offerdateend", "facevalue",
+    "faceunit", "price", "value", "agent", "offertype", "secid", "primary_boardid"
+]
+CURRENCIES = [
+    ("R01235", "840", "USD", 1, "Доллар США", 96.5),
+    ("R01239", "978", "EUR", 1, "Евро", 104.2),
+    ("R01375", "156", "CNY", 1, "Китайский юань", 13.3),
+    ("R01820", "392", "JPY", 100, "Японских иен", 63.9),
+    ("R01335", "398", "KZT", 100, "Казахстанских тенге", 19.8),
+]
+
+
+def block(columns: list[str], data: list[list]) -> dict:
+    return {"metadata": {}, "columns": columns, "data": data}
+
+
+@lru_cache(maxsize=8)
+def synthetic_securities(board: str, count: int) -> dict:
+    """
+    Функция для генерации синтетического списка облигаций режима торгов
+    (детерминированно: один и тот же board и count дают одинаковые данные)
+
+    :param board: режим торгов
+    :param count: число облигаций
+    :return: ответ в формате ISS securities.json
+    """
+    rnd = random.Random(f"{board}:{count}")
+    today = date.today()
+    securities, marketdata = [], []
+    for i in range(count):
+        secid = f"{board[:2]}{i:08d}"
+        face_unit = "SUR" if board == "TQOB" or rnd.random() < 0.9 else rnd.choice(["USD", "EUR", "CNY"])
+        face_value = 1000
+        period = rnd.choice([91, 182, 182, 182, 365])
+        maturity = today + timedelta(days=rnd.randint(30, 365 * 15))
+        no_coupon = rnd.random() < 0.05
+        next_coupon = min(today + timedelta(days=rnd.randint(1, period)), maturity)
+        coupon_percent = None if no_coupon else round(rnd.uniform(4, 20), 2)
+        coupon_value = 0 if no_coupon else round(face_value * coupon_percent / 100 * period / 365, 2)
+        price = round(rnd.uniform(70, 110), 4)
+        accrued = round(coupon_value * rnd.random(), 2)
+        securities.append([
+            secid, board, f"Облиг {i}", price, round(rnd.uniform(5, 25), 2), coupon_value,
+            next_coupon.isoformat(), accrued, price, 1, face_value, board, "A",
+            maturity.isoformat(), 4, period, rnd.randint(10 ** 6, 10 ** 10), price,
+            (today - timedelta(days=1)).isoformat(), f"Облигация синтетическая {i}", None,
+            "FNDT", 1, None, 0.01, face_unit, None, "0000-00-00", f"RU000{secid}", f"Bond {i}",
+            None, face_unit, None, rnd.randint(1, 3), "6", coupon_percent, None,
+            today.isoformat(), face_value, face_value
+        ])
+        marketdata.append([
+            secid, board, price - 0.1, price + 0.1, price, price, round(rnd.uniform(5, 25), 2),
+            rnd.randint(30, 3000), rnd.randint(0, 500), rnd.randint(0, 10 ** 5), rnd.randint(0, 10 ** 8),
+            "18:39:59", datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        ])
+    return {
+        "securities": block(SECURITIES_COLUMNS, securities),
+        "marketdata": block(MARKETDATA_COLUMNS, marketdata),
+    }
+
+
+def live_marketdata(board: str, count: int, columns: list[str]) -> dict:
+    """
+    Функция для генерации внутридневного блока marketdata: каждую минуту
+    цена последней сделки меняется примерно у десятой части облигаций
+
+    :param board: режим торгов
+    :param count: число облигаций
+    :param columns: запрошенные столбцы (marketdata.columns)
+    :return: ответ в формате ISS securities.json?iss.only=marketdata
+    """
+    minute = datetime.now().strftime("%Y%m%d%H%M")
+    positions = [MARKETDATA_COLUMNS.index(column) for column in columns]
+    last, waprice, yield_ = (MARKETDATA_COLUMNS.index(column) for column in ("LAST", "WAPRICE", "YIELD"))
+    rows = []
+    for row in synthetic_securities(board, count)["marketdata"]["data"]:
+        row = list(row)
+        rnd = random.Random(f"{row[0]}:{minute}")
+        if rnd.random() < 0.1:
+            row[last] = round(row[last] + rnd.uniform(-0.5, 0.5), 4)
+            row[waprice] = round((row[waprice] + row[last]) / 2, 4)
+            row[yield_] = round(row[yield_] + rnd.uniform(-0.1, 0.1), 2)
+        row[-1] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        rows.append([row[i] for i in positions])
+    return {"marketdata": block(columns, rows)}
+
+
+def synthetic_history(secid: str, date_from: date, date_till: date) -> list[list]:
+    """
+    Функция для генерации синтетических исторических цен облигации
+    (случайное блуждание цены по рабочим дням, детерминированно по тикеру)
+
+    :param secid: тикер облигации
+    :param date_from: начальная дата
+    :param date_till: конечная дата
+    :return: строки в формате ISS history
+    """
+    rnd = random.Random(secid)
+    face_unit = "SUR" if rnd.random() < 0.9 else "USD"
+    price = rnd.uniform(80, 105)
+    rows = []
+    day = date_from
+    while day <= date_till:
+        price = min(max(price + rnd.gauss(0, 0.3), 50), 130)
+        if day.weekday() < 5:
+            close = round(price, 4)
+            rows.append([
+                "TQCB", day.isoformat(), secid, secid, rnd.randint(1, 500), rnd.randint(10 ** 4, 10 ** 8),
+                close - 0.5, close + 0.5, close, close, round(rnd.uniform(0, 40), 2), close,
+                round(rnd.uniform(5, 25), 2), close, rnd.randint(1, 10 ** 5), close, close,
+                "2030-01-01", rnd.randint(30, 3000), round(rnd.uniform(5, 25), 2), 10.0, 49.86,
+                day.isoformat(), 1000, face_unit, face_unit
+            ])
+        day += timedelta(days=1)
+    return rows
+
+
+def synthetic_bondization(secid: str) -> dict:
+    """
+    Функция для генерации синтетического графика выплат облигации
+    (детерминированно по тикеру): купоны от даты размещения до погашения,
+    у части облигаций - амортизация номинала, переменный купон
+    (будущие купоны неизвестны) и оферта
+
+    :param secid: тикер облигации
+    :return: ответ в формате ISS bondization.json
+    """
+    rnd = random.Random(f"bondization:{secid}")
+    today = date.today()
+    isin, name, issue = f"RU000{secid}", f"Облиг {secid}", rnd.randint(10 ** 6, 10 ** 10)
+    period = rnd.choice([91, 182, 182, 182, 365])
+    count = rnd.randint(2, 30)
+    start = today - timedelta(days=period * rnd.randint(1, count - 1))
+    coupon_dates = [start + timedelta(days=period * (i + 1)) for i in range(count)]
+    face_value = 1000.0
+    floater = rnd.random() < 0.2
+    amortized = rnd.random() < 0.2
+    percent = round(rnd.uniform(4, 20), 2)
+
+    amort_dates = coupon_dates[-4:] if amortized else coupon_dates[-1:]
+    amort_share = 100 / len(amort_dates)
+    coupons, amortizations = [], []
+    for i, coupon_date in enumerate(coupon_dates):
+        known = not floater or coupon_date <= today + timedelta(days=period)
+        value = round(face_value * percent / 100 * period / 365, 2) if known else None
+        coupons.append([
+            isin, name, issue, coupon_date.isoformat(), (coupon_date - timedelta(days=1)).isoformat(),
+            (coupon_date - timedelta(days=period)).isoformat(), 1000, face_value, "SUR", value,
+            percent if known else None, value, secid, "TQCB"
+        ])
+        if coupon_date in amort_dates:
+            amount = round(1000 * amort_share / 100, 2)
+            face_value -= amount
+            source = "maturity" if coupon_date == coupon_dates[-1] else "amortization"
+            amortizations.append([
+                isin, name, issue, coupon_date.isoformat(), face_value + amount, 1000, "SUR",
+                round(amort_share, 4), amount, amount, source, secid, "TQCB"
+            ])
+    offers = []
+    if rnd.random() < 0.1:
+        offer_date = coupon_dates[len(coupon_dates) // 2]
+        offers.append([
+            isin, name, issue, offer_date.isoformat(), (offer_date - timedelta(days=14)).isoformat(),
+            (offer_date - timedelta(days=7)).isoformat(), 1000, "SUR", 100, 1000, None,
+            "Оферта", secid, "TQCB"
+        ])
+    return {
+        "coupons": block(COUPONS_COLUMNS, coupons),
+        "amortizations": block(AMORTIZATIONS_COLUMNS, amortizations),
+        "offers": block(OFFERS_COLUMNS, offers),
+    }
+
+
+def synthetic_rate(code: str, rate: float, day: date) -> float:
+    """Функция для генерации синтетического курса валюты на дату (детерминированно)"""
+    return rate * (1 + random.Random(f"{code}:{day.isoformat()}").uniform(-0.02, 0.02))
+
+
+def synthetic_xml_daily(request_date: str) -> str:
+    """
+    Функция для генерации курсов валют ЦБ РФ в формате XML_daily
+
+    :param request_date: дата запроса (dd/mm/yyyy)
+    :return: XML с курсами валют
+    """
+    day = datetime.strptime(request_date, "%d/%m/%Y").date()
+    valutes = []
+    for valute_id, num_code, code, nominal, name, rate in CURRENCIES:
+        value = f"{synthetic_rate(code, rate, day):.4f}".replace(".", ",")
+        valutes.append(f'<Valute ID="{valute_id}"><NumCode>{num_code}</NumCode><CharCode>{code}</CharCode>'
+                       f'<Nominal>{nominal}</Nominal><Name>{name}</Name><Value>{value}</Value></Valute>')
+    return (f'<?xml version="1.0" encoding="windows-1251"?>'
+            f'<ValCurs Date="{request_date.replace("/", ".")}" name="Foreign Currency Market">{"".join(valutes)}</ValCurs>')
+
+
+def synthetic_xml_dynamic(valute_id: str, date_from: date, date_till: date) -> str:
+    """
+    Функция для генерации курсов одной валюты ЦБ РФ за период в формате XML_dynamic
+    (курсы устанавливаются по рабочим дням)
+
+    :param valute_id: идентификатор валюты ЦБ РФ
+    :param date_from: начальная дата
+    :param date_till: конечная дата
+    :return: XML с курсами валюты
+    """
+    currency = next((c for c in CURRENCIES if c[0] == valute_id), None)
+    records = []
+    day = date_from
+    while currency is not None and day <= date_till:
+        if day.weekday() < 5:
+            _, _, code, nominal, _, rate = currency
+            value = f"{synthetic_rate(code, rate, day):.4f}".replace(".", ",")
+            records.append(f'<Record Date="{day.strftime("%d.%m.%Y")}" Id="{valute_id}">'
+                           f'<Nominal>{nominal}</Nominal><Value>{value}</Value></Record>')
+        day += timedelta(days=1)
+    return (f'<?xml version="1.0" encoding="windows-1251"?>'
+            f'<ValCurs ID="{valute_id}" DateRange1="{date_from.strftime("%d.%m.%Y")}" '
+            f'DateRange2="{date_till.strftime("%d.%m.%Y")}" name="Foreign Currency Market Dynamic">'
+            f'{"".join(records)}</ValCurs>')
+
+
+class StubServer:
+    """Сервер-заглушка ISS MOEX и ЦБ РФ"""
+    def __init__(self, securities: int, page_size: int, latency_ms: float, jitter_ms: float,
+                 error_rate: float, record: bool, recordings_dir: str):
+        self.securities = securities
+        self.page_size = page_size
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.record = record
+        self.recordings_dir = recordings_dir
+        self.upstream: aiohttp.ClientSession | None = None
+
+    def recording_path(self, request: web.Request) -> str:
+        key = hashlib.md5(request.path_qs.encode()).hexdigest()
+        return os.path.join(self.recordings_dir, f"{key}.json")
+
+    @web.middleware
+    async def middleware(self, request: web.Request, handler) -> web.StreamResponse:
+        delay = self.latency_ms + random.uniform(0, self.jitter_ms)
+        if delay:
+            await asyncio.sleep(delay / 1000)
+        if self.error_rate and random.random() < self.error_rate:
+            return web.Response(status=503, headers={"Retry-After": "1"})
+
+        path = self.recording_path(request)
+        if self.record:
+            return await self.proxy(request, path)
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                recording = json.load(f)
+            return web.Response(body=recording["body"].encode(recording["charset"]),
+                                content_type=recording["content_type"], charset=recording["charset"])
+        return await handler(request)
+
+    async def proxy(self, request: web.Request, path: str) -> web.Response:
+        upstream = CBR_URL if request.path.startswith("/scripts/") else ISS_URL
+        if self.upstream is None:
+            self.upstream = aiohttp.ClientSession()
+        async with self.upstream.get(upstream + request.path_qs) as response:
+            body = await response.read()
+            charset = response.charset or "utf-8"
+            if response.status == 200:
+                os.makedirs(self.recordings_dir, exist_ok=True)
+                with open(path, "w", encoding="utf-8") as f:
+                    json.dump({"url": request.path_qs, "content_type": response.content_type,
+                               "charset": charset, "body": body.decode(charset)}, f, ensure_ascii=False)
+            return web.Response(status=response.status, body=body,
+                                content_type=response.content_type, charset=charset)
+
+    async def securities_handler(self, request: web.Request) -> web.Response:
+        if request.query.get("iss.only") == "marketdata":
+            columns = request.query.get("marketdata.columns", ",".join(MARKETDATA_COLUMNS)).split(",")
+            return web.json_response(live_marketdata(request.match_info["board"], self.securities, columns))
+        data = synthetic_securities(request.match_info["board"], self.securities)
+        return web.json_response(data)
+
+    async def history_handler(self, request: web.Request) -> web.Response:
+        secid = request.match_info["secid"]
+        today = date.today()
+        date_from = date.fromisoformat(request.query.get("from", (today - timedelta(days=365)).isoformat()))
+        date_till = date.fromisoformat(request.query.get("till", today.isoformat()))
+        start = int(request.query.get("start", 0))
+        rows = synthetic_history(secid, date_from, date_till)
+        return web.json_response({
+            "history": block(HISTORY_COLUMNS, rows[start:start + self.page_size]),
+            "history.cursor": block(["INDEX", "TOTAL", "PAGESIZE"], [[start, len(rows), self.page_size]]),
+        })
+
+    async def bondization_handler(self, request: web.Request) -> web.Response:
+        return web.json_response(synthetic_bondization(request.match_info["secid"]))
+
+    async def xml_daily_handler(self, request: web.Request) -> web.Response:
+        request_date = request.query.get("date_req", date.today().strftime("%d/%m/%Y"))
+        return web.Response(body=synthetic_xml_daily(request_date).encode("windows-1251"),
+                            content_type="application/xml", charset="windows-1251")
+
+    async def xml_dynamic_handler(self, request: web.Request) -> web.Response:
+        date_from = datetime.strptime(request.query["date_req1"], "%d/%m/%Y").date()
+        date_till = datetime.strptime(request.query["date_req2"], "%d/%m/%Y").date()
+        body = synthetic_xml_dynamic(request.query["VAL_NM_RQ"], date_from, date_till)
+        return web.Response(body=body.encode("windows-1251"), content_type="application/xml", charset="windows-1251")
+
+    async def close(self, app: web.Application) -> None:
+        if self.upstream is not None:
+            await self.upstream.close()
+
+    def make_app(self) -> web.Application:
+        app = web.Application(middlewares=[self.middleware])
+        app.router.add_get("/iss/engines/{engine}/markets/{market}/boards/{board}/securities.json",
+                           self.securities_handler)
+        app.router.add_get("/iss/history/engines/stock/markets/bonds/securities/{secid}.json",
+                           self.history_handler)
+        app.router.add_get("/iss/securities/{secid}/bondization.json", self.bondization_handler)
+        app.router.add_get("/scripts/XML_daily.asp", self.xml_daily_handler)
+        app.router.add_get("/scripts/XML_dynamic.asp", self.xml_dynamic_handler)
+        app.on_cleanup.append(self.close)
+        return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Сервер-заглушка ISS MOEX и ЦБ РФ")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8081)
+    parser.add_argument("--securities", type=int, default=3000,
+                        help="число синтетических облигаций в режиме торгов")
+    parser.add_argument("--page-size", type=int, default=100,
+                        help="размер страницы исторических цен")
+    parser.add_argument("--latency", type=float, default=0, help="задержка ответа, мс")
+    parser.add_argument("--jitter", type=float, default=0, help="случайная добавка к задержке, мс")
+    parser.add_argument("--error-rate", type=float, default=0, help="доля ответов 503")
+    parser.add_argument("--record", action="store_true",
+                        help="проксировать запросы к настоящим источникам и сохранять ответы")
+    parser.add_argument("--recordings", default=RECORDINGS_DIR, help="каталог записанных ответов")
+    args = parser.parse_args()
+
+    server = StubServer(securities=args.securities, page_size=args.page_size,
+                        latency_ms=args.latency, jitter_ms=args.jitter, error_rate=args.error_rate,
+                        record=args.record, recordings_dir=args.recordings)
+    web.run_app(server.make_app(), host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()